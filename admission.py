@@ -0,0 +1,148 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from batch_scheduler import QueueFullError, DeadlineExceededError
+
+
+# Prazo (time.monotonic()) da requisição atual; lido no caminho de inferência. Como o
+# Server-Timing em metrics.py, é isolado por thread (Flask) e por task (ASGI)
+_deadline = contextvars.ContextVar('inference_deadline', default=None)
+
+
+def current_deadline():
+    """Prazo da requisição atual em time.monotonic() (None fora do controle de admissão)"""
+    return _deadline.get()
+
+
+def check_deadline(deadline=None):
+    """Levanta DeadlineExceededError se o prazo (padrão: o da requisição atual) já passou"""
+    deadline = current_deadline() if deadline is None else deadline
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceededError("Prazo da requisição esgotado antes da inferência")
+
+
+class Admission:
+    def __init__(self, controller, deadline):
+        """Requisição admitida: ocupa uma posição da fila até sair do bloco with"""
+        self.controller = controller
+        self.deadline = deadline
+        self._token = None
+        self._released = False
+
+    def __enter__(self):
+        self._token = _deadline.set(self.deadline)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _deadline.reset(self._token)
+        self.release()
+        return False
+
+    def release(self):
+        """Libera a posição na fila (idempotente; respostas em streaming liberam ao fechar a resposta)"""
+        if not self._released:
+            self._released = True
+            self.controller._release()
+
+
+class AdmissionController:
+    def __init__(self, max_depth=64, timeout=15.0, max_timeout=None, rate_window=10.0, max_retry_after=30):
+        """
+        Controle de admissão na frente da inferência: fila limitada e prazo por requisição
+        Args:
+            max_depth: Máximo de requisições de detecção em andamento (esperando ou em
+                inferência); acima disso, novas requisições são recusadas imediatamente
+            timeout: Prazo padrão de cada requisição (segundos); imagens cujo prazo esgota
+                na fila são descartadas antes da inferência
+            max_timeout: Maior prazo que um cliente pode pedir (padrão: timeout)
+            rate_window: Janela (segundos) da vazão usada para estimar o Retry-After
+            max_retry_after: Maior valor de Retry-After sugerido (segundos)
+        """
+        self.max_depth = max(1, int(max_depth))
+        self.timeout = float(timeout)
+        self.max_timeout = float(max_timeout) if max_timeout is not None else self.timeout
+        self.rate_window = float(rate_window)
+        self.max_retry_after = int(max_retry_after)
+
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._completions = deque()
+
+        # Contadores
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.completed = 0
+
+    def _prune(self, now):
+        """Remove conclusões fora da janela de vazão (chamado com o lock adquirido)"""
+        while self._completions and self._completions[0] < now - self.rate_window:
+            self._completions.popleft()
+
+    def admit(self, timeout=None):
+        """
+        Admite uma requisição ou a recusa se a fila estiver cheia
+        Args:
+            timeout: Prazo pedido pelo cliente (segundos), limitado a max_timeout
+        Returns:
+            Admission (usar com with; o prazo vale para a inferência dentro do bloco)
+        Raises:
+            QueueFullError: fila cheia (responder 503 com Retry-After e chamar record_shed)
+        """
+        timeout = self.timeout if timeout is None else max(0.0, min(float(timeout), self.max_timeout))
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise QueueFullError(f"Fila de inferência cheia ({self.max_depth} requisições)")
+            self._depth += 1
+            self.admitted += 1
+        return Admission(self, time.monotonic() + timeout)
+
+    def _release(self):
+        now = time.monotonic()
+        with self._lock:
+            self._depth -= 1
+            self.completed += 1
+            self._completions.append(now)
+            self._prune(now)
+
+    def record_shed(self, error):
+        """
+        Registra uma requisição recusada por sobrecarga
+        Args:
+            error: DeadlineExceededError (prazo esgotado na fila) ou QueueFullError (fila cheia)
+        """
+        with self._lock:
+            if isinstance(error, DeadlineExceededError):
+                self.expired += 1
+            else:
+                self.shed += 1
+
+    def retry_after(self):
+        """Segundos sugeridos no Retry-After: tempo para esvaziar a fila na vazão recente"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            rate = len(self._completions) / self.rate_window
+            depth = self._depth
+        if rate <= 0:
+            return 1
+        return max(1, min(self.max_retry_after, math.ceil(depth / rate)))
+
+    def get_stats(self):
+        """Profundidade da fila e contadores de requisições admitidas, recusadas e expiradas"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            return {
+                'queue_depth': self._depth,
+                'max_depth': self.max_depth,
+                'saturated': self._depth >= self.max_depth,
+                'timeout_seconds': self.timeout,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'expired': self.expired,
+                'completed': self.completed,
+                'throughput_rps': round(len(self._completions) / self.rate_window, 2)
+            }
@@ -1,34 +1,546 @@
-from flask import Flask, request, jsonify
+import time
+IMPORT_START = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file, g
 from flask_cors import CORS
 import os
-import base64
-from PIL import Image
 import io
-import uuid
+import json
+import hmac
+import math
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from image_loader import (
+    decode_image_bytes_scaled, decode_base64_image_scaled, iter_archive_images, ImageDecodeError,
+    ZIP_CONTENT_TYPES, TAR_CONTENT_TYPES
+)
 from yolo_detector import YOLODetector
+from batch_scheduler import BatchScheduler, QueueFullError, DeadlineExceededError, wait_result
+from admission import AdmissionController, current_deadline, check_deadline
+from fair_scheduler import (
+    FairScheduler, load_client_config, client_context, current_client, UnknownAPIKeyError, RateLimitedError
+)
+from inference_server import InferenceServer
+from detection_cache import DetectionCache
+from frame_gate import FrameGate
+from frame_stream import FrameStream, StreamRegistry
+from object_tracker import TrackerRegistry
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:  # Streaming por WebSocket (/stream) indisponível sem o flask-sock
+    Sock = None
 from response_generator import ResponseGenerator
-from tts_generator import TTSGenerator
+from tts_generator import TTSGenerator, StubSynthesizer
+from audio_cache import AudioCache
+from audio_jobs import AudioJobManager
+from audio_player import AudioPlayer
+from startup import StartupState
+from process_memory import get_memory_stats
+from metrics import (
+    REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT,
+    MODEL_INFO, READY, ADMISSION_QUEUE_DEPTH, SHED_REQUESTS, CLIENT_QUEUE_WAIT_SECONDS, CLIENT_REJECTED, stage, start_request_timings, finish_request_timings, format_server_timing
+)
+from sampling_profiler import SamplingProfiler
 
 app = Flask(__name__)
 
 # Configurar CORS
 CORS(app)
 
+# WebSocket para streaming de frames (/stream)
+sock = Sock(app) if Sock is not None else None
+
 # Configurações da aplicação
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'avif'}
 
-# Criar pasta de uploads se não existir
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Configurações do modelo e do backend de inferência
+MODEL_PATH = os.environ.get('MODEL_PATH', 'yolov8n.pt')
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'pytorch')
+MODEL_IMGSZ = int(os.environ.get('MODEL_IMGSZ', 640))
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', 'model_cache')
+MODEL_CALIBRATION_DIR = os.environ.get('MODEL_CALIBRATION_DIR') or None
+
+# Configurações do micro-batching de inferência
+BATCH_ENABLED = os.environ.get('BATCH_ENABLED', '1') == '1'
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 8))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+BATCH_QUEUE_SIZE = int(os.environ.get('BATCH_QUEUE_SIZE', 64))
+
+# Inferência fora do processo: 'local' (modelo no processo HTTP) ou 'server' (pool de
+# processos donos do modelo; frames passados por ring buffer em memória compartilhada)
+INFERENCE_MODES = {'local', 'server'}
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'local')
+if INFERENCE_MODE not in INFERENCE_MODES:
+    raise ValueError(f"INFERENCE_MODE inválido: {INFERENCE_MODE} (opções: {', '.join(sorted(INFERENCE_MODES))})")
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 2))
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 8))
+INFERENCE_SLOT_MB = float(os.environ.get('INFERENCE_SLOT_MB', 6))
+
+# Controle de admissão: no máximo ADMISSION_MAX_DEPTH requisições de detecção em andamento
+# (as demais recebem 503 com Retry-After na hora) e um prazo por requisição; imagens cujo
+# prazo esgota na fila são descartadas antes da inferência. O cliente pode pedir um prazo
+# menor (ou até ADMISSION_MAX_TIMEOUT) no header X-Request-Timeout, em segundos
+ADMISSION_ENABLED = os.environ.get('ADMISSION', '1') == '1'
+ADMISSION_MAX_DEPTH = int(os.environ.get('ADMISSION_MAX_DEPTH', 64))
+ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 15))
+ADMISSION_MAX_TIMEOUT = float(os.environ.get('ADMISSION_MAX_TIMEOUT', 60))
+DEADLINE_HEADER = 'X-Request-Timeout'
+OVERLOAD_RETRY_AFTER = 1
+
+# Fila justa entre clientes: as vagas de inferência são distribuídas por deficit round-robin
+# ponderado entre os clientes (X-API-Key, X-Client-ID ou endereço de origem), com uma faixa
+# prioritária para clientes interativos (ex.: quiosques). Pesos, limites de concorrência e
+# de taxa por cliente vêm do JSON em CLIENTS_CONFIG. FAIR_SLOTS (padrão: dois lotes por
+# réplica do modelo) é quantas imagens podem estar na inferência ao mesmo tempo
+FAIR_QUEUE_ENABLED = os.environ.get('FAIR_QUEUE', '1') == '1'
+FAIR_SLOTS = int(os.environ.get('FAIR_SLOTS', 0)) or (
+    2 * (BATCH_MAX_SIZE if BATCH_ENABLED else 1) * (INFERENCE_WORKERS if INFERENCE_MODE == 'server' else 1))
+CLIENTS_CONFIG = os.environ.get('CLIENTS_CONFIG') or None
+API_KEY_HEADER = 'X-API-Key'
+CLIENT_ID_HEADER = 'X-Client-ID'
+PRIORITY_HEADER = 'X-Priority'
+
+# Cache de resultados de detecção por hash da imagem: 'exact', 'perceptual' ou 'off'
+DETECTION_CACHE_MODE = os.environ.get('DETECTION_CACHE', 'exact')
+DETECTION_CACHE_TTL = float(os.environ.get('DETECTION_CACHE_TTL', 10))
+DETECTION_CACHE_MAX_ENTRIES = int(os.environ.get('DETECTION_CACHE_MAX_ENTRIES', 1024))
+
+# Filtro de frames por sessão (header X-Session-ID): frames quase iguais ao último
+# frame detectado reaproveitam as detecções, com nova detecção a cada intervalo máximo
+SESSION_HEADER = 'X-Session-ID'
+FRAME_GATE_ENABLED = os.environ.get('FRAME_GATE', '1') == '1'
+FRAME_GATE_THRESHOLD = float(os.environ.get('FRAME_GATE_THRESHOLD', 0.02))
+FRAME_GATE_MAX_INTERVAL = float(os.environ.get('FRAME_GATE_MAX_INTERVAL', 1.0))
+
+# Rastreamento de objetos por sessão: com X-Session-ID, a resposta e o áudio descrevem
+# apenas objetos que apareceram ou saíram de cena desde o frame anterior
+TRACKING_ENABLED = os.environ.get('TRACKING', '1') == '1'
+# Padrão: a confiança mínima do detector, para que toda detecção reportada possa iniciar um objeto
+TRACKING_HIGH_THRESH = float(os.environ.get('TRACKING_HIGH_THRESH', YOLODetector.CONF_THRESHOLD))
+# Segunda etapa do rastreamento: nas sessões rastreadas o modelo também retorna detecções a
+# partir dessa confiança, que só mantêm objetos já rastreados (nunca são anunciadas sozinhas)
+TRACKING_LOW_THRESH = float(os.environ.get('TRACKING_LOW_THRESH', 0.1))
+TRACKING_MATCH_THRESH = float(os.environ.get('TRACKING_MATCH_THRESH', 0.3))
+TRACKING_MAX_LOST = float(os.environ.get('TRACKING_MAX_LOST', 2.0))
+DETECTOR_LOW_CONF = TRACKING_LOW_THRESH if TRACKING_ENABLED and TRACKING_LOW_THRESH < YOLODetector.CONF_THRESHOLD else None
+
+# Decodificação reduzida: JPEGs grandes são decodificados direto em 1/2, 1/4 ou 1/8 da
+# resolução (sem ficar menores que MODEL_IMGSZ); as caixas voltam aos pixels originais
+DECODE_REDUCED = os.environ.get('DECODE_REDUCED', '1') == '1'
+DECODE_MIN_SIZE = MODEL_IMGSZ if DECODE_REDUCED else None
+
+# Configurações do endpoint /detect-batch
+DECODE_WORKERS = int(os.environ.get('DECODE_WORKERS', 4))
+MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', 200))
+
+# Motor de síntese: 'gtts' (Google, requer rede) ou 'stub' (MP3 de silêncio gerado
+# localmente, para testes de carga reproduzíveis sem rede; TTS_STUB_LATENCY_MS simula o gTTS)
+TTS_ENGINES = {'gtts', 'stub'}
+TTS_ENGINE = os.environ.get('TTS_ENGINE', 'gtts')
+if TTS_ENGINE not in TTS_ENGINES:
+    raise ValueError(f"TTS_ENGINE inválido: {TTS_ENGINE} (opções: {', '.join(sorted(TTS_ENGINES))})")
+TTS_STUB_LATENCY_MS = float(os.environ.get('TTS_STUB_LATENCY_MS', 0))
+
+# Configurações do cache de áudio do TTS
+TTS_CACHE_MAX_MB = float(os.environ.get('TTS_CACHE_MAX_MB', 32))
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR') or None
+
+# Configurações dos jobs de áudio assíncronos (tts_mode=async)
+TTS_MODES = {'sync', 'async', 'none'}
+AUDIO_JOB_WORKERS = int(os.environ.get('AUDIO_JOB_WORKERS', 2))
+AUDIO_JOB_TTL = int(os.environ.get('AUDIO_JOB_TTL', 300))
+AUDIO_MAX_WAIT = 30
+
+# Configurações da reprodução de áudio (thread dedicada dona do mixer)
+AUDIO_QUEUE_SIZE = int(os.environ.get('AUDIO_QUEUE_SIZE', 8))
+AUDIO_PLAYBACK_POLICY = os.environ.get('AUDIO_PLAYBACK_POLICY', 'drop')
+
+# TTS por fragmentos: cada fragmento de template é sintetizado uma vez e as respostas
+# são montadas concatenando os MP3 (TTS_FRAGMENT_PRESYNTH=1 sintetiza todos no início)
+TTS_FRAGMENT_MODE = os.environ.get('TTS_FRAGMENT_MODE', '0') == '1'
+TTS_FRAGMENT_PRESYNTH = os.environ.get('TTS_FRAGMENT_PRESYNTH', '0') == '1'
+
+# Perfil da aplicação: 'full' (detecção + áudio) ou 'detection' (sem gTTS/pygame)
+APP_PROFILES = {'full', 'detection'}
+APP_PROFILE = os.environ.get('APP_PROFILE', 'full')
+if APP_PROFILE not in APP_PROFILES:
+    raise ValueError(f"APP_PROFILE inválido: {APP_PROFILE} (opções: {', '.join(sorted(APP_PROFILES))})")
+AUDIO_ENABLED = APP_PROFILE == 'full'
+
+# Inicialização: 'background' (o servidor responde /health enquanto o modelo carrega),
+# 'blocking' (o import do app só termina com o modelo carregado e aquecido) ou
+# 'preload' (gunicorn com preload_app: o modelo é carregado no master e compartilhado
+# copy-on-write; áudio e aquecimento acontecem em cada worker via init_worker)
+STARTUP_MODES = {'background', 'blocking', 'preload'}
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'background')
+if STARTUP_MODE not in STARTUP_MODES:
+    raise ValueError(f"STARTUP_MODE inválido: {STARTUP_MODE} (opções: {', '.join(sorted(STARTUP_MODES))})")
+MODEL_WARMUP_RUNS = int(os.environ.get('MODEL_WARMUP_RUNS', 1))
+STARTUP_RETRY_AFTER = 5
+
+# Endpoints administrativos (/admin/*): desativados se ADMIN_TOKEN não estiver definido
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') or None
+PROFILE_MAX_SECONDS = 60
+
+# Componentes (criados em init_components)
+startup = StartupState(started_at=IMPORT_START)
+startup.record('imports', time.perf_counter() - IMPORT_START)
 
-# Inicializar componentes
-yolo_detector = YOLODetector()
+yolo_detector = None
+preloaded_detector = None
+batch_scheduler = None
+inference_server = InferenceServer(
+    detector_kwargs={
+        'model_path': MODEL_PATH,
+        'backend': MODEL_BACKEND,
+        'imgsz': MODEL_IMGSZ,
+        'cache_dir': MODEL_CACHE_DIR,
+        'calibration_dir': MODEL_CALIBRATION_DIR,
+        'low_conf_threshold': DETECTOR_LOW_CONF
+    },
+    num_workers=INFERENCE_WORKERS,
+    slots=INFERENCE_SLOTS,
+    slot_bytes=int(INFERENCE_SLOT_MB * 1024 * 1024),
+    max_batch_size=BATCH_MAX_SIZE if BATCH_ENABLED else 1,
+    warmup_runs=MODEL_WARMUP_RUNS,
+    # Sem nenhum processo de inferência, /ready e as detecções voltam a responder 503
+    on_unavailable=startup.mark_unavailable
+) if INFERENCE_MODE == 'server' else None
+admission_controller = AdmissionController(
+    max_depth=ADMISSION_MAX_DEPTH,
+    timeout=ADMISSION_TIMEOUT,
+    max_timeout=ADMISSION_MAX_TIMEOUT
+) if ADMISSION_ENABLED else None
+def observe_client_wait(identity, seconds):
+    CLIENT_QUEUE_WAIT_SECONDS.observe(seconds, client=identity.label, lane=identity.lane)
+
+fair_scheduler = FairScheduler(
+    FAIR_SLOTS,
+    *load_client_config(CLIENTS_CONFIG),
+    on_wait=observe_client_wait
+) if FAIR_QUEUE_ENABLED else None
+detection_cache = DetectionCache(
+    mode=DETECTION_CACHE_MODE,
+    ttl_seconds=DETECTION_CACHE_TTL,
+    max_entries=DETECTION_CACHE_MAX_ENTRIES
+) if DETECTION_CACHE_MODE != 'off' else None
+frame_gate = FrameGate(
+    threshold=FRAME_GATE_THRESHOLD,
+    max_interval=FRAME_GATE_MAX_INTERVAL
+) if FRAME_GATE_ENABLED else None
+object_tracker = TrackerRegistry(
+    high_thresh=TRACKING_HIGH_THRESH,
+    match_thresh=TRACKING_MATCH_THRESH,
+    max_lost_seconds=TRACKING_MAX_LOST
+) if TRACKING_ENABLED else None
+stream_registry = StreamRegistry()
 response_generator = ResponseGenerator()
-tts_generator = TTSGenerator(language='pt', slow=False)
+tts_generator = None
+audio_jobs = None
+decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='decode')
+
+def load_model():
+    """Carrega o modelo YOLO (sem aquecimento)"""
+    with startup.stage('model_load'):
+        return YOLODetector(
+            model_path=MODEL_PATH,
+            backend=MODEL_BACKEND,
+            imgsz=MODEL_IMGSZ,
+            cache_dir=MODEL_CACHE_DIR,
+            calibration_dir=MODEL_CALIBRATION_DIR,
+            low_conf_threshold=DETECTOR_LOW_CONF
+        )
+
+def start_inference_server():
+    """Inicia os processos de inferência e aguarda cada um carregar e aquecer o modelo"""
+    with startup.stage('inference_workers'):
+        inference_server.start()
+        inference_server.wait_ready()
+
+def init_components(detector=None):
+    """
+    Carrega o áudio e o modelo, aquece o modelo e marca a API como pronta
+    Args:
+        detector: YOLODetector já carregado (modo preload); None carrega aqui
+    """
+    global yolo_detector, batch_scheduler, tts_generator, audio_jobs
+    
+    try:
+        if AUDIO_ENABLED:
+            with startup.stage('audio'):
+                tts_generator = TTSGenerator(
+                    language='pt',
+                    slow=False,
+                    cache=AudioCache(max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, disk_dir=TTS_CACHE_DIR),
+                    player=AudioPlayer(max_queue_size=AUDIO_QUEUE_SIZE, policy=AUDIO_PLAYBACK_POLICY),
+                    synthesizer=StubSynthesizer(latency=TTS_STUB_LATENCY_MS / 1000) if TTS_ENGINE == 'stub' else None
+                )
+                audio_jobs = AudioJobManager(tts_generator, max_workers=AUDIO_JOB_WORKERS, ttl_seconds=AUDIO_JOB_TTL)
+        
+        if inference_server is not None:
+            # O modelo fica nos processos de inferência (já iniciados no master, no modo preload)
+            if not inference_server.started:
+                start_inference_server()
+            MODEL_INFO.set(1, model=MODEL_PATH, backend=MODEL_BACKEND, imgsz=MODEL_IMGSZ, inference_mode=INFERENCE_MODE)
+        else:
+            if detector is None:
+                detector = load_model()
+            
+            if MODEL_WARMUP_RUNS > 0:
+                with startup.stage('warmup'):
+                    # Aquecer também o tamanho de lote usado pelo micro-batching
+                    batch_sizes = (1, BATCH_MAX_SIZE) if BATCH_ENABLED and BATCH_MAX_SIZE > 1 else (1,)
+                    detector.warmup(runs=MODEL_WARMUP_RUNS, batch_sizes=batch_sizes)
+            
+            yolo_detector = detector
+            # Modelo realmente carregado (o pytorch cai para o yolov8n.pt se o modelo pedido falhar)
+            MODEL_INFO.set(1, model=yolo_detector.model_path, backend=yolo_detector.backend,
+                           imgsz=yolo_detector.imgsz, inference_mode=INFERENCE_MODE)
+            batch_scheduler = BatchScheduler(
+                yolo_detector,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS,
+                max_queue_size=BATCH_QUEUE_SIZE
+            ) if BATCH_ENABLED else None
+        
+    except Exception as e:
+        startup.mark_failed(e)
+        raise
+    
+    startup.mark_ready()
+    
+    memory = get_memory_stats()
+    if memory['available']:
+        print(f"🧠 Memória do processo {memory['pid']}: privada {memory['private_mb']} MB, "
+              f"compartilhada {memory['shared_mb']} MB (PSS {memory['pss_mb']} MB)")
+    
+    if tts_generator is not None and TTS_FRAGMENT_MODE and TTS_FRAGMENT_PRESYNTH:
+        threading.Thread(
+            target=tts_generator.presynthesize,
+            args=(list(response_generator.iter_static_fragments(
+                YOLODetector.POSITION_LABELS.ravel(), YOLODetector.SIZE_LABELS
+            )),),
+            name='tts-presynth',
+            daemon=True
+        ).start()
+
+def _init_components_in_background(detector=None):
+    try:
+        init_components(detector)
+    except Exception:
+        # A falha já foi registrada em startup; /ready continua retornando 503
+        pass
+
+def init_worker():
+    """
+    Finaliza a inicialização em um worker do gunicorn após o fork (modo preload)
+    Threads e o mixer de áudio não sobrevivem ao fork, então são criados aqui
+    """
+    if STARTUP_MODE != 'preload':
+        return
+    threading.Thread(target=_init_components_in_background, args=(preloaded_detector,),
+                     name='startup', daemon=True).start()
+
+# Processos criados pelo multiprocessing com spawn (ex.: processos de inferência)
+# reimportam o módulo principal e não devem inicializar a API
+if multiprocessing.current_process().name != 'MainProcess':
+    pass
+elif STARTUP_MODE == 'blocking':
+    init_components()
+elif STARTUP_MODE == 'preload':
+    try:
+        if inference_server is not None:
+            start_inference_server()
+        else:
+            preloaded_detector = load_model()
+            preloaded_detector.prepare_for_fork()
+    except Exception as e:
+        startup.mark_failed(e)
+        raise
+else:
+    threading.Thread(target=_init_components_in_background, name='startup', daemon=True).start()
+
+def shutdown():
+    """Libera o áudio e encerra os processos de inferência"""
+    if tts_generator is not None:
+        tts_generator.cleanup()
+    if inference_server is not None:
+        inference_server.close()
+
+def require_ready(view):
+    """Retorna 503 (com Retry-After) enquanto o modelo não estiver carregado e aquecido"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not startup.ready:
+            response = jsonify({
+                'error': 'API inicializando, tente novamente em instantes',
+                'startup': startup.get_status()
+            })
+            response.headers['Retry-After'] = str(STARTUP_RETRY_AFTER)
+            return response, 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_admin(view):
+    """Exige o token de administração (Authorization: Bearer <ADMIN_TOKEN>)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN is None:
+            return jsonify({'error': 'Endpoints administrativos desativados (defina ADMIN_TOKEN)'}), 404
+        authorization = request.headers.get('Authorization', '')
+        token = authorization[len('Bearer '):].strip() if authorization.startswith('Bearer ') else ''
+        if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Token de administração inválido'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def identify_request(headers, remote_addr):
+    """
+    Identifica o cliente da requisição e aplica o seu limite de taxa
+    Returns:
+        ClientIdentity (None sem fila justa)
+    Raises:
+        UnknownAPIKeyError: X-API-Key não cadastrada
+        RateLimitedError: cliente acima da taxa configurada
+    """
+    if fair_scheduler is None:
+        return None
+    identity = fair_scheduler.identify(
+        api_key=headers.get(API_KEY_HEADER),
+        client_id=headers.get(CLIENT_ID_HEADER),
+        remote_addr=remote_addr,
+        priority=headers.get(PRIORITY_HEADER)
+    )
+    fair_scheduler.check_rate(identity)
+    return identity
+
+def client_error_details(error):
+    """
+    Registra uma recusa por cliente
+    Returns:
+        (corpo JSON, status, headers) da resposta: 429 com Retry-After (taxa) ou 401 (API key)
+    """
+    if isinstance(error, RateLimitedError):
+        CLIENT_REJECTED.inc(client=error.client, reason='rate_limited')
+        return {'error': str(error)}, 429, {'Retry-After': str(max(1, math.ceil(error.retry_after)))}
+    CLIENT_REJECTED.inc(client='unregistered', reason='unknown_key')
+    return {'error': str(error)}, 401, {}
+
+def require_client(view):
+    """Identifica o cliente (fila justa) e recusa com 429 quem passou da taxa configurada"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            identity = identify_request(request.headers, request.remote_addr)
+        except (UnknownAPIKeyError, RateLimitedError) as e:
+            body, status, headers = client_error_details(e)
+            return jsonify(body), status, headers
+        with client_context(identity):
+            return view(*args, **kwargs)
+    return wrapper
+
+def fair_slot(deadline=None, cost=1, client=None):
+    """Vaga de inferência na fila justa para o cliente (padrão: o da requisição atual)"""
+    if fair_scheduler is None:
+        return nullcontext()
+    return fair_scheduler.slot(client or current_client(), deadline=deadline, cost=cost)
+
+def admit_request(headers):
+    """
+    Admite uma requisição de detecção no controle de admissão
+    Args:
+        headers: Headers da requisição (prazo opcional em X-Request-Timeout)
+    Returns:
+        Context manager que mantém a requisição na fila e define o prazo da inferência
+    Raises:
+        QueueFullError: fila cheia
+    """
+    if admission_controller is None:
+        return nullcontext()
+    try:
+        timeout = float(headers.get(DEADLINE_HEADER)) if headers.get(DEADLINE_HEADER) else None
+    except ValueError:
+        timeout = None
+    return admission_controller.admit(timeout)
+
+def overload_details(error):
+    """
+    Registra uma recusa por sobrecarga (fila cheia ou prazo esgotado)
+    Returns:
+        (corpo JSON, headers) da resposta 503
+    """
+    SHED_REQUESTS.inc(reason='deadline' if isinstance(error, DeadlineExceededError) else 'queue_full')
+    retry_after = OVERLOAD_RETRY_AFTER
+    if admission_controller is not None:
+        admission_controller.record_shed(error)
+        retry_after = admission_controller.retry_after()
+    return {'error': str(error)}, {'Retry-After': str(retry_after)}
+
+def overloaded_response(error):
+    """Resposta 503 com Retry-After para fila de inferência cheia ou prazo esgotado"""
+    body, headers = overload_details(error)
+    return jsonify(body), 503, headers
+
+def require_admission(view):
+    """Recusa a requisição com 503 (e Retry-After) se a fila de inferência estiver cheia"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            admission = admit_request(request.headers)
+        except QueueFullError as e:
+            return overloaded_response(e)
+        with admission:
+            return view(*args, **kwargs)
+    return wrapper
+
+def audio_disabled_response():
+    return jsonify({'error': f'Áudio desativado no perfil {APP_PROFILE}'}), 404
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def get_tts_mode(default='sync'):
+    """Lê o modo de TTS da query string (sync, async ou none)"""
+    tts_mode = request.args.get('tts_mode', default).lower()
+    if tts_mode not in TTS_MODES:
+        raise ValueError(f"tts_mode inválido: use {', '.join(sorted(TTS_MODES))}")
+    # Sem áudio no perfil de detecção
+    return tts_mode if AUDIO_ENABLED else 'none'
+
+@app.before_request
+def start_request_metrics():
+    """Registra a requisição como em andamento (label endpoint = rota, não a URL)"""
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+    start_request_timings()
+
+@app.after_request
+def record_response_status(response):
+    """Registra o status e adiciona o header Server-Timing com as etapas medidas na requisição"""
+    g.metrics_status = response.status_code
+    stages = finish_request_timings()
+    if stages and 'metrics_start' in g:
+        response.headers['Server-Timing'] = format_server_timing(stages, total=time.perf_counter() - g.metrics_start)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception=None):
+    """Registra duração e status ao fim da requisição (após o streaming da resposta, se houver)"""
+    finish_request_timings()
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    status = 500 if exception is not None else g.pop('metrics_status', 500)
+    HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint, method=request.method)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de verificação de saúde da API"""
@@ -36,13 +548,282 @@ def health_check():
         'status': 'healthy',
         'message': 'YOLO API está funcionando!',
         'version': '1.0.0',
-        'features': ['object_detection', 'tts', 'audio_playback']
+        'profile': APP_PROFILE,
+        'ready': startup.ready,
+        # Profundidade da fila e recusas, para o balanceador desviar tráfego
+        'admission': admission_controller.get_stats() if admission_controller is not None else {'enabled': False},
+        'features': ['object_detection', 'tts', 'audio_playback'] if AUDIO_ENABLED else ['object_detection']
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Endpoint de prontidão: 200 apenas depois que o modelo foi carregado e aquecido"""
+    status = startup.get_status()
+    if not startup.ready:
+        return jsonify(status), 503
+    return jsonify(status)
+
+def detect_images(images, client=None, deadline=None):
+    """
+    Detecta objetos em uma lista de imagens decodificadas
+    Args:
+        images: Lista de numpy.ndarray (BGR)
+        client: Cliente na fila justa (o lote conta como uma requisição por imagem)
+        deadline: Prazo em time.monotonic() (padrão: o da requisição atual); imagens cujo
+            prazo esgota antes da inferência são descartadas com DeadlineExceededError
+    Returns:
+        Lista de detecções por imagem, na mesma ordem
+    """
+    deadline = current_deadline() if deadline is None else deadline
+    with fair_slot(deadline=deadline, cost=len(images), client=client):
+        dispatcher = inference_server if inference_server is not None else batch_scheduler
+        if dispatcher is not None:
+            # Enfileirar todas de uma vez para que o agendador as junte no mesmo lote
+            futures = [dispatcher.submit(image, deadline=deadline) for image in images]
+            return [wait_result(future, deadline) for future in futures]
+        check_deadline(deadline)
+        return yolo_detector.detect_batch(images)
+
+def confident_detections(detections):
+    """Detecções com a confiança mínima do detector (descarta as que só servem ao rastreamento)"""
+    if DETECTOR_LOW_CONF is None:
+        return detections
+    return [detection for detection in detections if detection['confidence'] >= YOLODetector.CONF_THRESHOLD]
+
+def describe_detections(detections, tracking=None):
+    """
+    Gera o texto da resposta (sem áudio) para as detecções de uma imagem
+    Args:
+        detections: Lista de detecções do YOLO
+        tracking: (detecções novas, tracks que saíram) do rastreamento da sessão; quando
+            informado, o texto descreve apenas as mudanças na cena
+    Returns:
+        (dict com o corpo da resposta JSON, fragmentos do texto para o TTS por fragmentos ou None)
+    """
+    # Gerar resposta personalizada (em fragmentos, no modo de TTS por fragmentos)
+    with stage('response_text'):
+        if tracking is not None:
+            appeared, departed = tracking
+            segments = response_generator.generate_tracking_segments(appeared, departed)
+            response_text = " ".join(segments)
+            if not TTS_FRAGMENT_MODE:
+                segments = None
+        elif TTS_FRAGMENT_MODE:
+            segments = response_generator.generate_response_segments(detections)
+            response_text = " ".join(segments)
+        else:
+            segments = None
+            response_text = response_generator.generate_response(detections)
+    
+    response = {
+        'message': 'Objetos detectados com sucesso!' if detections else 'Nenhum objeto detectado',
+        'detections': detections,
+        'response_text': response_text,
+        'total_objects': len(detections)
+    }
+    if tracking is not None:
+        response['appeared_tracks'] = [detection['track_id'] for detection in appeared]
+        response['departed_tracks'] = [track['track_id'] for track in departed]
+    return response, segments
+
+def attach_audio(response, segments, tts_mode='sync'):
+    """
+    Adiciona o áudio do texto da resposta
+    Args:
+        response: dict retornado por describe_detections (alterado no lugar)
+        segments: Fragmentos do texto (TTS por fragmentos) ou None
+        tts_mode: 'sync' (gera e reproduz antes de responder), 'async' (agenda um job
+            de áudio e responde imediatamente) ou 'none' (sem áudio)
+    Returns:
+        response
+    """
+    # Cena sem mudanças (rastreamento): nada a dizer
+    if not response['response_text']:
+        tts_mode = 'none'
+    
+    if tts_mode == 'async':
+        # Síntese em segundo plano; o áudio é buscado depois em /audio/<id>
+        job_id = audio_jobs.submit(response['response_text'], play_audio=True, segments=segments)
+        response.update({
+            'audio_generated': False,
+            'audio_info': None,
+            'audio_job_id': job_id,
+            'audio_url': f'/audio/{job_id}'
+        })
+        return response
+    
+    # Gerar e reproduzir áudio
+    if tts_mode != 'sync':
+        audio_info = None
+    elif segments is not None:
+        audio_info = tts_generator.generate_and_play_segments(segments)
+    else:
+        audio_info = tts_generator.play_text(response['response_text'])
+    response.update({
+        'audio_generated': audio_info is not None,
+        'audio_info': audio_info
+    })
+    return response
+
+def build_detection_response(detections, tts_mode='sync', tracking=None):
+    """
+    Gera a resposta em texto (e opcionalmente o áudio) para as detecções de uma imagem
+    Args:
+        detections: Lista de detecções do YOLO
+        tts_mode: Modo de TTS (sync, async ou none), ver attach_audio
+        tracking: (detecções novas, tracks que saíram) do rastreamento da sessão
+    Returns:
+        dict com o corpo da resposta JSON
+    """
+    response, segments = describe_detections(detections, tracking=tracking)
+    return attach_audio(response, segments, tts_mode=tts_mode)
+
+def detect_image(image):
+    """
+    Detecta objetos em uma imagem pelo caminho de inferência configurado
+    Com o prazo da requisição (controle de admissão), a imagem é descartada se ele esgotar antes da inferência
+    """
+    deadline = current_deadline()
+    # Espera a vez do cliente na fila justa antes de entrar na fila FIFO da inferência
+    with fair_slot(deadline=deadline):
+        if inference_server is not None:
+            return inference_server.detect(image, deadline=deadline)
+        if batch_scheduler is not None:
+            # Agrupa requisições concorrentes no mesmo lote
+            return batch_scheduler.detect(image, deadline=deadline)
+        check_deadline(deadline)
+        return yolo_detector.detect(image)
+
+def detect_image_cached(image):
+    """Detecta objetos, reaproveitando o resultado em cache para imagens repetidas"""
+    if detection_cache is not None:
+        return detection_cache.get_or_compute(image, detect_image)
+    return detect_image(image)
+
+def detect_and_track(image, session_id=None, scale=(1.0, 1.0)):
+    """
+    Detecta objetos em uma imagem já decodificada e atualiza o rastreamento da sessão
+    Args:
+        image: numpy.ndarray (BGR) vindo da camada de ingestão
+        session_id: Sessão do cliente (header X-Session-ID) para o filtro de frames e o
+            rastreamento de objetos
+        scale: Fatores entre a imagem original e a decodificada (decodificação reduzida)
+    Returns:
+        (detecções nos pixels da imagem enviada, (novas, saíram) do rastreamento ou None)
+    """
+    # Frames de câmera quase iguais ao anterior reaproveitam as detecções da sessão
+    with stage('detect'):
+        if frame_gate is not None and session_id:
+            detections = frame_gate.detect(session_id, image, detect_image_cached)
+        else:
+            detections = detect_image_cached(image)
+    
+    # Caixas nos pixels da imagem enviada
+    detections = YOLODetector.rescale_detections(detections, scale)
+    
+    # Com rastreamento, só objetos que entraram ou saíram de cena são anunciados. Detecções de
+    # baixa confiança entram só se mantiverem um objeto já rastreado
+    if object_tracker is not None and session_id:
+        tracking = object_tracker.update(session_id, detections)
+        return [detection for detection in detections if detection.get('track_id') is not None], tracking
+    return confident_detections(detections), None
+
+def run_detection_pipeline(image, tts_mode='sync', session_id=None, scale=(1.0, 1.0)):
+    """
+    Executa detecção, geração de resposta e TTS sobre uma imagem já decodificada
+    Args:
+        image: numpy.ndarray (BGR) vindo da camada de ingestão
+        scale: Fatores entre a imagem original e a decodificada (decodificação reduzida)
+        tts_mode: Modo de TTS (sync, async ou none)
+        session_id: Sessão do cliente (header X-Session-ID) para o filtro de frames e o
+            rastreamento de objetos
+    Returns:
+        dict com o corpo da resposta JSON
+    """
+    detections, tracking = detect_and_track(image, session_id=session_id, scale=scale)
+    return build_detection_response(detections, tts_mode=tts_mode, tracking=tracking)
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Endpoint com estatísticas de execução (batching, cache de TTS, jobs e reprodução de áudio)"""
+    audio_disabled = {'enabled': False}
+    return jsonify({
+        'startup': startup.get_status(),
+        'memory': get_memory_stats(),
+        'model': {'backend': yolo_detector.backend, 'model_path': yolo_detector.model_path,
+                  'imgsz': yolo_detector.imgsz} if yolo_detector is not None else
+                 {'backend': MODEL_BACKEND, 'model_path': MODEL_PATH, 'imgsz': MODEL_IMGSZ},
+        'inference_mode': INFERENCE_MODE,
+        'batching': batch_scheduler.get_stats() if batch_scheduler is not None else {'enabled': False},
+        'inference_server': inference_server.get_stats() if inference_server is not None else {'enabled': False},
+        'detection_cache': detection_cache.get_stats() if detection_cache is not None else {'enabled': False},
+        'frame_gate': frame_gate.get_stats() if frame_gate is not None else {'enabled': False},
+        'tracking': object_tracker.get_stats() if object_tracker is not None else {'enabled': False},
+        'fair_queue': fair_scheduler.get_stats() if fair_scheduler is not None else {'enabled': False},
+        'streams': stream_registry.get_stats(),
+        'tts_cache': tts_generator.cache.get_stats() if tts_generator is not None else audio_disabled,
+        'audio_jobs': audio_jobs.get_stats() if audio_jobs is not None else audio_disabled,
+        'audio_playback': tts_generator.player.get_stats() if tts_generator is not None else audio_disabled
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Endpoint de métricas no formato de texto do Prometheus"""
+    READY.set(1 if startup.ready else 0)
+    if admission_controller is not None:
+        ADMISSION_QUEUE_DEPTH.set(admission_controller.get_stats()['queue_depth'])
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+profile_lock = threading.Lock()
+
+@app.route('/admin/profile', methods=['POST'])
+@require_admin
+def profile_threads():
+    """
+    Amostra as pilhas de todas as threads do processo por alguns segundos e retorna o perfil
+    Query: seconds (padrão 10), interval_ms (padrão 5), format (collapsed ou speedscope),
+    idle (1 mantém threads paradas em esperas)
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval_ms', 5)) / 1000
+    except ValueError:
+        return jsonify({'error': 'seconds e interval_ms devem ser números'}), 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return jsonify({'error': f'seconds deve estar entre 0 e {PROFILE_MAX_SECONDS}'}), 400
+    output_format = request.args.get('format', 'collapsed')
+    if output_format not in ('collapsed', 'speedscope'):
+        return jsonify({'error': 'format deve ser collapsed ou speedscope'}), 400
+    
+    # Um perfil por vez: amostrar duas vezes só distorceria os dois resultados
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'error': 'Já existe um perfil em andamento'}), 409
+    try:
+        print(f"🔬 Amostrando threads por {seconds:g}s...")
+        profiler = SamplingProfiler(interval=interval, idle=request.args.get('idle') == '1').run(seconds)
+    finally:
+        profile_lock.release()
+    
+    if output_format == 'speedscope':
+        response = jsonify(profiler.speedscope(name=f'yolo-api pid {os.getpid()}'))
+        response.headers['Content-Disposition'] = 'attachment; filename=profile.speedscope.json'
+    else:
+        response = Response(profiler.collapsed(), mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(profiler.sample_count)
+    return response
+
 @app.route('/detect', methods=['POST'])
+@require_ready
+@require_client
+@require_admission
 def detect_objects():
     """Endpoint principal para detecção de objetos"""
     try:
+        try:
+            tts_mode = get_tts_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Verificar se há arquivo na requisição
         if 'image' not in request.files:
             return jsonify({'error': 'Nenhuma imagem enviada'}), 400
@@ -55,152 +836,319 @@ def detect_objects():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Tipo de arquivo não suportado'}), 400
         
-        # Salvar imagem temporariamente
-        temp_filename = f"{uuid.uuid4()}_{file.filename}"
-        temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
-        file.save(temp_path)
+        # Decodificar imagem diretamente da memória
+        with stage('body_read'):
+            image_data = file.read()
         
         try:
-            # Detectar objetos com YOLO
-            detections = yolo_detector.detect(temp_path)
-            
-            # Gerar resposta personalizada
-            response_text = response_generator.generate_response(detections)
-            
-            # Gerar e reproduzir áudio
-            audio_info = tts_generator.play_text(response_text)
-            
-            # Limpar arquivo temporário
-            os.remove(temp_path)
-            
-            return jsonify({
-                'message': 'Objetos detectados com sucesso!' if detections else 'Nenhum objeto detectado',
-                'detections': detections,
-                'response_text': response_text,
-                'total_objects': len(detections),
-                'audio_generated': audio_info is not None,
-                'audio_info': audio_info
-            })
-            
-        except Exception as e:
-            # Limpar arquivo temporário em caso de erro
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+            with stage('decode'):
+                image, scale = decode_image_bytes_scaled(image_data, DECODE_MIN_SIZE)
+        except ImageDecodeError:
+            return jsonify({'error': 'Formato de imagem inválido'}), 400
+        
+        return jsonify(run_detection_pipeline(image, tts_mode=tts_mode, scale=scale,
+                                               session_id=request.headers.get(SESSION_HEADER)))
             
+    except QueueFullError as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
 @app.route('/detect-base64', methods=['POST'])
+@require_ready
+@require_client
+@require_admission
 def detect_objects_base64():
     """Endpoint para receber imagens em base64"""
     try:
-        data = request.get_json()
+        try:
+            tts_mode = get_tts_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        with stage('body_read'):
+            data = request.get_json()
         
         if not data or 'image' not in data:
             return jsonify({'error': 'Dados de imagem não fornecidos'}), 400
         
-        # Decodificar imagem base64
+        # Decodificar imagem base64 direto para memória
         try:
-            image_data = base64.b64decode(data['image'])
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Salvar temporariamente
-            temp_filename = f"{uuid.uuid4()}.jpg"
-            temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
-            image.save(temp_path, 'JPEG')
-            
-        except Exception as e:
+            with stage('decode'):
+                image, scale = decode_base64_image_scaled(data['image'], DECODE_MIN_SIZE)
+        except ImageDecodeError:
             return jsonify({'error': 'Formato de imagem base64 inválido'}), 400
         
-        try:
-            # Detectar objetos
-            detections = yolo_detector.detect(temp_path)
-            
-            # Gerar resposta
-            response_text = response_generator.generate_response(detections)
-            
-            # Gerar e reproduzir áudio
-            audio_info = tts_generator.play_text(response_text)
-            
-            # Limpar arquivo temporário
-            os.remove(temp_path)
-            
-            return jsonify({
-                'message': 'Objetos detectados com sucesso!' if detections else 'Nenhum objeto detectado',
-                'detections': detections,
-                'response_text': response_text,
-                'total_objects': len(detections),
-                'audio_generated': audio_info is not None,
-                'audio_info': audio_info
-            })
-            
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+        return jsonify(run_detection_pipeline(image, tts_mode=tts_mode, scale=scale,
+                                               session_id=request.headers.get(SESSION_HEADER)))
             
+    except QueueFullError as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
 @app.route('/detect-bin', methods=['POST'])
+@require_ready
+@require_client
+@require_admission
 def detect_objects_binary():
     """Endpoint para receber imagens JPEG binárias diretamente"""
     try:
+        try:
+            tts_mode = get_tts_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Verificar se há dados na requisição
-        if not request.data:
+        with stage('body_read'):
+            image_data = request.data
+        if not image_data:
             return jsonify({'error': 'Nenhuma imagem enviada'}), 400
         
         # Verificar o Content-Type
         if request.content_type != 'image/jpeg':
             return jsonify({'error': 'Content-Type deve ser image/jpeg'}), 400
         
-        # Obter dados binários da imagem
-        image_data = request.data
+        # Decodificar dados binários da imagem
+        try:
+            with stage('decode'):
+                image, scale = decode_image_bytes_scaled(image_data, DECODE_MIN_SIZE)
+        except ImageDecodeError:
+            return jsonify({'error': 'Formato de imagem inválido'}), 400
         
-        # Salvar imagem temporariamente
-        temp_filename = f"{uuid.uuid4()}.jpg"
-        temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
+        return jsonify(run_detection_pipeline(image, tts_mode=tts_mode, scale=scale,
+                                               session_id=request.headers.get(SESSION_HEADER)))
+            
+    except QueueFullError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+def _parse_tts_selection(value):
+    """
+    Interpreta o parâmetro tts do /detect-batch
+    Returns:
+        True (todas as imagens), False (nenhuma) ou conjunto de nomes de arquivo
+    """
+    if value is None:
+        return False
+    normalized = value.strip().lower()
+    if normalized in ('1', 'true', 'all'):
+        return True
+    if normalized in ('', '0', 'false', 'none'):
+        return False
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+@app.route('/detect-batch', methods=['POST'])
+@require_ready
+@require_client
+def detect_objects_batch():
+    """Endpoint para várias imagens em uma requisição, com resultados em NDJSON"""
+    # Controle de admissão como em require_admission, mas a posição na fila (e o prazo) vale
+    # até o fim do streaming, que roda depois que a view retorna
+    try:
+        admission = admit_request(request.headers)
+    except QueueFullError as e:
+        return overloaded_response(e)
+    deadline = getattr(admission, 'deadline', None)
+    release = getattr(admission, 'release', lambda: None)
+    streaming = False
+    
+    try:
+        content_type = (request.mimetype or '').lower()
         
-        with open(temp_path, 'wb') as f:
-            f.write(image_data)
+        # Parâmetro tts: query string ou campo do formulário (o corpo zip/tar não deve ser lido aqui)
+        tts_value = request.args.get('tts')
+        if tts_value is None and content_type == 'multipart/form-data':
+            tts_value = request.form.get('tts')
+        tts_selection = _parse_tts_selection(tts_value) if AUDIO_ENABLED else False
         
-        try:
-            # Detectar objetos com YOLO
-            detections = yolo_detector.detect(temp_path)
-            
-            # Gerar resposta personalizada
-            response_text = response_generator.generate_response(detections)
+        # A geração da resposta roda depois que a view retorna: o cliente vai explícito
+        client = current_client()
+        
+        # Fontes de imagens: partes multipart ou arquivo zip/tar no corpo
+        if content_type == 'multipart/form-data':
+            files = [file for file in request.files.getlist('images') if file.filename]
+            if not files:
+                return jsonify({'error': 'Nenhuma imagem enviada'}), 400
+            sources = ((file.filename, file.read()) for file in files)
+        elif content_type in ZIP_CONTENT_TYPES or content_type in TAR_CONTENT_TYPES:
+            sources = iter_archive_images(request.stream, content_type, ALLOWED_EXTENSIONS)
+        else:
+            return jsonify({'error': 'Envie multipart/form-data (campo images) ou um arquivo zip/tar'}), 400
+        
+        def decode(filename, image_data):
+            if not allowed_file(filename):
+                raise ImageDecodeError('Tipo de arquivo não suportado')
+            with stage('decode'):
+                return decode_image_bytes_scaled(image_data, DECODE_MIN_SIZE)
+        
+        # Submeter a decodificação de cada imagem ao pool de threads conforme chegam
+        futures = {}
+        for index, (filename, image_data) in enumerate(sources):
+            if index >= MAX_BATCH_IMAGES:
+                return jsonify({'error': f'Máximo de {MAX_BATCH_IMAGES} imagens por lote'}), 413
+            future = decode_executor.submit(decode, filename, image_data)
+            futures[future] = (index, filename)
+        
+        if not futures:
+            return jsonify({'error': 'Nenhuma imagem válida no arquivo'}), 400
+        
+        chunk_size = BATCH_MAX_SIZE
+        
+        def process_chunk(chunk):
+            """Detecta um lote de imagens e retorna o resultado de cada uma"""
+            try:
+                with stage('detect'):
+                    results = [confident_detections(detections) for detections in
+                               detect_images([image for _, _, (image, _) in chunk], client=client,
+                                             deadline=deadline)]
+            except QueueFullError as e:
+                body, _ = overload_details(e)
+                return [{'index': index, 'filename': filename, **body} for index, filename, _ in chunk]
+            except Exception as e:
+                # Erro do modelo ou do servidor de inferência: o lote falha, o streaming continua
+                return [{'index': index, 'filename': filename, 'error': f'Erro interno: {str(e)}'}
+                        for index, filename, _ in chunk]
             
-            # Gerar e reproduzir áudio
-            audio_info = tts_generator.play_text(response_text)
+            lines = []
+            for (index, filename, (_, scale)), detections in zip(chunk, results):
+                detections = YOLODetector.rescale_detections(detections, scale)
+                play_audio = tts_selection is True or (isinstance(tts_selection, set) and filename in tts_selection)
+                try:
+                    body = build_detection_response(detections, tts_mode='sync' if play_audio else 'none')
+                except Exception as e:
+                    body = {'error': f'Erro interno: {str(e)}'}
+                lines.append({'index': index, 'filename': filename, **body})
+            return lines
+        
+        def generate():
+            chunk = []
+            errors = 0
             
-            # Limpar arquivo temporário
-            os.remove(temp_path)
+            def emit(lines):
+                nonlocal errors
+                for line in lines:
+                    errors += 'error' in line
+                    yield json.dumps(line, ensure_ascii=False) + '\n'
             
-            return jsonify({
-                'message': 'Objetos detectados com sucesso!' if detections else 'Nenhum objeto detectado',
-                'detections': detections,
-                'response_text': response_text,
-                'total_objects': len(detections),
-                'audio_generated': audio_info is not None,
-                'audio_info': audio_info
-            })
+            # Detectar em lotes à medida que as decodificações terminam
+            for future in as_completed(futures):
+                index, filename = futures[future]
+                try:
+                    chunk.append((index, filename, future.result()))
+                except ImageDecodeError as e:
+                    yield from emit([{'index': index, 'filename': filename, 'error': str(e)}])
+                    continue
+                
+                if len(chunk) >= chunk_size:
+                    yield from emit(process_chunk(chunk))
+                    chunk = []
             
-        except Exception as e:
-            # Limpar arquivo temporário em caso de erro
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+            if chunk:
+                yield from emit(process_chunk(chunk))
             
+            yield json.dumps({'done': True, 'total_images': len(futures), 'errors': errors}) + '\n'
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.call_on_close(release)
+        streaming = True
+        return response
+        
+    except ImageDecodeError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+    finally:
+        if not streaming:
+            release()
+
+def stream_frames(ws):
+    """
+    Streaming de frames por WebSocket: o cliente envia JPEGs (mensagens binárias ou base64
+    em texto) e recebe uma mensagem JSON de detecção por frame processado. Apenas o frame
+    mais recente é processado; os que chegam enquanto o modelo está ocupado são descartados
+    """
+    if not startup.ready:
+        ws.send(json.dumps({'type': 'error', 'error': 'API inicializando, tente novamente em instantes'}))
+        return
+    
+    try:
+        # Por padrão sem áudio; tts_mode=async envia audio_url em cada mensagem
+        tts_mode = get_tts_mode(default='none')
+    except ValueError as e:
+        ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+        return
+    
+    # Sessão do filtro de frames: header, query string ou uma por conexão
+    session_id = request.headers.get(SESSION_HEADER) or request.args.get('session') or f'stream-{id(ws)}'
+    
+    def process_frame(data):
+        with stage('decode'):
+            if isinstance(data, str):
+                image, scale = decode_base64_image_scaled(data, DECODE_MIN_SIZE)
+            else:
+                image, scale = decode_image_bytes_scaled(data, DECODE_MIN_SIZE)
+        return run_detection_pipeline(image, tts_mode=tts_mode, session_id=session_id, scale=scale)
+    
+    def send(message):
+        ws.send(json.dumps(message, ensure_ascii=False))
+    
+    stream = FrameStream(process_frame, send)
+    stream_registry.open(stream)
+    worker = threading.Thread(target=stream.run, name='frame-stream', daemon=True)
+    worker.start()
+    
+    try:
+        while True:
+            data = ws.receive()
+            if data is None:
+                break
+            stream.push(data)
+    except ConnectionClosed:
+        pass
+    finally:
+        stream.close()
+        worker.join(timeout=5)
+        stream_registry.close(stream)
+
+if sock is not None:
+    sock.route('/stream')(stream_frames)
+
+@app.route('/audio/<job_id>', methods=['GET'])
+@require_ready
+def get_audio(job_id):
+    """Endpoint para buscar o áudio de um job assíncrono (aceita long-poll via ?wait=segundos)"""
+    if not AUDIO_ENABLED:
+        return audio_disabled_response()
+    
+    try:
+        wait_seconds = min(float(request.args.get('wait', 0)), AUDIO_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'Parâmetro wait inválido'}), 400
+    
+    job = audio_jobs.get(job_id, wait_seconds=wait_seconds)
+    if job is None:
+        return jsonify({'error': 'Job de áudio não encontrado'}), 404
+    
+    if job.status == 'pending':
+        return jsonify(job.to_dict()), 202
+    if job.status == 'failed':
+        return jsonify(job.to_dict()), 500
+    
+    return send_file(io.BytesIO(job.audio_data), mimetype='audio/mpeg',
+                     download_name=f'{job.id}.mp3')
 
 @app.route('/tts', methods=['POST'])
+@require_ready
 def text_to_speech():
     """Endpoint para converter texto em áudio e reproduzir"""
+    if not AUDIO_ENABLED:
+        return audio_disabled_response()
+    
     try:
-        data = request.get_json()
+        with stage('body_read'):
+            data = request.get_json()
         
         if not data or 'text' not in data:
             return jsonify({'error': 'Texto não fornecido'}), 400
@@ -232,10 +1180,17 @@ def get_api_info():
         'description': 'API para detecção de objetos usando YOLO com TTS e reprodução de áudio',
         'endpoints': {
             'health': 'GET /health - Verificação de saúde',
+            'ready': 'GET /ready - Prontidão (modelo carregado e aquecido)',
             'detect': 'POST /detect - Upload de imagem',
             'detect-base64': 'POST /detect-base64 - Imagem em base64',
             'detect-bin': 'POST /detect-bin - Imagem JPEG binária',
+            'detect-batch': 'POST /detect-batch - Várias imagens (multipart ou zip/tar), resposta NDJSON',
+            'stream': 'WS /stream - Streaming de frames JPEG por WebSocket (processa sempre o mais recente)',
             'tts': 'POST /tts - Texto para fala',
+            'audio': 'GET /audio/<id> - Áudio de um job assíncrono (tts_mode=async)',
+            'stats': 'GET /stats - Estatísticas de execução',
+            'metrics': 'GET /metrics - Métricas no formato Prometheus',
+            'admin-profile': 'POST /admin/profile - Perfil por amostragem das threads (requer ADMIN_TOKEN)',
             'info': 'GET /info - Informações da API'
         },
         'features': {
@@ -255,8 +1210,15 @@ if __name__ == '__main__':
     print("   - POST /detect - Upload de imagem")
     print("   - POST /detect-base64 - Imagem em base64")
     print("   - POST /detect-bin - Imagem JPEG binária")
+    print("   - POST /detect-batch - Várias imagens (NDJSON)")
+    print("   - WS /stream - Streaming de frames por WebSocket")
     print("   - POST /tts - Texto para fala")
+    print("   - GET /audio/<id> - Áudio de job assíncrono")
     print("   - GET /health - Verificação de saúde")
+    print("   - GET /ready - Prontidão do modelo")
+    print("   - GET /stats - Estatísticas de execução")
+    print("   - GET /metrics - Métricas Prometheus")
+    print("   - POST /admin/profile - Perfil por amostragem (ADMIN_TOKEN)")
     print("   - GET /info - Informações da API")
     print("\n🎯 Modelo YOLO carregando...")
     print("🔊 Sistema de áudio inicializando...")
@@ -264,5 +1226,4 @@ if __name__ == '__main__':
     try:
         app.run(host='0.0.0.0', port=5000, debug=True)
     finally:
-        # Limpeza ao finalizar
-        tts_generator.cleanup()
+        shutdown()
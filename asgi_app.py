@@ -0,0 +1,438 @@
+"""
+Modo de serviço ASGI da API YOLO (Starlette + uvicorn)
+
+As rotas de detecção, /tts, /audio/<id> e /stream rodam em um event loop: leitura do
+corpo, upload multipart, long-poll de áudio e mensagens do WebSocket são aguardados sem
+ocupar threads. Decodificação + inferência e síntese de fala são entregues a dois pools de
+threads limitados, então o número de conexões abertas não depende do número de threads.
+As demais rotas (/health, /ready, /info, /stats, /metrics, /detect-batch, /admin/profile)
+são atendidas pelo próprio app Flask através de uma ponte WSGI.
+
+Componentes, configuração e esquema das respostas são os de app.py.
+
+Uso: uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+import app as api
+from admission import check_deadline, current_deadline
+from batch_scheduler import QueueFullError
+from fair_scheduler import client_context, current_client, UnknownAPIKeyError, RateLimitedError
+from frame_stream import FrameStream
+from image_loader import decode_image_bytes_scaled, decode_base64_image_scaled, ImageDecodeError
+from metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT, stage,
+    start_request_timings, finish_request_timings, format_server_timing
+)
+
+# Threads de decodificação + inferência: com micro-batching, precisam ser ao menos
+# BATCH_MAX_SIZE para que requisições concorrentes cheguem juntas ao agendador, e ao menos
+# FAIR_SLOTS para que a ordem da fila justa não se perca na fila FIFO do pool
+ASGI_INFERENCE_THREADS = int(os.environ.get('ASGI_INFERENCE_THREADS', max(
+    4, api.BATCH_MAX_SIZE, api.FAIR_SLOTS if api.fair_scheduler is not None else 0)))
+# Threads de síntese e reprodução de fala (chamadas de rede ao gTTS)
+ASGI_TTS_THREADS = int(os.environ.get('ASGI_TTS_THREADS', 4))
+# Threads da ponte WSGI (rotas atendidas pelo Flask)
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+inference_executor = ThreadPoolExecutor(max_workers=ASGI_INFERENCE_THREADS, thread_name_prefix='asgi-inference')
+tts_executor = ThreadPoolExecutor(max_workers=ASGI_TTS_THREADS, thread_name_prefix='asgi-tts')
+
+
+async def run_in(executor, function, *args):
+    """
+    Executa uma função bloqueante em um pool de threads e aguarda o resultado
+    O contexto é copiado para que as etapas medidas na thread entrem no Server-Timing da requisição
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, function, *args)
+
+
+def error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def endpoint(rule):
+    """
+    Envolve uma rota assíncrona com as métricas HTTP, o header Server-Timing e a resposta
+    503 (com Retry-After) enquanto o modelo não estiver carregado e aquecido
+    Args:
+        rule: Rota no formato do Flask (label endpoint das métricas, igual ao do modo WSGI)
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request):
+            start = time.perf_counter()
+            HTTP_IN_FLIGHT.inc(endpoint=rule)
+            start_request_timings()
+            status = 500
+            try:
+                if not api.startup.ready:
+                    response = JSONResponse({
+                        'error': 'API inicializando, tente novamente em instantes',
+                        'startup': api.startup.get_status()
+                    }, status_code=503, headers={'Retry-After': str(api.STARTUP_RETRY_AFTER)})
+                else:
+                    response = await view(request)
+                status = response.status_code
+                stages = finish_request_timings()
+                if stages:
+                    response.headers['Server-Timing'] = format_server_timing(stages, total=time.perf_counter() - start)
+                return response
+            finally:
+                finish_request_timings()
+                HTTP_IN_FLIGHT.dec(endpoint=rule)
+                HTTP_REQUESTS.inc(endpoint=rule, method=request.method, status=status)
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=rule, method=request.method)
+        return wrapper
+    return decorator
+
+
+def overloaded(error):
+    """Resposta 503 com Retry-After para fila de inferência cheia ou prazo esgotado"""
+    body, headers = api.overload_details(error)
+    return JSONResponse(body, status_code=503, headers=headers)
+
+
+def identified(view):
+    """Identifica o cliente (fila justa): 401 para API key desconhecida, 429 acima da taxa"""
+    @wraps(view)
+    async def wrapper(request):
+        try:
+            identity = api.identify_request(request.headers, request.client.host if request.client else None)
+        except (UnknownAPIKeyError, RateLimitedError) as e:
+            body, status, headers = api.client_error_details(e)
+            return JSONResponse(body, status_code=status, headers=headers)
+        with client_context(identity):
+            return await view(request)
+    return wrapper
+
+
+@asynccontextmanager
+async def inference_slot():
+    """Vaga da fila justa, esperada no event loop antes de ocupar uma thread do pool de inferência"""
+    if api.fair_scheduler is None:
+        yield
+        return
+    async with api.fair_scheduler.slot_async(current_client(), deadline=current_deadline()):
+        yield
+
+
+def admitted(view):
+    """
+    Controle de admissão antes de ler o corpo: com a fila cheia, 503 imediato; o prazo da
+    requisição acompanha o trabalho enviado aos pools (contexto copiado em run_in)
+    """
+    @wraps(view)
+    async def wrapper(request):
+        try:
+            admission = api.admit_request(request.headers)
+        except QueueFullError as e:
+            return overloaded(e)
+        with admission:
+            return await view(request)
+    return wrapper
+
+
+def get_tts_mode(request, default='sync'):
+    """Lê o modo de TTS da query string (sync, async ou none)"""
+    tts_mode = request.query_params.get('tts_mode', default).lower()
+    if tts_mode not in api.TTS_MODES:
+        raise ValueError(f"tts_mode inválido: use {', '.join(sorted(api.TTS_MODES))}")
+    # Sem áudio no perfil de detecção
+    return tts_mode if api.AUDIO_ENABLED else 'none'
+
+
+def _decode_and_describe(decode, data, session_id):
+    """Decodificação, detecção, rastreamento e texto da resposta (executado no pool de inferência)"""
+    # Prazo esgotado esperando uma thread do pool: nem decodificar
+    check_deadline()
+    with stage('decode'):
+        image, scale = decode(data, api.DECODE_MIN_SIZE)
+    detections, tracking = api.detect_and_track(image, session_id=session_id, scale=scale)
+    return api.describe_detections(detections, tracking=tracking)
+
+
+async def detection_response(request, decode, data, tts_mode, invalid_message):
+    """
+    Executa o pipeline de detecção fora do event loop e monta a resposta JSON
+    A síntese síncrona roda no pool de TTS, sem ocupar uma thread de inferência
+    """
+    try:
+        try:
+            async with inference_slot():
+                response, segments = await run_in(
+                    inference_executor, _decode_and_describe, decode, data, request.headers.get(api.SESSION_HEADER))
+        except ImageDecodeError:
+            return error(invalid_message, 400)
+
+        if tts_mode == 'sync':
+            response = await run_in(tts_executor, api.attach_audio, response, segments, tts_mode)
+        else:
+            response = api.attach_audio(response, segments, tts_mode)
+        return JSONResponse(response)
+
+    except QueueFullError as e:
+        return overloaded(e)
+    except Exception as e:
+        return error(f'Erro interno: {str(e)}', 500)
+
+
+async def read_json(request):
+    """Lê o corpo JSON da requisição (None se vazio ou inválido)"""
+    with stage('body_read'):
+        body = await request.body()
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+@endpoint('/detect')
+@identified
+@admitted
+async def detect_objects(request):
+    """Endpoint principal para detecção de objetos (upload multipart)"""
+    try:
+        tts_mode = get_tts_mode(request)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    # Upload lido do socket pelo event loop (partes grandes vão para arquivo temporário)
+    with stage('body_read'):
+        try:
+            form = await request.form()
+        except Exception:
+            return error('Nenhuma imagem enviada', 400)
+        try:
+            file = form.get('image')
+            if not isinstance(file, UploadFile):
+                return error('Nenhuma imagem enviada', 400)
+            if not file.filename:
+                return error('Nenhum arquivo selecionado', 400)
+            if not api.allowed_file(file.filename):
+                return error('Tipo de arquivo não suportado', 400)
+            image_data = await file.read()
+        finally:
+            await form.close()
+
+    return await detection_response(request, decode_image_bytes_scaled, image_data, tts_mode,
+                                    'Formato de imagem inválido')
+
+
+@endpoint('/detect-base64')
+@identified
+@admitted
+async def detect_objects_base64(request):
+    """Endpoint para receber imagens em base64"""
+    try:
+        tts_mode = get_tts_mode(request)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    data = await read_json(request)
+    if not isinstance(data, dict) or 'image' not in data:
+        return error('Dados de imagem não fornecidos', 400)
+
+    return await detection_response(request, decode_base64_image_scaled, data['image'], tts_mode,
+                                    'Formato de imagem base64 inválido')
+
+
+@endpoint('/detect-bin')
+@identified
+@admitted
+async def detect_objects_binary(request):
+    """Endpoint para receber imagens JPEG binárias diretamente"""
+    try:
+        tts_mode = get_tts_mode(request)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    with stage('body_read'):
+        image_data = await request.body()
+    if not image_data:
+        return error('Nenhuma imagem enviada', 400)
+
+    if request.headers.get('content-type') != 'image/jpeg':
+        return error('Content-Type deve ser image/jpeg', 400)
+
+    return await detection_response(request, decode_image_bytes_scaled, image_data, tts_mode,
+                                    'Formato de imagem inválido')
+
+
+@endpoint('/tts')
+async def text_to_speech(request):
+    """Endpoint para converter texto em áudio e reproduzir"""
+    if not api.AUDIO_ENABLED:
+        return error(f'Áudio desativado no perfil {api.APP_PROFILE}', 404)
+
+    try:
+        data = await read_json(request)
+        if not isinstance(data, dict) or 'text' not in data:
+            return error('Texto não fornecido', 400)
+
+        text = data['text']
+        audio_info = await run_in(tts_executor, api.tts_generator.generate_and_play, text,
+                                  data.get('play_audio', True))
+
+        if audio_info:
+            return JSONResponse({
+                'message': 'Áudio gerado e reproduzido com sucesso!',
+                'text': text,
+                'audio_info': audio_info
+            })
+        return error('Falha ao gerar áudio', 500)
+
+    except Exception as e:
+        return error(f'Erro interno: {str(e)}', 500)
+
+
+@endpoint('/audio/<job_id>')
+async def get_audio(request):
+    """Áudio de um job assíncrono; o long-poll (?wait=segundos) espera no event loop"""
+    if not api.AUDIO_ENABLED:
+        return error(f'Áudio desativado no perfil {api.APP_PROFILE}', 404)
+
+    try:
+        wait_seconds = min(float(request.query_params.get('wait', 0)), api.AUDIO_MAX_WAIT)
+    except ValueError:
+        return error('Parâmetro wait inválido', 400)
+
+    job = api.audio_jobs.get(request.path_params['job_id'])
+    if job is None:
+        return error('Job de áudio não encontrado', 404)
+
+    if wait_seconds > 0 and not job.done_event.is_set():
+        # O job avisa o event loop ao terminar; nenhuma thread fica presa no long-poll
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        job.add_done_callback(lambda: loop.call_soon_threadsafe(done.set))
+        try:
+            await asyncio.wait_for(done.wait(), wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    if job.status == 'pending':
+        return JSONResponse(job.to_dict(), status_code=202)
+    if job.status == 'failed':
+        return JSONResponse(job.to_dict(), status_code=500)
+
+    return Response(job.audio_data, media_type='audio/mpeg',
+                    headers={'Content-Disposition': f'attachment; filename={job.id}.mp3'})
+
+
+async def stream_frames(websocket):
+    """
+    Streaming de frames por WebSocket (mesmo protocolo do modo WSGI): apenas o frame mais
+    recente é processado, no pool de inferência; a conexão não ocupa uma thread
+    """
+    await websocket.accept()
+
+    async def send(message):
+        await websocket.send_text(json.dumps(message, ensure_ascii=False))
+
+    if not api.startup.ready:
+        await send({'type': 'error', 'error': 'API inicializando, tente novamente em instantes'})
+        await websocket.close()
+        return
+
+    try:
+        # Por padrão sem áudio; tts_mode=async envia audio_url em cada mensagem
+        tts_mode = get_tts_mode(websocket, default='none')
+    except ValueError as e:
+        await send({'type': 'error', 'error': str(e)})
+        await websocket.close()
+        return
+
+    # Sessão do filtro de frames: header, query string ou uma por conexão
+    session_id = (websocket.headers.get(api.SESSION_HEADER) or websocket.query_params.get('session')
+                  or f'stream-{id(websocket)}')
+
+    def process_frame(data):
+        with stage('decode'):
+            if isinstance(data, str):
+                image, scale = decode_base64_image_scaled(data, api.DECODE_MIN_SIZE)
+            else:
+                image, scale = decode_image_bytes_scaled(data, api.DECODE_MIN_SIZE)
+        return api.run_detection_pipeline(image, tts_mode=tts_mode, session_id=session_id, scale=scale)
+
+    stream = FrameStream(process_frame, send=None)
+    api.stream_registry.open(stream)
+    frame_ready = asyncio.Event()
+
+    async def process_frames():
+        while not stream.closed:
+            await frame_ready.wait()
+            frame_ready.clear()
+            frame = stream.take()
+            if frame is None:
+                continue
+            message = await run_in(inference_executor, stream.process, frame)
+            try:
+                await send(message)
+            except Exception:
+                # Cliente desconectado
+                stream.close()
+
+    processor = asyncio.ensure_future(process_frames())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            data = message.get('bytes')
+            stream.push(data if data is not None else message.get('text'))
+            frame_ready.set()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.close()
+        frame_ready.set()
+        try:
+            await asyncio.wait_for(processor, timeout=5)
+        except Exception:
+            pass
+        api.stream_registry.close(stream)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    inference_executor.shutdown(wait=False)
+    tts_executor.shutdown(wait=False)
+    api.shutdown()
+
+
+routes = [
+    Route('/detect', detect_objects, methods=['POST']),
+    Route('/detect-base64', detect_objects_base64, methods=['POST']),
+    Route('/detect-bin', detect_objects_binary, methods=['POST']),
+    Route('/tts', text_to_speech, methods=['POST']),
+    Route('/audio/{job_id}', get_audio, methods=['GET']),
+    WebSocketRoute('/stream', stream_frames),
+    # Demais rotas: o app Flask, com as mesmas respostas do modo WSGI
+    Mount('/', app=WSGIMiddleware(api.app, workers=ASGI_WSGI_THREADS))
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
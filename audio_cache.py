@@ -0,0 +1,133 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class AudioCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None):
+        """
+        Inicializa o cache de áudio (LRU em memória limitado por bytes + camada opcional em disco)
+        Args:
+            max_bytes: Tamanho máximo do cache em memória, em bytes
+            disk_dir: Pasta para a camada em disco (None desativa)
+        """
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_dir = disk_dir
+
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, language, slow):
+        """Gera a chave de conteúdo para (texto, idioma, velocidade)"""
+        payload = f"{language}\x00{int(bool(slow))}\x00{text}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.mp3")
+
+    def __contains__(self, key):
+        """Verifica se a chave está em cache (memória ou disco) sem alterar os contadores"""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    def get(self, key):
+        """
+        Busca um áudio no cache
+        Args:
+            key: Chave gerada por make_key
+        Returns:
+            Bytes do MP3 ou None se não estiver em cache
+        """
+        with self._lock:
+            audio_data = self._entries.get(key)
+            if audio_data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio_data
+
+        # Camada em disco
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    audio_data = f.read()
+            except OSError:
+                audio_data = None
+
+            if audio_data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store(key, audio_data)
+                return audio_data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, audio_data):
+        """
+        Adiciona um áudio ao cache (memória e, se habilitado, disco)
+        Args:
+            key: Chave gerada por make_key
+            audio_data: Bytes do MP3
+        """
+        self._store(key, audio_data)
+
+        if self.disk_dir:
+            # Escrita atômica: arquivo temporário na mesma pasta + rename
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(audio_data)
+                os.replace(temp_path, self._disk_path(key))
+            except OSError as e:
+                print(f"⚠️ Aviso: falha ao gravar áudio no cache em disco: {e}")
+
+    def _store(self, key, audio_data):
+        """Insere na camada em memória, removendo os itens menos usados se necessário"""
+        size = len(audio_data)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= len(previous)
+
+            self._entries[key] = audio_data
+            self._current_bytes += size
+
+            while self._current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_stats(self):
+        """Retorna contadores do cache"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'disk_enabled': bool(self.disk_dir),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
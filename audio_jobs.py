@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AudioJob:
+    def __init__(self, text, play_audio, segments=None):
+        """
+        Representa uma síntese de áudio em segundo plano
+        Args:
+            text: Texto a ser convertido em áudio
+            play_audio: Se o áudio deve ser reproduzido no servidor após a síntese
+            segments: Fragmentos do texto, para síntese por fragmentos (opcional)
+        """
+        self.id = uuid.uuid4().hex
+        self.text = text
+        self.segments = segments
+        self.play_audio = play_audio
+        self.status = 'pending'
+        self.created_at = time.time()
+        self.audio_data = None
+        self.cached = False
+        self.error = None
+        self.done_event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_done_callback(self, callback):
+        """
+        Registra uma função chamada (sem argumentos) quando o job terminar
+        Se o job já terminou, a função é chamada imediatamente
+        """
+        with self._lock:
+            if not self.done_event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def _finish(self):
+        """Marca o job como concluído e chama as funções registradas"""
+        with self._lock:
+            self.done_event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Erro ao notificar a conclusão do job de áudio {self.id}: {e}")
+
+    def to_dict(self):
+        """Retorna o estado do job para respostas JSON"""
+        info = {
+            'job_id': self.id,
+            'status': self.status,
+            'text': self.text
+        }
+        if self.status == 'done':
+            info['file_size'] = len(self.audio_data)
+            info['cached'] = self.cached
+        elif self.status == 'failed':
+            info['error'] = self.error
+        return info
+
+
+class AudioJobManager:
+    def __init__(self, tts_generator, max_workers=2, ttl_seconds=300):
+        """
+        Inicializa o gerenciador de jobs de áudio assíncronos
+        Args:
+            tts_generator: TTSGenerator usado para sintetizar e reproduzir
+            max_workers: Número de threads de síntese
+            ttl_seconds: Tempo que um job fica disponível para consulta
+        """
+        self.tts_generator = tts_generator
+        self.max_workers = max(1, int(max_workers))
+        self.ttl_seconds = ttl_seconds
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+        # Contadores
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self):
+        """Cria o pool de threads sob demanda (inclusive após fork)"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='audio-job')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, text, play_audio=True, segments=None):
+        """
+        Agenda a síntese do texto e retorna imediatamente
+        Args:
+            text: Texto a ser convertido em áudio
+            play_audio: Se o áudio deve ser reproduzido no servidor
+            segments: Fragmentos do texto; se informados, o áudio é montado por fragmentos
+        Returns:
+            ID do job
+        """
+        job = AudioJob(text, play_audio, segments=segments)
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self.submitted += 1
+            executor = self._get_executor()
+
+        executor.submit(self._run, job)
+        return job.id
+
+    def _run(self, job):
+        """Executa a síntese (e a reprodução, se solicitada) de um job"""
+        try:
+            if job.segments:
+                job.audio_data, job.cached = self.tts_generator.synthesize_segments(job.segments)
+            else:
+                job.audio_data, job.cached = self.tts_generator.synthesize(job.text)
+            job.status = 'done'
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"❌ Erro no job de áudio {job.id}: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+            with self._lock:
+                self.failed += 1
+        finally:
+            job._finish()
+
+        if job.status == 'done' and job.play_audio:
+            self.tts_generator.play_audio_data(job.audio_data)
+
+    def _prune(self):
+        """Remove jobs expirados (chamado com o lock adquirido)"""
+        expires_before = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done_event.is_set() and job.created_at < expires_before]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id, wait_seconds=0):
+        """
+        Consulta um job, aguardando opcionalmente a conclusão (long-poll)
+        Args:
+            job_id: ID retornado por submit
+            wait_seconds: Tempo máximo de espera se o job ainda estiver pendente
+        Returns:
+            AudioJob ou None se não existir
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+
+        if job is not None and wait_seconds > 0:
+            job.done_event.wait(wait_seconds)
+
+        return job
+
+    def get_stats(self):
+        """Retorna contadores dos jobs de áudio"""
+        with self._lock:
+            return {
+                'jobs': len(self._jobs),
+                'pending': sum(1 for job in self._jobs.values() if job.status == 'pending'),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'max_workers': self.max_workers
+            }
@@ -0,0 +1,168 @@
+import io
+import os
+import threading
+from collections import deque
+from metrics import stage
+
+
+class AudioPlayer:
+    # Políticas quando já há áudio tocando ou na fila
+    POLICIES = ('drop', 'coalesce', 'interrupt')
+
+    def __init__(self, max_queue_size=8, policy='drop'):
+        """
+        Inicializa o subsistema de reprodução (única thread dona do mixer do pygame)
+        Args:
+            max_queue_size: Número máximo de áudios aguardando reprodução
+            policy: 'drop' (descarta novos áudios com a fila cheia), 'coalesce' (mantém
+                apenas o áudio mais recente na fila) ou 'interrupt' (interrompe o áudio
+                atual e toca o novo imediatamente)
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de reprodução inválida: {policy}")
+
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.policy = policy
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._interrupt = False
+        self._busy = False
+        self._running = True
+        self._worker = None
+        self._worker_pid = None
+
+        # Contadores
+        self.played = 0
+        self.dropped = 0
+        self.interrupted = 0
+        self.failed = 0
+
+        # Inicializar pygame para reprodução de áudio (importado só aqui para não
+        # pesar na inicialização quando o áudio está desativado)
+        self._mixer = None
+        try:
+            import pygame
+            pygame.mixer.init()
+            self._mixer = pygame.mixer
+            self.available = True
+            print("✅ Sistema de áudio inicializado!")
+        except Exception as e:
+            self.available = False
+            print(f"⚠️ Aviso: Sistema de áudio não disponível: {e}")
+            print("   A API funcionará, mas sem reprodução de áudio")
+
+    def _ensure_worker(self):
+        """Inicia a thread de reprodução sob demanda (chamado com o lock adquirido)"""
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        self._worker = threading.Thread(target=self._run, name='audio-player', daemon=True)
+        self._worker_pid = os.getpid()
+        self._worker.start()
+
+    def enqueue(self, audio_data):
+        """
+        Enfileira um MP3 para reprodução e retorna imediatamente
+        Args:
+            audio_data: Bytes do MP3
+        Returns:
+            'queued', 'dropped' ou 'unavailable'
+        """
+        if not self.available:
+            return 'unavailable'
+
+        with self._condition:
+            self._ensure_worker()
+
+            if self.policy == 'drop':
+                if len(self._queue) >= self.max_queue_size:
+                    self.dropped += 1
+                    return 'dropped'
+
+            elif self.policy == 'coalesce':
+                # Apenas o áudio mais recente continua esperando
+                self.dropped += len(self._queue)
+                self._queue.clear()
+
+            elif self.policy == 'interrupt':
+                self.dropped += len(self._queue)
+                self._queue.clear()
+                if self._busy:
+                    self._interrupt = True
+
+            self._queue.append(audio_data)
+            self._condition.notify_all()
+
+        return 'queued'
+
+    def _run(self):
+        """Loop da thread de reprodução"""
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                audio_data = self._queue.popleft()
+                self._busy = True
+                self._interrupt = False
+
+            with stage('tts_playback'):
+                self._play(audio_data)
+
+            with self._condition:
+                self._busy = False
+
+    def _play(self, audio_data):
+        """Reproduz um áudio, aguardando o fim sem ocupar threads de requisição"""
+        try:
+            self._mixer.music.load(io.BytesIO(audio_data), 'mp3')
+            self._mixer.music.play()
+
+            while self._mixer.music.get_busy():
+                with self._condition:
+                    if self._interrupt or not self._running:
+                        self._mixer.music.stop()
+                        self.interrupted += 1
+                        return
+                    self._condition.wait(0.05)
+
+            with self._condition:
+                self.played += 1
+
+        except Exception as e:
+            print(f"❌ Erro ao reproduzir áudio: {e}")
+            with self._condition:
+                self.failed += 1
+
+    def get_stats(self):
+        """Retorna estatísticas da fila de reprodução"""
+        with self._condition:
+            return {
+                'available': self.available,
+                'policy': self.policy,
+                'queue_depth': len(self._queue),
+                'max_queue_size': self.max_queue_size,
+                'busy': self._busy,
+                'played': self.played,
+                'dropped': self.dropped,
+                'interrupted': self.interrupted,
+                'failed': self.failed
+            }
+
+    def close(self):
+        """Interrompe a reprodução e libera o mixer"""
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._condition.notify_all()
+
+        if self._worker is not None and self._worker.is_alive():
+            self._worker.join(timeout=1)
+
+        if self._mixer is None:
+            return
+        try:
+            self._mixer.quit()
+        except Exception:
+            pass
@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class QueueFullError(RuntimeError):
+    """Erro levantado quando a fila de inferência atingiu a profundidade máxima"""
+
+
+class DeadlineExceededError(QueueFullError):
+    """Erro levantado quando o prazo da requisição esgota antes da inferência (a imagem não é processada)"""
+
+
+def wait_result(future, deadline=None, timeout=None):
+    """
+    Aguarda o resultado de uma inferência até o prazo da requisição
+    Args:
+        future: Future retornado por submit
+        deadline: Prazo em time.monotonic() (None = sem prazo)
+        timeout: Espera máxima adicional (segundos)
+    Returns:
+        Resultado da detecção
+    """
+    if deadline is not None:
+        remaining = max(0.0, deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Ainda na fila: cancelar para que a imagem não chegue ao modelo
+        future.cancel()
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceededError("Prazo da requisição esgotado aguardando a inferência")
+        raise
+
+
+class BatchScheduler:
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=5, max_queue_size=64):
+        """
+        Inicializa o agendador de micro-batching na frente do YOLODetector
+        Args:
+            detector: Instância de YOLODetector (precisa de detect_batch)
+            max_batch_size: Número máximo de imagens por forward
+            max_wait_ms: Tempo máximo que a primeira imagem espera o lote encher
+            max_queue_size: Profundidade máxima da fila de requisições pendentes
+        """
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.max_queue_size = max(1, int(max_queue_size))
+
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        # Estatísticas
+        self._batch_sizes = Counter()
+        self._total_images = 0
+        self._total_queue_wait = 0.0
+        self._rejected = 0
+        self._expired = 0
+
+    def _ensure_worker(self):
+        """Inicia a thread de inferência sob demanda (inclusive após fork)"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, image, columnar=False, deadline=None):
+        """
+        Enfileira uma imagem para o próximo lote
+        Args:
+            image: numpy.ndarray (BGR), PIL.Image ou caminho
+            columnar: Formato de saída, como em YOLODetector.detect
+            deadline: Prazo em time.monotonic(); se já tiver passado quando o lote for
+                montado, a imagem é descartada com DeadlineExceededError
+        Returns:
+            concurrent.futures.Future com o resultado da detecção
+        """
+        self._ensure_worker()
+
+        future = Future()
+        try:
+            self._queue.put_nowait((image, columnar, future, time.monotonic(), deadline))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"Fila de inferência cheia ({self.max_queue_size} requisições)")
+
+        return future
+
+    def detect(self, image, columnar=False, timeout=None, deadline=None):
+        """
+        Mesma interface de YOLODetector.detect, passando pelo lote
+        Args:
+            image: numpy.ndarray (BGR), PIL.Image ou caminho
+            columnar: Formato de saída, como em YOLODetector.detect
+            timeout: Tempo máximo de espera pelo resultado (segundos)
+            deadline: Prazo da requisição em time.monotonic()
+        """
+        return wait_result(self.submit(image, columnar=columnar, deadline=deadline), deadline, timeout)
+
+    def _collect_batch(self):
+        """Bloqueia até a primeira imagem e junta outras até encher o lote ou estourar o tempo"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Tempo esgotado: levar apenas o que já está na fila
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Loop da thread de inferência"""
+        while True:
+            batch = self._collect_batch()
+
+            # Descartar requisições canceladas ou com o prazo esgotado antes da inferência
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            now = time.monotonic()
+            expired = [item for item in batch if item[4] is not None and item[4] <= now]
+            if expired:
+                with self._lock:
+                    self._expired += len(expired)
+                for item in expired:
+                    item[2].set_exception(DeadlineExceededError("Prazo da requisição esgotado na fila de inferência"))
+                batch = [item for item in batch if item[4] is None or item[4] > now]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        """Executa um único forward para o lote e devolve cada resultado ao seu Future"""
+        started = time.monotonic()
+
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._total_images += len(batch)
+            self._total_queue_wait += sum(started - enqueued for _, _, _, enqueued, _ in batch)
+
+        try:
+            outputs = self.detector.detect_batch([image for image, _, _, _, _ in batch], columnar=True)
+        except Exception as e:
+            for _, _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, columnar, future, _, _), columns in zip(batch, outputs):
+            if columnar:
+                future.set_result(columns)
+            else:
+                future.set_result(self.detector.columns_to_detections(columns))
+
+    def get_stats(self):
+        """Retorna estatísticas de batching para ajuste de throughput vs latência"""
+        with self._lock:
+            total_batches = sum(self._batch_sizes.values())
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'max_queue_size': self.max_queue_size,
+                'queue_depth': self._queue.qsize(),
+                'batches': total_batches,
+                'images': self._total_images,
+                'avg_batch_size': round(self._total_images / total_batches, 2) if total_batches else 0.0,
+                'avg_queue_wait_ms': round(self._total_queue_wait / self._total_images * 1000, 2) if self._total_images else 0.0,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                'rejected': self._rejected,
+                'expired': self._expired
+            }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de inferência do YOLODetector
+Compara latência e throughput de cada backend no mesmo conjunto de imagens
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+import cv2
+from yolo_detector import YOLODetector
+from inference_backends import BACKENDS
+from quantization import list_images
+
+
+def load_images(images_dir, count, size):
+    """Carrega as imagens da pasta ou gera imagens sintéticas se nenhuma pasta for informada"""
+    if images_dir:
+        images = [cv2.imread(path) for path in list_images(images_dir)[:count]]
+        images = [image for image in images if image is not None]
+        if not images:
+            raise SystemExit(f"❌ Nenhuma imagem válida em {images_dir}")
+        return images
+
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def benchmark_backend(backend, images, args):
+    """Mede latência por imagem e throughput em lote para um backend"""
+    print(f"\n⚙️  Backend: {backend}")
+    load_start = time.perf_counter()
+    try:
+        detector = YOLODetector(model_path=args.model, backend=backend, imgsz=args.imgsz, cache_dir=args.cache_dir,
+                                calibration_dir=args.calibration)
+    except RuntimeError as e:
+        print(f"⚠️ {e}, pulando")
+        return None
+    load_seconds = time.perf_counter() - load_start
+
+    # Aquecimento
+    for image in images[:args.warmup]:
+        detector.detect(image, columnar=True)
+
+    # Latência por imagem (lote de 1)
+    latencies = []
+    for _ in range(args.runs):
+        for image in images:
+            start = time.perf_counter()
+            detector.detect(image, columnar=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # Throughput em lotes
+    batch_start = time.perf_counter()
+    processed = 0
+    for _ in range(args.runs):
+        for index in range(0, len(images), args.batch_size):
+            batch = images[index:index + args.batch_size]
+            detector.detect_batch(batch, columnar=True)
+            processed += len(batch)
+    batch_seconds = time.perf_counter() - batch_start
+
+    return {
+        'backend': backend,
+        'load_seconds': round(load_seconds, 3),
+        'images': len(latencies),
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2)
+        },
+        'batch_size': args.batch_size,
+        'throughput_ips': round(processed / batch_seconds, 2) if batch_seconds else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara backends de inferência do YOLODetector')
+    parser.add_argument('--images', help='Pasta com imagens (padrão: imagens sintéticas)')
+    parser.add_argument('--count', type=int, default=32, help='Número de imagens usadas')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS),
+                        help='Backends comparados (padrão: todos; onnx-int8 só com --calibration)')
+    parser.add_argument('--calibration', help='Pasta de imagens de calibração para o backend onnx-int8')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--cache-dir', default='model_cache')
+    parser.add_argument('--runs', type=int, default=3, help='Repetições sobre o conjunto de imagens')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    if not args.backends:
+        args.backends = [backend for backend in BACKENDS if backend != 'onnx-int8' or args.calibration]
+
+    images = load_images(args.images, args.count, args.imgsz)
+    print(f"🖼️  {len(images)} imagens, {args.runs} repetições")
+
+    results = [result for backend in args.backends
+               if (result := benchmark_backend(backend, images, args)) is not None]
+
+    print("\n📊 Resultados")
+    print(f"{'backend':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'img/s (lote)':>13}")
+    for result in results:
+        latency = result['latency_ms']
+        print(f"{result['backend']:<12} {latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8} "
+              f"{result['throughput_ips']:>13}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Resultados salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
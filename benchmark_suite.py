@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks offline do detector, do gerador de respostas e do TTS
+Salva os resultados em um JSON estável e compara com um baseline para detectar regressões
+
+    python benchmark_suite.py --output benchmark_results.json
+    python benchmark_suite.py --compare benchmark_baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Sem rede e sem dispositivo de áudio: o ultralytics não consulta o hub e o mixer usa um driver nulo
+os.environ.setdefault('YOLO_OFFLINE', '1')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from yolo_detector import YOLODetector
+from response_generator import ResponseGenerator
+from tts_generator import TTSGenerator, StubSynthesizer
+from audio_cache import AudioCache
+
+SCHEMA_VERSION = 1
+
+# Tamanhos de imagem (largura, altura) do benchmark do detector
+IMAGE_SIZES = ((320, 240), (640, 480), (1280, 720), (1920, 1080), (4000, 3000))
+# Número de caixas no pós-processamento e de detecções no gerador de respostas
+BOX_COUNTS = (0, 10, 50, 100, 300)
+DETECTION_COUNTS = (0, 1, 5, 10, 50, 100, 500)
+# Número de palavras dos textos sintetizados
+TEXT_WORDS = (5, 20, 80)
+
+CLASS_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'bus', 'truck', 'traffic light', 'bench', 'bird', 'cat',
+    'dog', 'backpack', 'umbrella', 'handbag', 'bottle', 'cup', 'fork', 'chair', 'couch', 'potted plant',
+    'bed', 'dining table', 'tv', 'laptop', 'mouse', 'keyboard', 'cell phone', 'book', 'clock', 'vase'
+]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Descarta os logs (print) do código medido, para que o terminal não entre na medida"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(function, repeat, min_sample_seconds=0.002):
+    """
+    Mede o tempo por chamada de function (em ms)
+    Funções rápidas são executadas várias vezes por amostra, como no timeit
+    Returns:
+        dict com n, median, mean, p95, min e stdev em milissegundos
+    """
+    with quiet():
+        return _measure(function, repeat, min_sample_seconds)
+
+
+def _measure(function, repeat, min_sample_seconds):
+    function()  # Aquecimento
+
+    # Calibrar quantas chamadas cabem em uma amostra
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_seconds or number >= 1_000_000:
+            break
+        number *= 10
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number * 1000)
+
+    return {
+        'n': repeat,
+        'calls_per_sample': number,
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'min_ms': round(min(samples), 4),
+        'stdev_ms': round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0
+    }
+
+
+def synthetic_detections(count, seed=0):
+    """Detecções no formato da API com classes, posições e tamanhos variados"""
+    rng = random.Random(seed)
+    detections = []
+    for _ in range(count):
+        x1, y1 = rng.randint(0, 560), rng.randint(0, 560)
+        x2, y2 = x1 + rng.randint(8, 80), y1 + rng.randint(8, 80)
+        detections.append({
+            'class_name': rng.choice(CLASS_NAMES),
+            'confidence': round(rng.uniform(0.25, 0.99), 3),
+            'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
+                     'center_x': (x1 + x2) // 2, 'center_y': (y1 + y2) // 2}
+        })
+
+    # Posição, tamanho e área calculados como no detector
+    if detections:
+        xyxy = np.array([[d['bbox'][key] for key in ('x1', 'y1', 'x2', 'y2')] for d in detections],
+                        dtype=np.float64)
+        columns = YOLODetector._describe_boxes(xyxy)
+        for detection, position, size, area in zip(detections, columns['position'].tolist(),
+                                                   columns['size'].tolist(), columns['area'].tolist()):
+            detection.update(position=position, size=size, area=area)
+    return detections
+
+
+class _SyntheticBoxes:
+    """Caixas no formato de ultralytics Boxes (apenas o necessário para o pós-processamento)"""
+
+    class _Data:
+        def __init__(self, array):
+            self.array = array
+
+        def cpu(self):
+            return self
+
+        def numpy(self):
+            return self.array
+
+    def __init__(self, array):
+        self.data = self._Data(array)
+        self._length = len(array)
+
+    def __len__(self):
+        return self._length
+
+
+class _SyntheticResult:
+    def __init__(self, count, seed=0):
+        rng = np.random.default_rng(seed)
+        xy = rng.uniform(0, 560, (count, 2))
+        wh = rng.uniform(8, 80, (count, 2))
+        data = np.column_stack([xy, xy + wh, rng.uniform(0.25, 0.99, count), rng.integers(0, 80, count)])
+        self.boxes = _SyntheticBoxes(data.astype(np.float32))
+        self.names = {index: f'class_{index}' for index in range(80)}
+
+
+def bench_detector(args, results):
+    """YOLODetector.detect por tamanho de imagem e pós-processamento por número de caixas"""
+    print("\n🔍 Detector")
+
+    # Pós-processamento (caixas -> colunas -> dicts da API): não depende do modelo
+    for count in BOX_COUNTS:
+        result = [_SyntheticResult(count)]
+        name = f'detector.postprocess[boxes={count}]'
+        results[name] = measure(
+            lambda: YOLODetector.columns_to_detections(YOLODetector._results_to_columns(result)), args.repeat)
+        print(f"   {name}: {results[name]['median_ms']} ms")
+
+    # Modelo real: só roda com o arquivo presente (o ultralytics baixaria o modelo sem ele)
+    if not os.path.exists(args.model):
+        print(f"⚠️ Modelo {args.model} não encontrado localmente, pulando YOLODetector.detect")
+        results['detector.detect'] = {'skipped': f'modelo {args.model} não encontrado'}
+        return
+    try:
+        detector = YOLODetector(model_path=args.model, backend=args.backend, imgsz=args.imgsz)
+    except Exception as e:
+        print(f"⚠️ Detector indisponível ({e}), pulando YOLODetector.detect")
+        results['detector.detect'] = {'skipped': str(e)}
+        return
+
+    rng = np.random.default_rng(0)
+    for width, height in IMAGE_SIZES:
+        # Imagem suave (ruído ampliado), mais próxima de uma foto que ruído puro
+        small = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+        image = np.ascontiguousarray(np.repeat(np.repeat(small, 16, axis=0), 16, axis=1)[:height, :width])
+        name = f'detector.detect[backend={detector.backend},image={width}x{height},imgsz={args.imgsz}]'
+        results[name] = measure(lambda: detector.detect(image), max(3, args.repeat // 4))
+        print(f"   {name}: {results[name]['median_ms']} ms")
+
+
+def bench_response(args, results):
+    """ResponseGenerator.generate_response e generate_response_segments por número de detecções"""
+    print("\n💬 Gerador de respostas")
+    generator = ResponseGenerator()
+
+    for count in DETECTION_COUNTS:
+        detections = synthetic_detections(count)
+        random.seed(0)
+        for method in ('generate_response', 'generate_response_segments'):
+            name = f'response.{method}[detections={count}]'
+            results[name] = measure(lambda: getattr(generator, method)(detections), args.repeat)
+            print(f"   {name}: {results[name]['median_ms']} ms")
+
+
+def bench_tts(args, results):
+    """TTSGenerator com o sintetizador local (sem rede): cache frio, cache quente e fragmentos"""
+    print("\n🔊 TTS (sintetizador local)")
+    tts = TTSGenerator(cache=AudioCache(max_bytes=64 * 1024 * 1024), synthesizer=StubSynthesizer())
+
+    try:
+        for words in TEXT_WORDS:
+            text = ' '.join(['palavra'] * words)
+
+            # Cache frio: cada chamada usa um texto inédito
+            counter = iter(range(10 ** 9))
+            name = f'tts.synthesize[cache=miss,words={words}]'
+            results[name] = measure(lambda: tts.synthesize(f'{text} {next(counter)}'), args.repeat)
+            print(f"   {name}: {results[name]['median_ms']} ms")
+
+            name = f'tts.synthesize[cache=hit,words={words}]'
+            results[name] = measure(lambda: tts.synthesize(text), args.repeat)
+            print(f"   {name}: {results[name]['median_ms']} ms")
+
+        # Resposta completa em fragmentos (modo TTS_FRAGMENT_MODE), com os fragmentos em cache
+        random.seed(0)
+        segments = ResponseGenerator().generate_response_segments(synthetic_detections(10))
+        with quiet():
+            tts.synthesize_segments(segments)
+        name = f'tts.synthesize_segments[cache=hit,fragments={len(segments)}]'
+        results[name] = measure(lambda: tts.synthesize_segments(segments), args.repeat)
+        print(f"   {name}: {results[name]['median_ms']} ms")
+
+        # Geração sem reprodução: inclui a gravação do MP3 em arquivo temporário
+        paths = []
+        def generate_only():
+            paths.append(tts.generate_only(text)['file_path'])
+        name = 'tts.generate_only[cache=hit,words=80]'
+        results[name] = measure(generate_only, max(3, args.repeat // 4))
+        print(f"   {name}: {results[name]['median_ms']} ms")
+        for path in paths:
+            os.remove(path)
+    finally:
+        tts.cleanup()
+
+
+SUITES = {
+    'detector': bench_detector,
+    'response': bench_response,
+    'tts': bench_tts
+}
+
+
+def environment_info(args):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'model': args.model,
+        'backend': args.backend,
+        'imgsz': args.imgsz
+    }
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """
+    Compara as medianas com o baseline
+    Returns:
+        Lista de regressões (nome, mediana do baseline, mediana atual, variação)
+    """
+    regressions = []
+    print(f"\n📊 Comparação com o baseline (limite +{threshold:.0%}, mínimo {min_delta_ms} ms)")
+    print(f"{'caso':<70} {'base ms':>10} {'atual ms':>10} {'variação':>9}")
+
+    for name in sorted(set(current) | set(baseline)):
+        new, old = current.get(name, {}), baseline.get(name, {})
+        if 'median_ms' not in new or 'median_ms' not in old:
+            status = 'novo' if name not in baseline else 'ausente' if name not in current else 'pulado'
+            print(f"{name:<70} {old.get('median_ms', '-'):>10} {new.get('median_ms', '-'):>10} {status:>9}")
+            continue
+
+        change = (new['median_ms'] - old['median_ms']) / old['median_ms'] if old['median_ms'] else 0.0
+        regressed = change > threshold and new['median_ms'] - old['median_ms'] > min_delta_ms
+        marker = ' ❌' if regressed else ''
+        print(f"{name:<70} {old['median_ms']:>10} {new['median_ms']:>10} {change:>+9.1%}{marker}")
+        if regressed:
+            regressions.append((name, old['median_ms'], new['median_ms'], change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks offline do detector, respostas e TTS')
+    parser.add_argument('--suites', nargs='+', choices=list(SUITES), default=list(SUITES))
+    parser.add_argument('--model', default=os.environ.get('MODEL_PATH', 'yolov8n.pt'))
+    parser.add_argument('--backend', default=os.environ.get('MODEL_BACKEND', 'pytorch'))
+    parser.add_argument('--imgsz', type=int, default=int(os.environ.get('MODEL_IMGSZ', 640)))
+    parser.add_argument('--repeat', type=int, default=20, help='Amostras por caso')
+    parser.add_argument('--quick', action='store_true', help='Menos amostras (verificação rápida)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Arquivo JSON dos resultados')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON de referência para detectar regressões')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Aumento relativo da mediana considerado regressão (padrão 0.15)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='Aumento absoluto mínimo para contar como regressão (ignora ruído em casos rápidos)')
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat = 5
+
+    results = {}
+    start = time.perf_counter()
+    for suite in args.suites:
+        SUITES[suite](args, results)
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'environment': environment_info(args),
+        'results': dict(sorted(results.items()))
+    }
+
+    # Gravação atômica: um baseline nunca fica pela metade
+    directory = os.path.dirname(os.path.abspath(args.output))
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+    os.replace(f.name, args.output)
+    print(f"\n💾 {len(results)} casos salvos em {args.output} ({time.perf_counter() - start:.1f}s)")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+            print("⚠️ Baseline gerado em outra arquitetura: compare apenas na mesma máquina")
+        regressions = compare(report['results'], baseline.get('results', {}), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ Nenhuma regressão")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+import cv2
+from batch_scheduler import wait_result
+from admission import current_deadline
+
+
+class DetectionCache:
+    MODES = ('exact', 'perceptual')
+
+    def __init__(self, mode='exact', ttl_seconds=10.0, max_entries=1024, hash_size=16):
+        """
+        Inicializa o cache de resultados de detecção por hash da imagem decodificada
+        Args:
+            mode: 'exact' (hash do conteúdo dos pixels) ou 'perceptual' (dHash em resolução
+                reduzida: imagens quase idênticas compartilham o mesmo resultado)
+            ttl_seconds: Tempo de validade de cada resultado
+            max_entries: Número máximo de resultados em cache (LRU)
+            hash_size: Lado da grade do hash perceptual (hash_size² bits)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de cache inválido: {mode}")
+
+        self.mode = mode
+        self.ttl = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.hash_size = int(hash_size)
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._saved_seconds = 0.0
+        self._hash_seconds = 0.0
+
+    def make_key(self, image):
+        """
+        Calcula a chave de uma imagem decodificada
+        Args:
+            image: numpy.ndarray (BGR)
+        Returns:
+            str com o hash (inclui as dimensões, pois as caixas dependem delas)
+        """
+        if self.mode == 'perceptual':
+            # dHash: compara pixels vizinhos em uma miniatura em tons de cinza
+            small = cv2.resize(image, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+            digest = np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes().hex()
+        else:
+            digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16).hexdigest()
+        return f"{'x'.join(map(str, image.shape))}:{digest}"
+
+    def get_or_compute(self, image, compute):
+        """
+        Retorna as detecções em cache para a imagem ou executa compute(image)
+        Requisições simultâneas para a mesma chave aguardam uma única inferência, cada uma
+        até o próprio prazo (controle de admissão)
+        Args:
+            image: numpy.ndarray (BGR)
+            compute: Função que recebe a imagem e retorna as detecções
+        Returns:
+            Detecções (cópia independente do valor em cache)
+        Raises:
+            DeadlineExceededError: prazo da requisição esgotado aguardando a inferência de outra
+        """
+        hash_start = time.perf_counter()
+        key = self.make_key(image)
+        now = time.monotonic()
+
+        with self._lock:
+            self._hash_seconds += time.perf_counter() - hash_start
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, duration = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._saved_seconds += duration
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self.expirations += 1
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._inflight[key] = Future()
+                # Em execução: quem desiste de esperar (wait_result) não cancela o Future compartilhado
+                inflight.set_running_or_notify_cancel()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            value, duration = wait_result(inflight, current_deadline())
+            with self._lock:
+                self._saved_seconds += duration
+            return copy.deepcopy(value)
+
+        start = time.perf_counter()
+        try:
+            value = compute(image)
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            inflight.set_exception(e)
+            raise
+        duration = time.perf_counter() - start
+
+        with self._lock:
+            del self._inflight[key]
+            self._entries[key] = (value, time.monotonic() + self.ttl, duration)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        inflight.set_result((value, duration))
+        return copy.deepcopy(value)
+
+    def get_stats(self):
+        """Retorna a taxa de acerto e a latência economizada"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'mode': self.mode,
+                'ttl_seconds': self.ttl,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                'latency_saved_ms': round(self._saved_seconds * 1000, 1),
+                'avg_hash_ms': round(self._hash_seconds / lookups * 1000, 3) if lookups else 0.0
+            }
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Relatório de acurácia e desempenho do modelo INT8 em relação ao FP32
+Compara mAP/recall (em um conjunto local separado da calibração), latência e memória (RSS)
+"""
+
+import argparse
+import json
+import os
+import time
+import resource
+import multiprocessing
+import numpy as np
+import cv2
+from quantization import list_images
+from object_tracker import box_iou
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def run_model(backend, args, image_paths):
+    """
+    Executa um modelo em um processo isolado, para medir o RSS de cada um separadamente
+    Returns:
+        dict com predições por imagem, latências e pico de RSS
+    """
+    from yolo_detector import YOLODetector
+
+    detector = YOLODetector(
+        model_path=args.model,
+        backend=backend,
+        imgsz=args.imgsz,
+        cache_dir=args.cache_dir,
+        calibration_dir=args.calibration
+    )
+    detector.conf_threshold = args.conf
+
+    images = [cv2.imread(path) for path in image_paths]
+
+    # Aquecimento
+    for image in images[:3]:
+        detector.detect(image, columnar=True)
+
+    predictions = []
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        columns = detector.detect(image, columnar=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+        predictions.append({
+            'boxes': columns['bbox'].tolist(),
+            'scores': columns['confidence'].tolist(),
+            'classes': columns['class_id'].tolist()
+        })
+
+    return {
+        'backend': detector.backend,
+        'model_file': str(detector.model_file),
+        'predictions': predictions,
+        'latencies': latencies,
+        # ru_maxrss é em KB no Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def load_labels(image_paths, labels_dir):
+    """
+    Lê rótulos no formato YOLO (classe cx cy w h normalizados) e converte para pixels xyxy
+    Returns:
+        Lista de dicts {'boxes', 'classes'} por imagem
+    """
+    ground_truths = []
+    for path in image_paths:
+        height, width = cv2.imread(path).shape[:2]
+        label_path = os.path.join(labels_dir, os.path.splitext(os.path.basename(path))[0] + '.txt')
+
+        boxes, classes = [], []
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                for line in f:
+                    values = line.split()
+                    if len(values) < 5:
+                        continue
+                    class_id, cx, cy, w, h = int(values[0]), *map(float, values[1:5])
+                    boxes.append([(cx - w / 2) * width, (cy - h / 2) * height,
+                                  (cx + w / 2) * width, (cy + h / 2) * height])
+                    classes.append(class_id)
+
+        ground_truths.append({'boxes': boxes, 'classes': classes})
+    return ground_truths
+
+
+def average_precision(recall, precision):
+    """AP com interpolação em todos os pontos da curva precisão-recall"""
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+def evaluate(predictions, ground_truths):
+    """
+    Calcula mAP@0.5, mAP@0.5:0.95, precisão e recall
+    Args:
+        predictions: Lista por imagem de {'boxes', 'scores', 'classes'}
+        ground_truths: Lista por imagem de {'boxes', 'classes'}
+    """
+    classes = sorted({c for gt in ground_truths for c in gt['classes']})
+    ap_table = np.zeros((len(classes), len(IOU_THRESHOLDS)))
+    true_positives_50 = 0
+    total_predictions = sum(len(pred['classes']) for pred in predictions)
+    total_ground_truths = sum(len(gt['classes']) for gt in ground_truths)
+
+    for class_index, class_id in enumerate(classes):
+        # Todas as predições da classe, da maior para a menor confiança
+        entries = [(score, image_index, box)
+                   for image_index, pred in enumerate(predictions)
+                   for box, score, c in zip(pred['boxes'], pred['scores'], pred['classes']) if c == class_id]
+        entries.sort(key=lambda entry: -entry[0])
+
+        gt_boxes = [np.asarray([box for box, c in zip(gt['boxes'], gt['classes']) if c == class_id]).reshape(-1, 4)
+                    for gt in ground_truths]
+        class_ground_truths = sum(len(boxes) for boxes in gt_boxes)
+
+        for threshold_index, threshold in enumerate(IOU_THRESHOLDS):
+            matched = [np.zeros(len(boxes), dtype=bool) for boxes in gt_boxes]
+            hits = np.zeros(len(entries))
+
+            for entry_index, (_, image_index, box) in enumerate(entries):
+                candidates = gt_boxes[image_index]
+                if not len(candidates):
+                    continue
+                ious = box_iou([box], candidates)[0]
+                ious[matched[image_index]] = -1
+                best = int(np.argmax(ious))
+                if ious[best] >= threshold:
+                    matched[image_index][best] = True
+                    hits[entry_index] = 1
+
+            cumulative_hits = np.cumsum(hits)
+            recall = cumulative_hits / max(class_ground_truths, 1)
+            precision = cumulative_hits / np.arange(1, len(entries) + 1)
+            ap_table[class_index, threshold_index] = average_precision(recall, precision) if len(entries) else 0.0
+
+            if threshold_index == 0:
+                true_positives_50 += int(cumulative_hits[-1]) if len(entries) else 0
+
+    return {
+        'map50': round(float(ap_table[:, 0].mean()), 4) if classes else 0.0,
+        'map50_95': round(float(ap_table.mean()), 4) if classes else 0.0,
+        'precision': round(true_positives_50 / total_predictions, 4) if total_predictions else 0.0,
+        'recall': round(true_positives_50 / total_ground_truths, 4) if total_ground_truths else 0.0,
+        'ground_truth_objects': total_ground_truths
+    }
+
+
+def summarize_latency(latencies):
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'throughput_ips': round(1000 * len(latencies) / sum(latencies), 2)
+    }
+
+
+def model_size_mb(path):
+    if os.path.isdir(path):
+        return round(sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, names in os.walk(path) for name in names) / 1024 / 1024, 2)
+    return round(os.path.getsize(path) / 1024 / 1024, 2) if os.path.exists(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o modelo INT8 com o FP32 em acurácia, latência e RSS')
+    parser.add_argument('--calibration', required=True, help='Pasta de imagens de calibração')
+    parser.add_argument('--eval', required=True, help='Pasta de imagens de avaliação (separada da calibração)')
+    parser.add_argument('--labels', help='Pasta de rótulos YOLO (padrão: <eval>/labels ou <eval>/../labels); '
+                                         'sem rótulos, as predições FP32 são usadas como referência')
+    parser.add_argument('--baseline', default='onnx', choices=['pytorch', 'onnx'], help='Backend FP32 de referência')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25, help='Confiança mínima das predições avaliadas')
+    parser.add_argument('--cache-dir', default='model_cache')
+    parser.add_argument('--output', help='Arquivo JSON para salvar o relatório')
+    args = parser.parse_args()
+
+    image_paths = list_images(args.eval)
+    if not image_paths:
+        raise SystemExit(f"❌ Nenhuma imagem em {args.eval}")
+
+    overlap = {os.path.basename(path) for path in image_paths} & \
+              {os.path.basename(path) for path in list_images(args.calibration)}
+    if overlap:
+        print(f"⚠️ Aviso: {len(overlap)} imagens aparecem na calibração e na avaliação")
+
+    # Cada modelo roda em um processo novo para que o RSS de um não contamine o outro
+    context = multiprocessing.get_context('spawn')
+    reports = {}
+    for backend in (args.baseline, 'onnx-int8'):
+        print(f"\n⚙️  Executando {backend} em {len(image_paths)} imagens...")
+        with context.Pool(1) as pool:
+            reports[backend] = pool.apply(run_model, (backend, args, image_paths))
+        if reports[backend]['backend'] != backend:
+            raise SystemExit(f"❌ Backend {backend} indisponível (veja as dependências opcionais)")
+
+    fp32, int8 = reports[args.baseline], reports['onnx-int8']
+
+    labels_dir = args.labels
+    if labels_dir is None:
+        for candidate in (os.path.join(args.eval, 'labels'), os.path.join(os.path.dirname(os.path.abspath(args.eval)), 'labels')):
+            if os.path.isdir(candidate):
+                labels_dir = candidate
+                break
+
+    if labels_dir:
+        reference = f'rótulos em {labels_dir}'
+        ground_truths = load_labels(image_paths, labels_dir)
+        fp32_accuracy = evaluate(fp32['predictions'], ground_truths)
+    else:
+        reference = f'predições do modelo {args.baseline} (sem rótulos)'
+        ground_truths = [{'boxes': pred['boxes'], 'classes': pred['classes']} for pred in fp32['predictions']]
+        fp32_accuracy = None
+    int8_accuracy = evaluate(int8['predictions'], ground_truths)
+
+    report = {
+        'reference': reference,
+        'images': len(image_paths),
+        'fp32': {
+            'backend': args.baseline,
+            'accuracy': fp32_accuracy,
+            'latency': summarize_latency(fp32['latencies']),
+            'peak_rss_mb': round(fp32['peak_rss_mb'], 1),
+            'model_size_mb': model_size_mb(fp32['model_file'])
+        },
+        'int8': {
+            'backend': 'onnx-int8',
+            'accuracy': int8_accuracy,
+            'latency': summarize_latency(int8['latencies']),
+            'peak_rss_mb': round(int8['peak_rss_mb'], 1),
+            'model_size_mb': model_size_mb(int8['model_file'])
+        }
+    }
+
+    # Diferenças INT8 - FP32
+    delta = {
+        'p50_ms': round(report['int8']['latency']['p50_ms'] - report['fp32']['latency']['p50_ms'], 2),
+        'peak_rss_mb': round(report['int8']['peak_rss_mb'] - report['fp32']['peak_rss_mb'], 1)
+    }
+    if fp32_accuracy:
+        for key in ('map50', 'map50_95', 'recall'):
+            delta[key] = round(int8_accuracy[key] - fp32_accuracy[key], 4)
+    report['delta'] = delta
+
+    print(f"\n📊 Relatório INT8 vs FP32 ({report['images']} imagens, referência: {reference})")
+    print(f"{'':<10} {'mAP50':>8} {'mAP50-95':>9} {'recall':>8} {'p50 ms':>8} {'img/s':>8} {'RSS MB':>8}")
+    for name in ('fp32', 'int8'):
+        entry = report[name]
+        accuracy = entry['accuracy'] or {'map50': '-', 'map50_95': '-', 'recall': '-'}
+        print(f"{name:<10} {accuracy['map50']:>8} {accuracy['map50_95']:>9} {accuracy['recall']:>8} "
+              f"{entry['latency']['p50_ms']:>8} {entry['latency']['throughput_ips']:>8} {entry['peak_rss_mb']:>8}")
+    print(f"Δ (INT8 - FP32): {delta}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Relatório salvo em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
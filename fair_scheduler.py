@@ -0,0 +1,451 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+import numpy as np
+from batch_scheduler import DeadlineExceededError
+
+
+LANES = ('interactive', 'bulk')
+
+# Cliente da requisição atual (ClientIdentity) e marca de que o contexto já tem uma vaga de
+# inferência (no modo ASGI a vaga é obtida no event loop, antes de ir para o pool de threads)
+_client = contextvars.ContextVar('fair_client', default=None)
+_holding_slot = contextvars.ContextVar('fair_holding_slot', default=False)
+
+
+class UnknownAPIKeyError(PermissionError):
+    """API key não cadastrada na configuração de clientes"""
+
+
+class RateLimitedError(RuntimeError):
+    """Cliente acima da sua taxa máxima de requisições"""
+
+    def __init__(self, message, retry_after, client):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.client = client
+
+
+class ClientPolicy:
+    def __init__(self, weight=1.0, max_concurrency=0, rate=0.0, burst=None, interactive=False, api_key=None):
+        """
+        Regras de um cliente na fila justa
+        Args:
+            weight: Peso no deficit round-robin (fatia de inferência proporcional ao peso)
+            max_concurrency: Máximo de requisições do cliente em inferência ao mesmo tempo (0 = sem limite)
+            rate: Taxa máxima de requisições por segundo (0 = sem limite); acima dela, 429
+            burst: Rajada permitida acima da taxa (padrão: max(1, rate))
+            interactive: Se as requisições do cliente usam a faixa prioritária
+            api_key: Chave que identifica o cliente (header X-API-Key)
+        """
+        self.weight = float(weight)
+        if self.weight <= 0:
+            raise ValueError("weight deve ser maior que zero")
+        self.max_concurrency = int(max_concurrency)
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate)
+        self.interactive = bool(interactive)
+        self.api_key = api_key
+
+    @classmethod
+    def from_dict(cls, values, base=None):
+        """Cria a política a partir de um dict da configuração (campos ausentes vêm de base)"""
+        merged = dict(vars(base)) if base is not None else {}
+        if base is not None and 'rate' in values and 'burst' not in values:
+            merged.pop('burst', None)
+        merged.pop('api_key', None)
+        merged.update(values)
+        return cls(**merged)
+
+
+class ClientIdentity:
+    def __init__(self, name, policy, lane, registered):
+        """Cliente identificado em uma requisição e a faixa (interactive ou bulk) usada"""
+        self.name = name
+        self.policy = policy
+        self.lane = lane
+        self.registered = registered
+
+    @property
+    def label(self):
+        """Label das métricas: nomes cadastrados; demais clientes agrupados (cardinalidade limitada)"""
+        return self.name if self.registered else 'unregistered'
+
+
+def load_client_config(path):
+    """
+    Lê a configuração de clientes (JSON):
+        {"default": {"weight": 1, "max_concurrency": 0, "rate": 0},
+         "clients": {"quiosque": {"weight": 4, "interactive": true},
+                     "importador": {"api_key": "...", "weight": 1, "max_concurrency": 2, "rate": 5}}}
+    Returns:
+        (política padrão, dict nome -> ClientPolicy)
+    """
+    if not path:
+        return ClientPolicy(), {}
+    with open(path) as f:
+        config = json.load(f)
+    default = ClientPolicy.from_dict(config.get('default', {}))
+    clients = {name: ClientPolicy.from_dict(values, base=default)
+               for name, values in config.get('clients', {}).items()}
+    return default, clients
+
+
+class _Waiter:
+    def __init__(self, identity, cost, notify):
+        self.identity = identity
+        self.cost = cost
+        self.notify = notify
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class _ClientState:
+    def __init__(self, identity):
+        self.name = identity.name
+        self.policy = identity.policy
+        self.registered = identity.registered
+        self.queues = {lane: deque() for lane in LANES}
+        self.deficit = {lane: 0.0 for lane in LANES}
+        self.in_ring = {lane: False for lane in LANES}
+        self.running = 0
+        self.tokens = self.policy.burst
+        self.refilled_at = time.monotonic()
+        self.last_seen = time.monotonic()
+
+        # Estatísticas
+        self.waits = deque(maxlen=512)
+        self.total_wait = 0.0
+        self.granted = 0
+        self.rate_limited = 0
+        self.expired = 0
+
+    @property
+    def idle(self):
+        return self.running == 0 and not any(self.queues.values())
+
+    def at_capacity(self):
+        return 0 < self.policy.max_concurrency <= self.running
+
+
+class FairScheduler:
+    def __init__(self, slots=16, default_policy=None, clients=None, quantum=1.0, max_clients=1024,
+                 on_wait=None):
+        """
+        Fila justa na frente da inferência: vagas de inferência distribuídas entre os clientes
+        por deficit round-robin ponderado, com uma faixa prioritária para requisições interativas
+        Args:
+            slots: Requisições (imagens) em inferência ao mesmo tempo; acima disso esperam aqui,
+                e não na fila FIFO do micro-batching
+            default_policy: ClientPolicy de clientes não cadastrados
+            clients: dict nome -> ClientPolicy dos clientes cadastrados
+            quantum: Crédito (em imagens) somado a cada rodada, multiplicado pelo peso
+            max_clients: Máximo de clientes não cadastrados acompanhados (os ociosos mais
+                antigos são esquecidos)
+            on_wait: Função chamada com (ClientIdentity, segundos de espera) a cada vaga concedida
+        """
+        self.slots = max(1, int(slots))
+        self.default_policy = default_policy or ClientPolicy()
+        self.clients = dict(clients or {})
+        self.quantum = float(quantum)
+        self.max_clients = max(1, int(max_clients))
+        self.on_wait = on_wait
+        self._api_keys = {policy.api_key: name for name, policy in self.clients.items() if policy.api_key}
+
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+        self._rings = {lane: deque() for lane in LANES}
+        self._running = 0
+
+    def identify(self, api_key=None, client_id=None, remote_addr=None, priority=None):
+        """
+        Identifica o cliente de uma requisição
+        Args:
+            api_key: Header X-API-Key (clientes cadastrados com api_key só são reconhecidos por ela)
+            client_id: Header X-Client-ID (clientes cadastrados sem api_key ou não cadastrados)
+            remote_addr: Endereço do cliente, usado se não houver nenhum dos headers
+            priority: Header X-Priority ('interactive' vale apenas para clientes interativos;
+                'bulk' rebaixa qualquer requisição)
+        Returns:
+            ClientIdentity
+        Raises:
+            UnknownAPIKeyError: api_key informada e não cadastrada
+        """
+        if api_key:
+            name = self._api_keys.get(api_key)
+            if name is None:
+                raise UnknownAPIKeyError("API key inválida")
+            policy, registered = self.clients[name], True
+        elif client_id:
+            policy = self.clients.get(client_id)
+            registered = policy is not None and policy.api_key is None
+            name = client_id if registered else f'id:{client_id}'
+            if not registered:
+                policy = self.default_policy
+        else:
+            name, policy, registered = f'ip:{remote_addr or "desconhecido"}', self.default_policy, False
+
+        lane = 'interactive' if policy.interactive and (priority or 'interactive').lower() != 'bulk' else 'bulk'
+        return ClientIdentity(name, policy, lane, registered)
+
+    def _state(self, identity):
+        """Estado do cliente, criado sob demanda (chamado com o lock adquirido)"""
+        state = self._states.get(identity.name)
+        if state is None:
+            state = self._states[identity.name] = _ClientState(identity)
+            self._forget_idle(keep=identity.name)
+        state.last_seen = time.monotonic()
+        self._states.move_to_end(identity.name)
+        return state
+
+    def _forget_idle(self, keep=None):
+        """Esquece os clientes não cadastrados ociosos mais antigos acima de max_clients (exceto keep)"""
+        excess = sum(not state.registered for state in self._states.values()) - self.max_clients
+        for name in list(self._states):
+            if excess <= 0:
+                break
+            if name == keep:
+                continue
+            state = self._states[name]
+            # Clientes ainda no anel de alguma faixa são lidos por _pick e não podem ser esquecidos
+            if not state.registered and state.idle and not any(state.in_ring.values()):
+                del self._states[name]
+                excess -= 1
+
+    def check_rate(self, identity):
+        """
+        Consome uma ficha do token bucket do cliente
+        Raises:
+            RateLimitedError: cliente acima da taxa (com o Retry-After sugerido)
+        """
+        rate = identity.policy.rate
+        if rate <= 0:
+            return
+        with self._lock:
+            state = self._state(identity)
+            now = time.monotonic()
+            state.tokens = min(identity.policy.burst, state.tokens + (now - state.refilled_at) * rate)
+            state.refilled_at = now
+            if state.tokens >= 1:
+                state.tokens -= 1
+                return
+            state.rate_limited += 1
+            retry_after = (1 - state.tokens) / rate
+        raise RateLimitedError(f"Limite de {rate:g} requisições/s excedido para o cliente {identity.name}",
+                               retry_after, identity.label)
+
+    def _pick(self, lane):
+        """Próxima requisição da faixa por deficit round-robin (chamado com o lock adquirido)"""
+        ring = self._rings[lane]
+        skipped = 0
+        while ring:
+            state = self._states[ring[0]]
+            queue = state.queues[lane]
+            if not queue:
+                ring.popleft()
+                state.in_ring[lane] = False
+                state.deficit[lane] = 0.0
+                continue
+            if state.at_capacity():
+                # No limite de concorrência: a vez passa para o próximo, sem acumular crédito
+                ring.rotate(-1)
+                skipped += 1
+                if skipped >= len(ring):
+                    return None
+                continue
+            if state.deficit[lane] >= queue[0].cost:
+                waiter = queue.popleft()
+                state.deficit[lane] -= waiter.cost
+                if not queue:
+                    ring.popleft()
+                    state.in_ring[lane] = False
+                    state.deficit[lane] = 0.0
+                return waiter
+            state.deficit[lane] += self.quantum * state.policy.weight
+            ring.rotate(-1)
+            skipped = 0
+        return None
+
+    def _dispatch(self):
+        """Concede vagas livres: primeiro a faixa interativa, depois a de lote (com o lock adquirido)"""
+        granted = []
+        while self._running < self.slots:
+            waiter = None
+            for lane in LANES:
+                waiter = self._pick(lane)
+                if waiter is not None:
+                    break
+            if waiter is None:
+                break
+            if self._running and self._running + waiter.cost > self.slots:
+                # Lote maior que as vagas livres: volta para a frente da fila e espera as vagas
+                # liberarem (com nada em execução, lotes maiores que slots rodam sozinhos)
+                self._requeue(waiter)
+                break
+            state = self._states[waiter.identity.name]
+            state.running += 1
+            self._running += waiter.cost
+            waiter.granted = True
+            wait = time.monotonic() - waiter.enqueued_at
+            state.waits.append(wait)
+            state.total_wait += wait
+            state.granted += 1
+            granted.append((waiter, wait))
+        return granted
+
+    def _requeue(self, waiter):
+        """Devolve à frente da fila uma requisição escolhida por _pick sem vagas suficientes (com o lock adquirido)"""
+        state = self._states[waiter.identity.name]
+        lane = waiter.identity.lane
+        state.queues[lane].appendleft(waiter)
+        state.deficit[lane] += waiter.cost
+        if not state.in_ring[lane]:
+            state.in_ring[lane] = True
+            self._rings[lane].appendleft(waiter.identity.name)
+
+    def _notify(self, granted):
+        for waiter, wait in granted:
+            if self.on_wait is not None:
+                self.on_wait(waiter.identity, wait)
+            waiter.notify()
+
+    def _enqueue(self, identity, cost, notify):
+        waiter = _Waiter(identity, max(1, int(cost)), notify)
+        with self._lock:
+            state = self._state(identity)
+            state.queues[identity.lane].append(waiter)
+            if not state.in_ring[identity.lane]:
+                state.in_ring[identity.lane] = True
+                self._rings[identity.lane].append(identity.name)
+            granted = self._dispatch()
+        self._notify(granted)
+        return waiter
+
+    def _abandon(self, waiter):
+        """
+        Retira da fila uma requisição cujo prazo esgotou
+        Returns:
+            False se a vaga já tinha sido concedida (e precisa ser liberada)
+        """
+        with self._lock:
+            if waiter.granted:
+                return False
+            lane = waiter.identity.lane
+            state = self._states[waiter.identity.name]
+            state.queues[lane].remove(waiter)
+            state.expired += 1
+            if not state.queues[lane] and state.in_ring[lane]:
+                self._rings[lane].remove(state.name)
+                state.in_ring[lane] = False
+                state.deficit[lane] = 0.0
+            return True
+
+    def _release(self, waiter):
+        with self._lock:
+            self._states[waiter.identity.name].running -= 1
+            self._running -= waiter.cost
+            granted = self._dispatch()
+        self._notify(granted)
+
+    @contextmanager
+    def slot(self, identity, deadline=None, cost=1):
+        """
+        Espera a vez do cliente e mantém uma vaga de inferência dentro do bloco with
+        Args:
+            identity: ClientIdentity (None = sem fila justa)
+            deadline: Prazo em time.monotonic(); esgotado na fila, levanta DeadlineExceededError
+            cost: Número de imagens (lotes contam como várias requisições)
+        """
+        if identity is None or _holding_slot.get():
+            yield
+            return
+
+        event = threading.Event()
+        waiter = self._enqueue(identity, cost, event.set)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not event.wait(timeout) and self._abandon(waiter):
+            raise DeadlineExceededError("Prazo da requisição esgotado na fila justa de inferência")
+
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def slot_async(self, identity, deadline=None, cost=1):
+        """Como slot, esperando a vez no event loop (o trabalho enviado a threads dentro do bloco herda a vaga)"""
+        if identity is None or _holding_slot.get():
+            yield
+            return
+
+        loop = asyncio.get_running_loop()
+        granted = asyncio.Event()
+        waiter = self._enqueue(identity, cost, lambda: loop.call_soon_threadsafe(granted.set))
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(granted.wait(), timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                raise DeadlineExceededError("Prazo da requisição esgotado na fila justa de inferência")
+        except BaseException:
+            # Conexão encerrada pelo cliente durante a espera
+            if not self._abandon(waiter):
+                self._release(waiter)
+            raise
+
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+            self._release(waiter)
+
+    def get_stats(self):
+        """Vagas em uso e, por cliente, fila, concorrência e tempo de espera pela vez (ms)"""
+        with self._lock:
+            clients = {}
+            for name, state in self._states.items():
+                waits = np.array(state.waits) * 1000 if state.waits else None
+                clients[name] = {
+                    'registered': state.registered,
+                    'weight': state.policy.weight,
+                    'interactive': state.policy.interactive,
+                    'queued': {lane: len(queue) for lane, queue in state.queues.items()},
+                    'running': state.running,
+                    'granted': state.granted,
+                    'rate_limited': state.rate_limited,
+                    'expired': state.expired,
+                    'wait_ms': {
+                        'mean': round(state.total_wait / state.granted * 1000, 2) if state.granted else 0.0,
+                        'p50': round(float(np.percentile(waits, 50)), 2) if waits is not None else 0.0,
+                        'p95': round(float(np.percentile(waits, 95)), 2) if waits is not None else 0.0,
+                        'max': round(float(waits.max()), 2) if waits is not None else 0.0
+                    }
+                }
+            return {
+                'slots': self.slots,
+                'running': self._running,
+                'queued': {lane: sum(len(state.queues[lane]) for state in self._states.values()) for lane in LANES},
+                'clients': clients
+            }
+
+
+@contextmanager
+def client_context(identity):
+    """Define o cliente da requisição atual (lido por current_client no caminho de inferência)"""
+    token = _client.set(identity)
+    try:
+        yield identity
+    finally:
+        _client.reset(token)
+
+
+def current_client():
+    """Cliente da requisição atual (None fora de uma requisição identificada)"""
+    return _client.get()
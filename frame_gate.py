@@ -0,0 +1,108 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import cv2
+
+
+class FrameGate:
+    def __init__(self, threshold=0.02, max_interval=1.0, thumbnail_size=32, session_ttl=300, max_sessions=1024):
+        """
+        Inicializa o filtro de frames por sessão (pula a inferência quando o frame quase não mudou)
+        Args:
+            threshold: Diferença média absoluta (0 a 1) entre miniaturas abaixo da qual o
+                frame reaproveita as detecções anteriores
+            max_interval: Intervalo máximo (segundos) sem uma nova detecção completa
+            thumbnail_size: Lado da miniatura em tons de cinza usada na comparação
+            session_ttl: Sessões sem frames por esse tempo (segundos) são descartadas
+            max_sessions: Número máximo de sessões acompanhadas (LRU)
+        """
+        self.threshold = float(threshold)
+        self.max_interval = float(max_interval)
+        self.thumbnail_size = int(thumbnail_size)
+        self.session_ttl = float(session_ttl)
+        self.max_sessions = max(1, int(max_sessions))
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.frames = 0
+        self.reused = 0
+        self.refreshed = 0
+
+    def _thumbnail(self, image):
+        """Miniatura em tons de cinza usada para medir a diferença entre frames"""
+        small = cv2.resize(image, (self.thumbnail_size, self.thumbnail_size), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def _prune(self, now):
+        """Remove sessões expiradas e as menos recentes acima do limite (chamado com o lock)"""
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state['last_seen'] <= self.session_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def detect(self, session_id, image, compute):
+        """
+        Retorna as detecções do frame, reaproveitando as da sessão quando o frame quase não mudou
+        Args:
+            session_id: Identificador do cliente/câmera
+            image: numpy.ndarray (BGR)
+            compute: Função que recebe a imagem e retorna as detecções
+        Returns:
+            Detecções (mesmo formato de compute)
+        """
+        thumbnail = self._thumbnail(image)
+        now = time.monotonic()
+
+        with self._lock:
+            self.frames += 1
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state['last_seen'] = now
+                self._sessions.move_to_end(session_id)
+
+                # A comparação é sempre contra o último frame detectado, para que mudanças
+                # lentas se acumulem até disparar uma nova detecção
+                if state['shape'] == image.shape:
+                    difference = float(np.abs(thumbnail - state['thumbnail']).mean()) / 255
+                    if difference < self.threshold:
+                        if now - state['detected_at'] < self.max_interval:
+                            self.reused += 1
+                            return copy.deepcopy(state['detections'])
+                        self.refreshed += 1
+
+        detections = compute(image)
+
+        with self._lock:
+            self._sessions[session_id] = {
+                'thumbnail': thumbnail,
+                'shape': image.shape,
+                'detections': copy.deepcopy(detections),
+                'detected_at': now,
+                'last_seen': now
+            }
+            self._sessions.move_to_end(session_id)
+            self._prune(now)
+
+        return detections
+
+    def get_stats(self):
+        """Retorna quantos frames reaproveitaram detecções anteriores"""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'max_interval_seconds': self.max_interval,
+                'sessions': len(self._sessions),
+                'frames': self.frames,
+                'reused': self.reused,
+                'detected': self.frames - self.reused,
+                # Frames parecidos que foram detectados por ter atingido o intervalo máximo
+                'refreshed': self.refreshed,
+                'skip_ratio': round(self.reused / self.frames, 3) if self.frames else 0.0
+            }
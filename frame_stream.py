@@ -0,0 +1,147 @@
+import threading
+import time
+
+
+class FrameStream:
+    def __init__(self, process_frame, send):
+        """
+        Inicializa o processamento de uma conexão de streaming de frames (latest-wins)
+        Args:
+            process_frame: Função que recebe os dados de um frame e retorna o dict da resposta
+            send: Função que envia uma mensagem (dict) ao cliente
+        """
+        self.process_frame = process_frame
+        self.send = send
+
+        self._frame = None
+        self._condition = threading.Condition()
+        self._closed = False
+
+        # Contadores
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def push(self, data):
+        """
+        Entrega um frame recebido; se o anterior ainda não foi processado, ele é descartado
+        Returns:
+            True se um frame antigo foi descartado
+        """
+        with self._condition:
+            self.received += 1
+            dropped = self._frame is not None
+            if dropped:
+                self.dropped += 1
+            self._frame = (self.received, data, time.monotonic())
+            self._condition.notify()
+        return dropped
+
+    def close(self):
+        """Encerra o loop de processamento (o frame pendente, se houver, é descartado)"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        with self._condition:
+            return self._closed
+
+    def take(self):
+        """
+        Retira o frame pendente sem esperar (para loops assíncronos, no lugar de run)
+        Returns:
+            (frame_id, dados, instante de chegada) ou None se não houver frame ou a conexão foi encerrada
+        """
+        with self._condition:
+            if self._closed or self._frame is None:
+                return None
+            frame, self._frame = self._frame, None
+            return frame
+
+    def process(self, frame):
+        """
+        Processa um frame retirado da fila e monta a mensagem para o cliente
+        Args:
+            frame: (frame_id, dados, instante de chegada)
+        Returns:
+            dict da mensagem (detecção ou erro)
+        """
+        frame_id, data, received_at = frame
+        try:
+            message = {'type': 'detection', 'frame_id': frame_id, **self.process_frame(data)}
+        except Exception as e:
+            message = {'type': 'error', 'frame_id': frame_id, 'error': str(e)}
+            with self._condition:
+                self.errors += 1
+
+        with self._condition:
+            self.processed += 1
+            message['dropped_frames'] = self.dropped
+        message['latency_ms'] = round((time.monotonic() - received_at) * 1000, 1)
+        return message
+
+    def run(self):
+        """Loop de processamento: sempre pega o frame mais recente"""
+        while True:
+            with self._condition:
+                while self._frame is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                frame = self._frame
+                self._frame = None
+
+            message = self.process(frame)
+
+            try:
+                self.send(message)
+            except Exception:
+                # Cliente desconectado
+                self.close()
+                return
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                'received': self.received,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors
+            }
+
+
+class StreamRegistry:
+    def __init__(self):
+        """Acompanha as conexões de streaming abertas e os totais das já encerradas"""
+        self._lock = threading.Lock()
+        self._active = set()
+        self._totals = {'streams': 0, 'received': 0, 'processed': 0, 'dropped': 0, 'errors': 0}
+
+    def open(self, stream):
+        with self._lock:
+            self._active.add(stream)
+            self._totals['streams'] += 1
+
+    def close(self, stream):
+        stats = stream.get_stats()
+        with self._lock:
+            self._active.discard(stream)
+            for key, value in stats.items():
+                self._totals[key] += value
+
+    def get_stats(self):
+        """Retorna os totais de frames recebidos, processados e descartados (inclui conexões abertas)"""
+        with self._lock:
+            active = list(self._active)
+            totals = dict(self._totals)
+
+        for stream in active:
+            for key, value in stream.get_stats().items():
+                totals[key] += value
+
+        totals['active'] = len(active)
+        totals['drop_ratio'] = round(totals['dropped'] / totals['received'], 3) if totals['received'] else 0.0
+        return totals
@@ -0,0 +1,69 @@
+"""
+Configuração do Gunicorn para a API YOLO
+
+Com PRELOAD_MODEL=1 (padrão) o app é importado no master antes do fork: os pesos do
+modelo ficam em páginas compartilhadas copy-on-write entre os workers, em vez de uma
+cópia por worker. Cada worker divide os núcleos de CPU com os demais (threads do torch)
+e registra no log quanto da sua memória é privada e quanto é compartilhada; os mesmos
+números ficam em GET /stats (campo memory).
+
+Uso: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+import sys
+from process_memory import available_cpus
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Threads por worker: requisições concorrentes são agrupadas pelo micro-batching
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('PRELOAD_MODEL', '1') == '1'
+
+if preload_app and os.environ.get('STARTUP_MODE', 'preload') != 'preload':
+    # STARTUP_MODE definido pelo operador é respeitado; os outros modos criam threads no
+    # import, que não sobrevivem ao fork, então o preload é desativado
+    print(f"⚠️ STARTUP_MODE={os.environ['STARTUP_MODE']} definido: PRELOAD_MODEL ignorado, "
+          f"cada worker carrega o próprio modelo")
+    preload_app = False
+
+if preload_app:
+    # O modelo é carregado no master; áudio e aquecimento ficam para cada worker
+    os.environ.setdefault('STARTUP_MODE', 'preload')
+
+
+def _torch_threads(server):
+    """Threads de intra-op do torch por worker: núcleos disponíveis divididos entre os workers"""
+    override = os.environ.get('TORCH_THREADS')
+    if override:
+        return max(1, int(override))
+    return max(1, available_cpus() // max(1, server.cfg.workers))
+
+
+def when_ready(server):
+    if preload_app:
+        # Mover os objetos já criados (modelo incluído) para a geração permanente do GC,
+        # para que as coletas nos workers não escrevam nessas páginas e quebrem o compartilhamento
+        gc.freeze()
+        server.log.info(f"Modelo carregado no master; {gc.get_freeze_count()} objetos congelados para o fork")
+
+
+def post_fork(server, worker):
+    threads = _torch_threads(server)
+    # Sem preload, o torch ainda não foi importado e lê OMP_NUM_THREADS ao ser importado
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    server.log.info(f"Worker {worker.pid}: {threads} thread(s) de inferência")
+
+    if preload_app:
+        import app
+        app.init_worker()
+
+
+def on_exit(server):
+    if preload_app and 'app' in sys.modules:
+        # Encerrar os processos de inferência e liberar a memória compartilhada (INFERENCE_MODE=server)
+        sys.modules['app'].shutdown()
@@ -0,0 +1,166 @@
+import io
+import base64
+import tarfile
+import zipfile
+import numpy as np
+import cv2
+from PIL import Image
+
+
+# Content-Types aceitos para lotes de imagens compactados
+ZIP_CONTENT_TYPES = {'application/zip', 'application/x-zip-compressed'}
+TAR_CONTENT_TYPES = {'application/x-tar', 'application/gzip', 'application/x-gzip', 'application/x-gtar'}
+
+# Fatores de redução da decodificação JPEG (escala DCT do libjpeg) e flags do OpenCV
+JPEG_REDUCTIONS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class ImageDecodeError(ValueError):
+    """Erro levantado quando os bytes recebidos não formam uma imagem válida"""
+
+
+def decode_image_bytes(image_data):
+    """
+    Decodifica bytes de imagem diretamente em memória
+    Args:
+        image_data: Bytes da imagem (JPEG, PNG, GIF, BMP, AVIF...)
+    Returns:
+        numpy.ndarray HxWx3 em BGR, formato esperado pelo YOLO
+    """
+    if not image_data:
+        raise ImageDecodeError("Imagem vazia")
+
+    # Caminho rápido: OpenCV decodifica direto do buffer, sem cópias extras
+    buffer = np.frombuffer(image_data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is not None:
+        return image
+
+    # Fallback para formatos que o OpenCV não suporta (GIF, AVIF...)
+    try:
+        with Image.open(io.BytesIO(image_data)) as pil_image:
+            rgb = np.asarray(pil_image.convert('RGB'))
+    except Exception as e:
+        raise ImageDecodeError(f"Formato de imagem inválido: {e}") from e
+
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def _jpeg_reduction(image_data, min_size):
+    """
+    Escolhe o maior fator de redução (8, 4 ou 2) que mantém o maior lado do JPEG >= min_size
+    Returns:
+        (fator, flag do OpenCV, (largura, altura) original) ou None se não houver redução
+    """
+    if not min_size or image_data[:3] != b'\xff\xd8\xff':
+        return None
+
+    # Apenas o cabeçalho é lido; os pixels não são decodificados aqui
+    try:
+        with Image.open(io.BytesIO(image_data)) as pil_image:
+            size = pil_image.size
+    except Exception:
+        return None
+
+    for factor, flag in JPEG_REDUCTIONS:
+        if -(-max(size) // factor) >= min_size:
+            return factor, flag, size
+    return None
+
+
+def decode_image_bytes_scaled(image_data, min_size):
+    """
+    Decodifica bytes de imagem; JPEGs grandes são decodificados direto em resolução reduzida
+    (1/2, 1/4 ou 1/8), mantendo o maior lado maior ou igual a min_size
+    Args:
+        image_data: Bytes da imagem
+        min_size: Menor tamanho aceito para o maior lado (tamanho de entrada do modelo)
+    Returns:
+        (numpy.ndarray BGR, (fator x, fator y)): coordenadas na imagem decodificada
+        multiplicadas pelos fatores correspondem aos pixels da imagem original
+    """
+    reduction = _jpeg_reduction(image_data, min_size) if image_data else None
+    if reduction is not None:
+        factor, flag, (width, height) = reduction
+        image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flag)
+        if image is not None:
+            # A orientação EXIF já foi aplicada pelo OpenCV: o cabeçalho pode estar transposto
+            if (image.shape[1] > image.shape[0]) != (width > height):
+                width, height = height, width
+            return image, (width / image.shape[1], height / image.shape[0])
+
+    return decode_image_bytes(image_data), (1.0, 1.0)
+
+
+def _base64_to_bytes(image_b64):
+    """Converte uma string base64 (aceita prefixo data URI) nos bytes da imagem"""
+    if not isinstance(image_b64, str):
+        raise ImageDecodeError("Imagem base64 deve ser uma string")
+
+    # Remover prefixo "data:image/...;base64," se presente
+    if image_b64.startswith('data:') and ',' in image_b64:
+        image_b64 = image_b64.split(',', 1)[1]
+
+    try:
+        image_data = base64.b64decode(image_b64)
+    except Exception as e:
+        raise ImageDecodeError(f"Base64 inválido: {e}") from e
+
+    return image_data
+
+
+def decode_base64_image(image_b64):
+    """
+    Decodifica uma imagem codificada em base64
+    Args:
+        image_b64: String base64 (aceita prefixo data URI)
+    Returns:
+        numpy.ndarray HxWx3 em BGR
+    """
+    return decode_image_bytes(_base64_to_bytes(image_b64))
+
+
+def decode_base64_image_scaled(image_b64, min_size):
+    """
+    Decodifica uma imagem em base64 em resolução reduzida (ver decode_image_bytes_scaled)
+    Returns:
+        (numpy.ndarray BGR, (fator x, fator y))
+    """
+    return decode_image_bytes_scaled(_base64_to_bytes(image_b64), min_size)
+
+
+def iter_archive_images(stream, content_type, allowed_extensions):
+    """
+    Percorre as imagens de um arquivo zip ou tar sem extraí-lo em disco
+    Args:
+        stream: Objeto de arquivo com o corpo da requisição
+        content_type: Content-Type do corpo (zip ou tar/tar.gz)
+        allowed_extensions: Extensões de imagem aceitas
+    Yields:
+        Tuplas (nome, bytes) para cada imagem do arquivo
+    """
+    def is_image(name):
+        return '.' in name and name.rsplit('.', 1)[1].lower() in allowed_extensions
+
+    if content_type in TAR_CONTENT_TYPES:
+        # Modo stream: lê os membros em sequência, sem precisar de seek
+        try:
+            with tarfile.open(fileobj=stream, mode='r|*') as archive:
+                for member in archive:
+                    if member.isfile() and is_image(member.name):
+                        yield member.name, archive.extractfile(member).read()
+        except tarfile.TarError as e:
+            raise ImageDecodeError(f"Arquivo tar inválido: {e}") from e
+
+    elif content_type in ZIP_CONTENT_TYPES:
+        # O índice do zip fica no final, então o corpo precisa estar em memória
+        try:
+            with zipfile.ZipFile(io.BytesIO(stream.read())) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and is_image(info.filename):
+                        yield info.filename, archive.read(info)
+        except zipfile.BadZipFile as e:
+            raise ImageDecodeError(f"Arquivo zip inválido: {e}") from e
+
+    else:
+        raise ImageDecodeError(f"Content-Type de lote não suportado: {content_type}")
@@ -0,0 +1,115 @@
+import os
+import shutil
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+
+# Formatos de exportação do ultralytics para cada backend
+# supports_batch: se o modelo exportado aceita lotes com mais de uma imagem
+BACKENDS = {
+    'pytorch': {'format': None, 'suffix': None, 'supports_batch': True},
+    'onnx': {'format': 'onnx', 'suffix': '.onnx', 'supports_batch': True},
+    'openvino': {'format': 'openvino', 'suffix': '_openvino_model', 'supports_batch': True},
+    'torchscript': {'format': 'torchscript', 'suffix': '.torchscript', 'supports_batch': False},
+    # ONNX quantizado em INT8 a partir de uma pasta local de calibração (ver quantization.py)
+    'onnx-int8': {'format': 'onnx', 'suffix': '.onnx', 'supports_batch': True},
+}
+
+
+def _weights_digest(model_path):
+    """Hash curto do arquivo de pesos (ou do nome, se ainda não existir localmente)"""
+    path = Path(model_path)
+    if not path.is_file():
+        return hashlib.sha256(str(model_path).encode('utf-8')).hexdigest()[:12]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+@contextmanager
+def _export_lock(cache_dir):
+    """Lock entre processos para que vários workers não exportem o mesmo modelo ao mesmo tempo"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, '.export.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_export_dir(model_path, imgsz, cache_dir='model_cache'):
+    """Pasta do cache de exportação, identificada pelo modelo (nome + hash) e pelo imgsz"""
+    stem = Path(model_path).stem
+    return os.path.join(cache_dir, f"{stem}-{_weights_digest(model_path)}_{imgsz}")
+
+
+def resolve_model_path(model_path, backend='pytorch', imgsz=640, cache_dir='model_cache',
+                       calibration_dir=None, **export_kwargs):
+    """
+    Retorna o caminho do modelo a ser carregado pelo YOLO para o backend escolhido,
+    exportando e guardando em cache no disco na primeira vez
+    Args:
+        model_path: Caminho dos pesos PyTorch (.pt)
+        backend: 'pytorch', 'onnx', 'openvino', 'torchscript' ou 'onnx-int8'
+        imgsz: Tamanho de entrada usado na exportação
+        cache_dir: Pasta raiz do cache de modelos exportados
+        calibration_dir: Pasta de imagens de calibração (obrigatória para 'onnx-int8')
+        export_kwargs: Argumentos extras para YOLO.export (ex.: int8=True)
+    Returns:
+        Caminho do modelo (arquivo ou pasta)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(BACKENDS)})")
+
+    spec = BACKENDS[backend]
+    if spec['format'] is None:
+        return model_path
+
+    if backend == 'onnx-int8':
+        if not calibration_dir:
+            raise ValueError("O backend onnx-int8 precisa de uma pasta de calibração")
+        from quantization import quantize_onnx_model
+
+        fp32_path = resolve_model_path(model_path, 'onnx', imgsz, cache_dir, **export_kwargs)
+        with _export_lock(cache_dir):
+            return quantize_onnx_model(fp32_path, calibration_dir, imgsz)
+
+    export_dir = get_export_dir(model_path, imgsz, cache_dir)
+    variant = ''.join(f"_{key}" for key, value in sorted(export_kwargs.items()) if value is True)
+    target = os.path.join(export_dir, f"{Path(model_path).stem}{variant}{spec['suffix']}")
+
+    if os.path.exists(target):
+        return target
+
+    with _export_lock(cache_dir):
+        # Outro processo pode ter exportado enquanto esperávamos o lock
+        if os.path.exists(target):
+            return target
+
+        from ultralytics import YOLO
+
+        print(f"📦 Exportando {model_path} para {backend} (imgsz={imgsz})...")
+        exported = YOLO(model_path).export(
+            format=spec['format'],
+            imgsz=imgsz,
+            dynamic=spec['supports_batch'],
+            **export_kwargs
+        )
+
+        os.makedirs(export_dir, exist_ok=True)
+        shutil.move(str(exported), target)
+        print(f"✅ Modelo exportado em cache: {target}")
+
+    return target
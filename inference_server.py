@@ -0,0 +1,444 @@
+import os
+import atexit
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client, wait as wait_any
+from concurrent.futures import Future
+import numpy as np
+from batch_scheduler import QueueFullError, DeadlineExceededError, wait_result
+from yolo_detector import YOLODetector
+from metrics import observe_model_speed
+from process_memory import available_cpus
+
+
+def _inference_worker_main(worker_index, detector_kwargs, shm_name, slot_bytes, requests, free_slots,
+                           ready, max_batch_size, torch_threads, warmup_runs):
+    """
+    Loop de um processo de inferência: dono do modelo, lê os frames do ring buffer
+    em memória compartilhada e devolve os resultados pelo canal de cada processo HTTP
+    """
+    os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+
+    try:
+        detector = YOLODetector(**detector_kwargs)
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+        if warmup_runs > 0:
+            detector.warmup(runs=warmup_runs, batch_sizes=(1, max_batch_size) if max_batch_size > 1 else (1,))
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except Exception as e:
+        ready.put((worker_index, str(e)))
+        return
+
+    ready.put((worker_index, None))
+    print(f"🧩 Processo de inferência {worker_index} pronto (pid {os.getpid()})")
+
+    connections = {}
+
+    def reply(address, message):
+        """Envia uma mensagem ao processo HTTP; retorna False se ele já foi encerrado"""
+        try:
+            if address not in connections:
+                connections[address] = Client(address, authkey=multiprocessing.current_process().authkey)
+            connections[address].send(message)
+            return True
+        except (OSError, EOFError):
+            # Processo HTTP encerrado: descartar o resultado
+            connections.pop(address, None)
+            return False
+
+    def respond(address, request_id, ok, payload, slot):
+        """
+        Responde uma requisição; o slot vai junto e é liberado pelo processo HTTP ao ler a
+        resposta (aqui, só se o processo HTTP já foi encerrado)
+        """
+        if not reply(address, (request_id, ok, payload, slot)) and slot is not None:
+            free_slots.put(slot)
+
+    while True:
+        batch = [requests.get()]
+        if batch[0] is None:
+            break
+
+        # Juntar o que já estiver na fila em um único forward
+        while len(batch) < max_batch_size:
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                requests.put(None)
+                break
+            batch.append(item)
+
+        # Avisar o processo HTTP de cada frame que ficou com este processo: se ele morrer, o
+        # processo HTTP falha essas requisições e devolve os slots ao ring buffer
+        for request_id, address, _, _, _, _ in batch:
+            reply(address, (request_id, 'claimed', worker_index, None))
+
+        # Frames cujo prazo esgotou na fila não chegam ao modelo
+        now = time.monotonic()
+        for request_id, address, slot, _, _, deadline in batch:
+            if deadline is not None and deadline <= now:
+                respond(address, request_id, None, 'deadline', slot)
+        batch = [item for item in batch if item[5] is None or item[5] > now]
+        if not batch:
+            continue
+
+        images = []
+        for _, _, slot, shape, payload, _ in batch:
+            if slot is None:
+                images.append(payload)
+            else:
+                offset = slot * slot_bytes
+                images.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset))
+
+        try:
+            outputs = detector.detect_batch(images, columnar=True)
+            error = None
+        except Exception as e:
+            outputs, error = None, str(e)
+
+        # O modelo não guarda referências aos frames
+        del images
+        for index, (request_id, address, slot, _, _, _) in enumerate(batch):
+            if error is None:
+                respond(address, request_id, True, outputs[index], slot)
+            else:
+                respond(address, request_id, False, error, slot)
+
+    shm.close()
+
+
+class InferenceServer:
+    def __init__(self, detector_kwargs, num_workers=2, slots=8, slot_bytes=8 * 1024 * 1024,
+                 max_batch_size=8, warmup_runs=1, acquire_timeout=1.0, timeout=30.0, on_unavailable=None):
+        """
+        Inicializa o pool de processos de inferência (não inicia os processos; ver start)
+        Args:
+            detector_kwargs: Argumentos de YOLODetector usados em cada processo
+            num_workers: Número de processos de inferência (réplicas do modelo)
+            slots: Número de slots do ring buffer em memória compartilhada
+            slot_bytes: Tamanho de cada slot (frames maiores são enviados serializados)
+            max_batch_size: Máximo de frames por forward em cada processo
+            warmup_runs: Passadas de aquecimento em cada processo (0 desativa)
+            acquire_timeout: Espera máxima por um slot livre antes de responder fila cheia
+            timeout: Espera máxima por um resultado (segundos)
+            on_unavailable: Função chamada (com a mensagem de erro) em cada processo HTTP
+                quando todos os processos de inferência foram encerrados
+        """
+        self.detector_kwargs = dict(detector_kwargs)
+        self.num_workers = max(1, int(num_workers))
+        self.slots = max(1, int(slots))
+        self.slot_bytes = int(slot_bytes)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.warmup_runs = int(warmup_runs)
+        self.acquire_timeout = acquire_timeout
+        self.timeout = timeout
+        self.on_unavailable = on_unavailable
+
+        self.started = False
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = []
+        self._shm = None
+        self._owner_pid = None
+
+        # Canal de resultados deste processo (criado sob demanda, inclusive após fork)
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+        self._listener_dir = None
+        self._pending = {}
+        self._dead_workers = set()
+        self._ids = itertools.count()
+
+        # Estatísticas (por processo HTTP)
+        self._requests = 0
+        self._shm_transfers = 0
+        self._pickled_transfers = 0
+        self._errors = 0
+        self._rejected = 0
+        self._expired = 0
+        self._lost = 0
+        self._total_round_trip = 0.0
+
+    def start(self):
+        """Cria o ring buffer e inicia os processos de inferência"""
+        if self.started:
+            return
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._owner_pid = os.getpid()
+        self._requests_queue = self._context.Queue()
+        self._free_slots = self._context.Queue()
+        self._ready = self._context.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+
+        torch_threads = max(1, available_cpus() // self.num_workers)
+        for worker_index in range(self.num_workers):
+            process = self._context.Process(
+                target=_inference_worker_main,
+                args=(worker_index, self.detector_kwargs, self._shm.name, self.slot_bytes,
+                      self._requests_queue, self._free_slots, self._ready, self.max_batch_size,
+                      torch_threads, self.warmup_runs),
+                name=f'inference-{worker_index}',
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+        # Processos HTTP criados por fork (gunicorn) herdam o registro de filhos do
+        # multiprocessing; sem isso, ao sair, tentariam encerrar os processos de inferência
+        os.register_at_fork(after_in_child=self._forget_processes)
+
+        self.started = True
+        print(f"🚀 {self.num_workers} processo(s) de inferência iniciados "
+              f"({self.slots} slots de {self.slot_bytes / 1024 / 1024:.1f} MB em memória compartilhada)")
+
+    def _forget_processes(self):
+        multiprocessing.process._children.difference_update(self._processes)
+
+    def wait_ready(self, timeout=None):
+        """Aguarda todos os processos carregarem e aquecerem o modelo"""
+        for _ in range(self.num_workers):
+            worker_index, error = self._ready.get(timeout=timeout)
+            if error is not None:
+                raise RuntimeError(f"Processo de inferência {worker_index} falhou ao carregar o modelo: {error}")
+
+    def _ensure_listener(self):
+        """Cria o canal de resultados deste processo (um socket por processo HTTP)"""
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return self._listener.address
+
+            # Após fork, os pedidos pendentes e o listener pertencem ao processo pai
+            self._pending = {}
+            self._dead_workers = set()
+            self._listener_dir = tempfile.mkdtemp(prefix='yolo-inference-')
+            address = os.path.join(self._listener_dir, 'results.sock')
+            self._listener = Listener(address, family='AF_UNIX',
+                                      authkey=multiprocessing.current_process().authkey)
+            self._listener_pid = os.getpid()
+            # Processos HTTP criados por fork não chamam close: remover o socket ao sair
+            atexit.register(self._close_listener)
+            threading.Thread(target=self._accept_loop, args=(self._listener,),
+                             name='inference-results', daemon=True).start()
+            threading.Thread(target=self._watch_workers, name='inference-watch', daemon=True).start()
+            return address
+
+    def _watch_workers(self):
+        """Marca os processos de inferência encerrados; sem nenhum ativo, avisa on_unavailable"""
+        # O sentinel de cada processo é herdado pelos processos HTTP criados por fork
+        sentinels = {process.sentinel: index for index, process in enumerate(self._processes)}
+        while sentinels:
+            try:
+                exited = wait_any(list(sentinels))
+            except OSError:
+                return
+            for sentinel in exited:
+                worker_index = sentinels.pop(sentinel)
+                with self._lock:
+                    self._dead_workers.add(worker_index)
+                    unavailable = len(self._dead_workers) == self.num_workers
+                if not self.started:
+                    # Encerramento normal (close)
+                    return
+                print(f"💥 Processo de inferência {worker_index} encerrado inesperadamente")
+                if unavailable and self.on_unavailable is not None:
+                    self.on_unavailable("Todos os processos de inferência foram encerrados")
+
+    def _accept_loop(self, listener):
+        """Aceita uma conexão de cada processo de inferência"""
+        while True:
+            try:
+                connection = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._receive_loop, args=(connection,),
+                             name='inference-results-reader', daemon=True).start()
+
+    def _receive_loop(self, connection):
+        """Entrega cada resultado recebido ao Future da requisição correspondente"""
+        # Requisições deste processo HTTP que estão com o processo de inferência da conexão
+        claimed = set()
+        while True:
+            try:
+                request_id, ok, payload, slot = connection.recv()
+            except (EOFError, OSError):
+                # Conexão encerrada: o processo de inferência saiu com essas requisições
+                self._fail_claimed(claimed)
+                return
+
+            if ok == 'claimed':
+                claimed.add(request_id)
+                continue
+            claimed.discard(request_id)
+
+            # O slot volta ao ring buffer aqui, e não no processo de inferência: um slot
+            # respondido nunca é liberado por _fail_claimed, e vice-versa
+            if slot is not None:
+                self._free_slots.put(slot)
+
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is None:
+                continue
+
+            future, columnar, submitted, _ = entry
+            with self._lock:
+                self._total_round_trip += time.monotonic() - submitted
+                self._errors += ok is False
+                self._expired += ok is None
+
+            # Requisição que desistiu de esperar (prazo esgotado)
+            if not future.set_running_or_notify_cancel():
+                continue
+            if ok is None:
+                future.set_exception(DeadlineExceededError("Prazo da requisição esgotado na fila de inferência"))
+                continue
+            if not ok:
+                future.set_exception(RuntimeError(f"Erro na inferência: {payload}"))
+                continue
+
+            # Tempos do modelo medidos no processo de inferência, exportados por este processo
+            observe_model_speed(payload.get('speed', {}), self.detector_kwargs.get('backend', 'pytorch'))
+            if columnar:
+                future.set_result(payload)
+            else:
+                future.set_result(YOLODetector.columns_to_detections(payload))
+
+    def _fail_claimed(self, request_ids):
+        """Falha as requisições que estavam com um processo de inferência encerrado e libera seus slots"""
+        with self._lock:
+            lost = [self._pending.pop(request_id) for request_id in request_ids if request_id in self._pending]
+            self._lost += len(lost)
+        if not lost or not self.started:
+            return
+        print(f"⚠️ {len(lost)} requisição(ões) perdidas com um processo de inferência encerrado")
+        for future, _, _, slot in lost:
+            # Sem resposta, o slot ainda não foi liberado
+            if slot is not None:
+                self._free_slots.put(slot)
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Processo de inferência encerrado durante a inferência"))
+
+    def submit(self, image, columnar=False, deadline=None):
+        """
+        Envia um frame para o pool de inferência
+        Args:
+            image: numpy.ndarray (BGR) decodificado
+            columnar: Formato de saída, como em YOLODetector.detect
+            deadline: Prazo em time.monotonic() (relógio comum aos processos da máquina);
+                o processo de inferência descarta o frame se ele passar antes do forward
+        Returns:
+            concurrent.futures.Future com o resultado da detecção
+        """
+        if not self.started:
+            raise RuntimeError("Servidor de inferência não iniciado")
+        address = self._ensure_listener()
+        if len(self._dead_workers) == self.num_workers:
+            raise RuntimeError("Nenhum processo de inferência ativo")
+
+        # Frames uint8 que cabem em um slot vão pelo ring buffer; os demais são serializados
+        slot, shape, payload = None, None, None
+        if isinstance(image, np.ndarray) and image.dtype == np.uint8 and image.nbytes <= self.slot_bytes:
+            acquire_timeout = self.acquire_timeout
+            if deadline is not None:
+                acquire_timeout = max(0.0, min(acquire_timeout, deadline - time.monotonic()))
+            try:
+                slot = self._free_slots.get(timeout=acquire_timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._rejected += 1
+                raise QueueFullError(f"Nenhum slot livre no ring buffer de inferência ({self.slots} slots)")
+            shape = image.shape
+            offset = slot * self.slot_bytes
+            np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset)[...] = image
+        else:
+            payload = image
+
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, columnar, time.monotonic(), slot)
+            self._requests += 1
+            if slot is None:
+                self._pickled_transfers += 1
+            else:
+                self._shm_transfers += 1
+
+        self._requests_queue.put((request_id, address, slot, shape, payload, deadline))
+        return future
+
+    def detect(self, image, columnar=False, timeout=None, deadline=None):
+        """Mesma interface de YOLODetector.detect, executando em um processo de inferência"""
+        return wait_result(self.submit(image, columnar=columnar, deadline=deadline), deadline,
+                           timeout or self.timeout)
+
+    def _workers_alive(self):
+        alive = 0
+        for index, process in enumerate(self._processes):
+            if index in self._dead_workers:
+                # Já encerrado (o pid ainda existe como zumbi até o join no processo dono)
+                continue
+            try:
+                # os.kill funciona também nos processos HTTP criados por fork
+                os.kill(process.pid, 0)
+                alive += 1
+            except (OSError, TypeError):
+                pass
+        return alive
+
+    def get_stats(self):
+        """Retorna estatísticas do pool de inferência (contadores deste processo HTTP)"""
+        with self._lock:
+            completed = self._requests - len(self._pending) - self._lost
+            return {
+                'workers': self.num_workers,
+                'workers_alive': self._workers_alive(),
+                'slots': self.slots,
+                'slot_mb': round(self.slot_bytes / 1024 / 1024, 2),
+                'free_slots': self._free_slots.qsize() if self.started else None,
+                'requests': self._requests,
+                'pending': len(self._pending),
+                'shm_transfers': self._shm_transfers,
+                'pickled_transfers': self._pickled_transfers,
+                'errors': self._errors,
+                'rejected': self._rejected,
+                'expired': self._expired,
+                'lost': self._lost,
+                'avg_round_trip_ms': round(self._total_round_trip / completed * 1000, 2) if completed else 0.0
+            }
+
+    def _close_listener(self):
+        """Fecha o canal de resultados deste processo e remove a pasta temporária do socket"""
+        with self._lock:
+            if self._listener is None or self._listener_pid != os.getpid():
+                return
+            listener, directory = self._listener, self._listener_dir
+            self._listener = self._listener_dir = None
+        listener.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def close(self):
+        """Encerra os processos de inferência, libera a memória compartilhada e remove o canal de resultados"""
+        self._close_listener()
+        if not self.started or os.getpid() != self._owner_pid:
+            return
+        self.started = False
+        for _ in self._processes:
+            self._requests_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API por sockets reais: throughput e latência p50/p95/p99 de /detect,
+/detect-base64, /detect-bin e /tts com concorrência e taxa de chegada configuráveis
+
+    # Sobe a API (gunicorn, TTS_ENGINE=stub) e mede as quatro rotas com 8 conexões por 30s
+    python load_test.py --start-server --concurrency 8 --duration 30
+
+    # Carga aberta: 20 req/s com chegadas de Poisson contra uma API já em execução
+    python load_test.py --url http://127.0.0.1:8000 --rate 20 --duration 60
+
+    # Reproduz um log de requisições (JSONL)
+    python load_test.py --replay carga.jsonl --speed 2
+"""
+
+import argparse
+import base64
+import io
+import itertools
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+import numpy as np
+import requests
+from PIL import Image
+
+ENDPOINTS = ('detect', 'detect-base64', 'detect-bin', 'tts')
+DETECT_ENDPOINTS = ('detect', 'detect-base64', 'detect-bin')
+
+# Frases usadas nas requisições sintéticas de /tts
+TTS_TEXTS = [
+    "Olá! Vejo uma pessoa na imagem!",
+    "Há 2 carros na foto!",
+    "Nenhum objeto foi detectado nesta imagem.",
+    "Detectei 3 garrafas na imagem! No total, detectei 5 itens!",
+    "Au au! Vejo um cachorro no centro e na parte inferior."
+]
+
+
+def synthetic_jpeg(width, height, seed):
+    """JPEG sintético (ruído ampliado, mais próximo de uma foto que ruído puro)"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height)
+
+
+class RequestSpec:
+    def __init__(self, endpoint, image=None, filename='imagem.jpg', text=None, play_audio=True,
+                 params=None, headers=None, at=None):
+        """
+        Uma requisição da carga, com o corpo já preparado (a codificação não entra na medida)
+        Args:
+            endpoint: detect, detect-base64, detect-bin ou tts
+            image: Bytes da imagem (endpoints de detecção)
+            text: Texto do /tts
+            params: Query string (ex.: {'tts_mode': 'none'})
+            headers: Headers extras (ex.: X-Session-ID)
+            at: Instante relativo (segundos) em que a requisição foi feita no log original
+        """
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconhecido: {endpoint} (opções: {', '.join(ENDPOINTS)})")
+        self.endpoint = endpoint
+        self.params = params or {}
+        self.headers = headers or {}
+        self.at = at
+        self.kwargs = {}
+
+        if endpoint == 'detect':
+            self.kwargs['files'] = {'image': (filename, image, 'image/jpeg')}
+        elif endpoint == 'detect-base64':
+            self.kwargs['json'] = {'image': base64.b64encode(image).decode('ascii')}
+        elif endpoint == 'detect-bin':
+            self.kwargs['data'] = image
+            self.headers = {'Content-Type': 'image/jpeg', **self.headers}
+        else:
+            self.kwargs['json'] = {'text': text or TTS_TEXTS[0], 'play_audio': play_audio}
+
+    def send(self, session, base_url, timeout):
+        return session.post(f"{base_url}/{self.endpoint}", params=self.params, headers=self.headers,
+                            timeout=timeout, **self.kwargs)
+
+
+def load_replay(path, default_image):
+    """
+    Lê um log JSONL com uma requisição por linha, por exemplo:
+        {"endpoint": "detect-bin", "image": "fotos/a.jpg", "params": {"tts_mode": "none"}, "at": 0.5}
+        {"endpoint": "tts", "text": "Olá!", "play_audio": false, "at": 0.9}
+    Caminhos de imagem são relativos ao arquivo do log; sem "image" usa uma imagem sintética
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    images = {}
+    specs = []
+
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            endpoint = entry.get('endpoint', '').strip('/')
+            if endpoint not in ENDPOINTS:
+                raise SystemExit(f"❌ {path}:{line_number}: endpoint inválido {entry.get('endpoint')!r}")
+
+            image, filename = None, 'imagem.jpg'
+            if endpoint in DETECT_ENDPOINTS:
+                image_path = entry.get('image')
+                if image_path:
+                    image_path = os.path.join(base_dir, image_path)
+                    if image_path not in images:
+                        with open(image_path, 'rb') as image_file:
+                            images[image_path] = image_file.read()
+                    image, filename = images[image_path], os.path.basename(image_path)
+                else:
+                    image = default_image
+
+            specs.append(RequestSpec(
+                endpoint, image=image, filename=filename, text=entry.get('text'),
+                play_audio=entry.get('play_audio', True), params=entry.get('params'),
+                headers=entry.get('headers'), at=entry.get('at')
+            ))
+
+    if not specs:
+        raise SystemExit(f"❌ Nenhuma requisição em {path}")
+    return specs
+
+
+def synthetic_workload(args):
+    """Requisições sintéticas alternando entre os endpoints e tamanhos de imagem escolhidos"""
+    if args.images:
+        paths = sorted(os.path.join(args.images, name) for name in os.listdir(args.images)
+                       if os.path.splitext(name)[1].lower() in ('.jpg', '.jpeg'))
+        if not paths:
+            raise SystemExit(f"❌ Nenhum JPEG em {args.images}")
+        images = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                images.append((os.path.basename(path), f.read()))
+    else:
+        images = [(f'sintetica_{width}x{height}.jpg', synthetic_jpeg(width, height, seed))
+                  for seed, (width, height) in enumerate(map(parse_size, args.image_sizes))]
+
+    rng = random.Random(args.seed)
+    specs = []
+    for index in range(max(len(images), len(TTS_TEXTS)) * len(args.endpoints)):
+        endpoint = args.endpoints[index % len(args.endpoints)]
+        filename, image = images[(index // len(args.endpoints)) % len(images)]
+        params = {'tts_mode': args.tts_mode} if endpoint in DETECT_ENDPOINTS else {}
+        specs.append(RequestSpec(endpoint, image=image, filename=filename, text=rng.choice(TTS_TEXTS),
+                                 play_audio=not args.no_playback, params=params))
+    return specs
+
+
+def parse_server_timing(header):
+    """'decode;dur=4.1, detect;dur=38.0' -> {'decode': 4.1, 'detect': 38.0}"""
+    stages = {}
+    for entry in (header or '').split(','):
+        name, _, rest = entry.strip().partition(';')
+        for param in rest.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                try:
+                    stages[name] = stages.get(name, 0.0) + float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+class LoadRunner:
+    def __init__(self, base_url, specs, concurrency, timeout):
+        """
+        Executa a carga com um pool de conexões HTTP (uma sessão keep-alive por thread)
+        Args:
+            base_url: URL da API
+            specs: Lista de RequestSpec, percorrida em ciclo
+            concurrency: Número máximo de requisições simultâneas
+            timeout: Timeout de cada requisição (segundos)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.specs = specs
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _execute(self, session, spec, scheduled):
+        """Envia uma requisição; a latência conta a partir do instante agendado (carga aberta)"""
+        started = time.perf_counter()
+        try:
+            response = spec.send(session, self.base_url, self.timeout)
+            status = response.status_code
+            server_timing = parse_server_timing(response.headers.get('Server-Timing'))
+            error = None if status < 400 else response.text[:200]
+        except requests.RequestException as e:
+            status, server_timing, error = 0, {}, type(e).__name__
+        finished = time.perf_counter()
+
+        record = {
+            'endpoint': spec.endpoint,
+            'status': status,
+            'latency': finished - (scheduled if scheduled is not None else started),
+            'start_lag': started - scheduled if scheduled is not None else 0.0,
+            'finished': finished,
+            'server_timing': server_timing,
+            'error': error
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def warmup(self, count):
+        """Envia algumas requisições de cada endpoint antes da medida (não contabilizadas)"""
+        with requests.Session() as session:
+            seen = {}
+            for spec in self.specs:
+                if seen.get(spec.endpoint, 0) < count:
+                    seen[spec.endpoint] = seen.get(spec.endpoint, 0) + 1
+                    try:
+                        spec.send(session, self.base_url, self.timeout)
+                    except requests.RequestException:
+                        pass
+
+    def run_closed(self, duration, total):
+        """Carga fechada: cada thread envia a próxima requisição assim que a anterior termina"""
+        source = itertools.cycle(self.specs) if total is None else iter(
+            [self.specs[index % len(self.specs)] for index in range(total)])
+        source_lock = threading.Lock()
+        deadline = time.perf_counter() + duration if duration else None
+
+        def worker():
+            with requests.Session() as session:
+                while deadline is None or time.perf_counter() < deadline:
+                    with source_lock:
+                        spec = next(source, None)
+                    if spec is None:
+                        return
+                    self._execute(session, spec, None)
+
+        return self._run_workers(worker)
+
+    def run_open(self, schedule):
+        """
+        Carga aberta: as requisições são disparadas nos instantes agendados, independentemente
+        das respostas; se todas as conexões estiverem ocupadas, a espera conta na latência
+        Args:
+            schedule: Iterável de (segundos desde o início, RequestSpec)
+        """
+        pending = queue.Queue(maxsize=self.concurrency * 4)
+        start = time.perf_counter()
+
+        def worker():
+            with requests.Session() as session:
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        return
+                    spec, scheduled = item
+                    self._execute(session, spec, scheduled)
+
+        def dispatcher():
+            for offset, spec in schedule:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pending.put((spec, start + offset))
+            for _ in range(self.concurrency):
+                pending.put(None)
+
+        threading.Thread(target=dispatcher, name='load-dispatcher', daemon=True).start()
+        return self._run_workers(worker, start)
+
+    def _run_workers(self, target, start=None):
+        start = time.perf_counter() if start is None else start
+        threads = [threading.Thread(target=target, name=f'load-{index}', daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def arrival_schedule(specs, rate, duration, total, arrival, seed):
+    """Instantes de chegada com taxa média rate (req/s): intervalos exponenciais (poisson) ou fixos"""
+    rng = random.Random(seed)
+    offset = 0.0
+    for index in itertools.count():
+        if (total is not None and index >= total) or (total is None and offset >= duration):
+            return
+        yield offset, specs[index % len(specs)]
+        offset += rng.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+
+
+def replay_schedule(specs, speed, duration):
+    """Instantes do próprio log (campo at), acelerados por speed"""
+    for spec in specs:
+        offset = (spec.at or 0.0) / speed
+        if duration and offset > duration:
+            return
+        yield offset, spec
+
+
+def summarize(records, elapsed):
+    """Agrega latência, throughput, status e Server-Timing por endpoint e no total"""
+    def stats(group):
+        latencies = np.array([record['latency'] for record in group]) * 1000
+        statuses = {}
+        for record in group:
+            statuses[str(record['status'])] = statuses.get(str(record['status']), 0) + 1
+        stages = {}
+        for record in group:
+            for name, value in record['server_timing'].items():
+                stages.setdefault(name, []).append(value)
+        errors = [record for record in group if record['status'] == 0 or record['status'] >= 400]
+        return {
+            'requests': len(group),
+            'errors': len(errors),
+            'error_rate': round(len(errors) / len(group), 4),
+            'throughput_rps': round(len(group) / elapsed, 2) if elapsed else 0.0,
+            'status': dict(sorted(statuses.items())),
+            'latency_ms': {
+                'mean': round(float(latencies.mean()), 2),
+                'p50': round(float(np.percentile(latencies, 50)), 2),
+                'p95': round(float(np.percentile(latencies, 95)), 2),
+                'p99': round(float(np.percentile(latencies, 99)), 2),
+                'max': round(float(latencies.max()), 2)
+            },
+            'max_start_lag_ms': round(max(record['start_lag'] for record in group) * 1000, 2),
+            # Média das etapas medidas no servidor (header Server-Timing)
+            'server_timing_ms': {name: round(float(np.mean(values)), 2) for name, values in stages.items()},
+            'sample_errors': sorted({record['error'] for record in errors if record['error']})[:3]
+        }
+
+    by_endpoint = {}
+    for record in records:
+        by_endpoint.setdefault(record['endpoint'], []).append(record)
+
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'total': stats(records) if records else None,
+        'endpoints': {endpoint: stats(group) for endpoint, group in sorted(by_endpoint.items())}
+    }
+
+
+def start_server(base_url, tts_engine, extra_env):
+    """Sobe a API com gunicorn (TTS local por padrão) e espera /ready"""
+    port = urlparse(base_url).port or 80
+    env = {
+        **os.environ,
+        'PORT': str(port),
+        'TTS_ENGINE': tts_engine,
+        'SDL_AUDIODRIVER': os.environ.get('SDL_AUDIODRIVER', 'dummy'),
+        **extra_env
+    }
+    print(f"🚀 Iniciando a API na porta {port} (TTS_ENGINE={tts_engine})...")
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+
+    deadline = time.perf_counter() + 300
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"❌ A API terminou durante a inicialização (código {process.returncode})")
+        try:
+            if requests.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                print("✅ API pronta")
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise SystemExit("❌ A API não ficou pronta em 300s")
+
+
+def print_report(summary):
+    print("\n📊 Resultados")
+    print(f"{'endpoint':<14} {'req':>6} {'erros':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(summary['endpoints'].items())
+    if summary['total'] is not None:
+        rows.append(('total', summary['total']))
+    for name, stats in rows:
+        latency = stats['latency_ms']
+        print(f"{name:<14} {stats['requests']:>6} {stats['errors']:>6} {stats['throughput_rps']:>8} "
+              f"{latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} {latency['max']:>9}")
+
+    print("\n⏱️  Etapas no servidor (média, ms)")
+    for name, stats in summary['endpoints'].items():
+        stages = ', '.join(f"{stage} {value}" for stage, value in stats['server_timing_ms'].items())
+        print(f"   {name}: {stages or '-'}")
+        for error in stats['sample_errors']:
+            print(f"      ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga da API YOLO (sockets reais)')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='URL base da API')
+    parser.add_argument('--start-server', action='store_true',
+                        help='Sobe a API com gunicorn na porta da URL e a encerra no fim')
+    parser.add_argument('--tts-engine', default='stub', choices=['stub', 'gtts'],
+                        help='TTS_ENGINE da API iniciada com --start-server (padrão: stub, sem rede)')
+    parser.add_argument('--server-env', nargs='*', default=[], metavar='NOME=VALOR',
+                        help='Variáveis extras da API iniciada (ex.: WEB_CONCURRENCY=2 BATCH_MAX_SIZE=16)')
+
+    workload = parser.add_argument_group('carga')
+    workload.add_argument('--replay', help='Log JSONL de requisições para reproduzir')
+    workload.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    workload.add_argument('--images', help='Pasta com JPEGs (padrão: imagens sintéticas)')
+    workload.add_argument('--image-sizes', nargs='+', default=['640x480', '1280x720', '4000x3000'],
+                          help='Tamanhos das imagens sintéticas')
+    workload.add_argument('--tts-mode', default='none', choices=['sync', 'async', 'none'],
+                          help='tts_mode das requisições de detecção sintéticas')
+    workload.add_argument('--no-playback', action='store_true', help='Envia play_audio=false no /tts')
+    workload.add_argument('--seed', type=int, default=0)
+
+    shape = parser.add_argument_group('intensidade')
+    shape.add_argument('--concurrency', type=int, default=4, help='Conexões simultâneas')
+    shape.add_argument('--rate', type=float, help='Taxa de chegada (req/s); sem ela a carga é fechada')
+    shape.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson')
+    shape.add_argument('--speed', type=float, default=1.0, help='Aceleração do --replay (usa o campo at)')
+    shape.add_argument('--duration', type=float, default=30.0, help='Duração da medida (segundos)')
+    shape.add_argument('--requests', type=int, help='Número de requisições (no lugar de --duration)')
+    shape.add_argument('--warmup', type=int, default=2, help='Requisições de aquecimento por endpoint')
+    shape.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    if args.replay:
+        specs = load_replay(args.replay, synthetic_jpeg(*parse_size(args.image_sizes[0]), args.seed))
+    else:
+        specs = synthetic_workload(args)
+
+    server = None
+    if args.start_server:
+        server = start_server(base_url, args.tts_engine,
+                              dict(item.split('=', 1) for item in args.server_env))
+    elif 'tts' in {spec.endpoint for spec in specs} or args.tts_mode != 'none':
+        print("ℹ️  Para resultados reproduzíveis sem rede, inicie a API com TTS_ENGINE=stub")
+
+    try:
+        runner = LoadRunner(base_url, specs, args.concurrency, args.timeout)
+        if args.warmup:
+            runner.warmup(args.warmup)
+
+        duration = None if args.requests else args.duration
+        if args.rate:
+            mode = f"aberta, {args.rate:g} req/s ({args.arrival})"
+            elapsed = runner.run_open(arrival_schedule(specs, args.rate, duration, args.requests,
+                                                       args.arrival, args.seed))
+        elif args.replay and any(spec.at is not None for spec in specs):
+            mode = f"replay, velocidade {args.speed:g}x"
+            elapsed = runner.run_open(replay_schedule(specs, args.speed, duration))
+        else:
+            mode = "fechada"
+            elapsed = runner.run_closed(duration, args.requests)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if not runner.records:
+        raise SystemExit("❌ Nenhuma requisição concluída")
+
+    summary = summarize(runner.records, elapsed)
+    summary['config'] = {
+        'url': base_url,
+        'mode': mode,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'endpoints': sorted({spec.endpoint for spec in specs}),
+        'replay': args.replay
+    }
+    print(f"\n🧪 Carga {mode}, {args.concurrency} conexões, {len(runner.records)} requisições em {elapsed:.1f}s")
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
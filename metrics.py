@@ -0,0 +1,258 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Content-Type do formato de texto do Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites padrão dos histogramas de latência (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    """Formata um número no formato de texto do Prometheus"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    """Escapa o valor de um label"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Métrica com labels, segura para uso entre threads
+        Args:
+            name: Nome da métrica (ex.: yolo_api_requests_total)
+            documentation: Texto do # HELP
+            labelnames: Nomes dos labels, informados como kwargs em cada atualização
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _samples(self):
+        """Linhas de amostra (chamado com o lock adquirido)"""
+        return [f'{self.name}{self._labels_text(key)} {_format_value(value)}'
+                for key, value in sorted(self._values.items())]
+
+    def render(self):
+        with self._lock:
+            samples = self._samples()
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}'] + samples
+
+
+class Counter(_Metric):
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    TYPE = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Contagem por faixa (a última é +Inf), soma e total
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = self._labels_text(key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels_text(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{self._labels_text(key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Conjunto de métricas exportadas em /metrics"""
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Retorna todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+# Registro do processo e métricas compartilhadas pelos módulos
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'yolo_api_requests_total', 'Requisições HTTP atendidas', ('endpoint', 'method', 'status'))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'yolo_api_request_duration_seconds', 'Duração total das requisições HTTP', ('endpoint', 'method'))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'yolo_api_requests_in_flight', 'Requisições HTTP em andamento', ('endpoint',))
+STAGE_SECONDS = REGISTRY.histogram(
+    'yolo_api_stage_duration_seconds', 'Duração de cada etapa do processamento', ('stage',))
+STAGE_IN_FLIGHT = REGISTRY.gauge(
+    'yolo_api_stage_in_flight', 'Etapas em execução no momento', ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'yolo_api_stage_errors_total', 'Exceções levantadas em cada etapa', ('stage', 'error'))
+MODEL_STAGE_SECONDS = REGISTRY.histogram(
+    'yolo_api_model_stage_duration_seconds',
+    'Pré-processamento, inferência e pós-processamento do modelo por imagem (speed do ultralytics)',
+    ('stage', 'backend'))
+MODEL_INFO = REGISTRY.gauge(
+    'yolo_api_model_info', 'Modelo e backend de inferência em uso', ('model', 'backend', 'imgsz', 'inference_mode'))
+READY = REGISTRY.gauge(
+    'yolo_api_ready', '1 quando o modelo está carregado e aquecido')
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    'yolo_api_admission_queue_depth', 'Requisições de detecção admitidas e ainda em andamento')
+CLIENT_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'yolo_api_client_queue_wait_seconds', 'Espera de cada cliente pela vez na fila justa de inferência',
+    ('client', 'lane'))
+CLIENT_REJECTED = REGISTRY.counter(
+    'yolo_api_client_rejected_total', 'Requisições recusadas por cliente (rate_limited ou unknown_key)',
+    ('client', 'reason'))
+SHED_REQUESTS = REGISTRY.counter(
+    'yolo_api_shed_total', 'Requisições recusadas com 503 por sobrecarga (queue_full ou deadline)', ('reason',))
+
+
+# Etapas medidas na requisição atual, usadas no header Server-Timing. Um ContextVar é
+# isolado por thread (Flask) e por task (ASGI); trabalho enviado a um executor com
+# contextvars.copy_context().run acumula no mesmo dict da requisição
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request_timings():
+    """Passa a acumular as etapas medidas no contexto atual (thread ou task)"""
+    _request_timings.set({})
+
+
+def finish_request_timings():
+    """
+    Encerra o acúmulo do contexto atual
+    Returns:
+        dict etapa -> segundos (etapas repetidas são somadas), na ordem em que ocorreram
+    """
+    stages = _request_timings.get()
+    _request_timings.set(None)
+    return stages or {}
+
+
+def format_server_timing(stages, total=None):
+    """
+    Monta o valor do header Server-Timing (durações em milissegundos)
+    Args:
+        stages: dict etapa -> segundos
+        total: Duração total da requisição (segundos), se conhecida
+    """
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in stages.items()]
+    if total is not None:
+        entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+@contextmanager
+def stage(name):
+    """
+    Mede uma etapa do processamento (duração, execuções em andamento e exceções)
+    Args:
+        name: Nome da etapa (label stage)
+    """
+    STAGE_IN_FLIGHT.inc(stage=name)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.inc(stage=name, error=type(e).__name__)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=name)
+        STAGE_IN_FLIGHT.dec(stage=name)
+
+        stages = _request_timings.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + duration
+
+
+def observe_model_speed(speed, backend):
+    """
+    Registra os tempos por imagem reportados pelo ultralytics (Results.speed, em ms)
+    Args:
+        speed: dict com preprocess, inference e postprocess
+        backend: Backend de inferência (label)
+    """
+    for stage_name in ('preprocess', 'inference', 'postprocess'):
+        value = speed.get(stage_name)
+        if value is not None:
+            MODEL_STAGE_SECONDS.observe(value / 1000, stage=stage_name, backend=backend)
@@ -0,0 +1,193 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """IoU entre dois conjuntos de caixas xyxy (N x M)"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def bbox_xyxy(bbox):
+    """Converte o bbox de uma detecção (dict x1/y1/x2/y2) em [x1, y1, x2, y2]"""
+    return [bbox['x1'], bbox['y1'], bbox['x2'], bbox['y2']]
+
+
+class ObjectTracker:
+    def __init__(self, high_thresh=0.5, match_thresh=0.3, max_lost_seconds=2.0, id_counter=None):
+        """
+        Rastreador de objetos por IoU no estilo ByteTrack para uma sessão
+        Args:
+            high_thresh: Confiança mínima para uma detecção iniciar um novo track; detecções
+                abaixo disso só mantêm tracks existentes (segunda etapa da associação; o
+                detector precisa retornar essas detecções, ver YOLODetector low_conf_threshold).
+                O padrão é a confiança mínima do YOLODetector
+            match_thresh: IoU mínimo entre a caixa do track e a detecção
+            max_lost_seconds: Tempo sem detecção até o track ser considerado fora de cena
+            id_counter: Iterador compartilhado de ids (None cria um próprio)
+        """
+        self.high_thresh = float(high_thresh)
+        self.match_thresh = float(match_thresh)
+        self.max_lost_seconds = float(max_lost_seconds)
+        self._ids = id_counter if id_counter is not None else itertools.count(1)
+        self.tracks = {}
+
+    def _associate(self, track_ids, detections, det_indices):
+        """Associa tracks e detecções da mesma classe pelo maior IoU (guloso)"""
+        if not track_ids or not det_indices:
+            return [], track_ids, det_indices
+
+        track_boxes = [self.tracks[track_id]['bbox'] for track_id in track_ids]
+        det_boxes = [bbox_xyxy(detections[index]['bbox']) for index in det_indices]
+        ious = box_iou(track_boxes, det_boxes)
+
+        # Classes diferentes nunca são associadas
+        track_classes = np.array([self.tracks[track_id]['class_name'] for track_id in track_ids], dtype=object)
+        det_classes = np.array([detections[index]['class_name'] for index in det_indices], dtype=object)
+        ious[track_classes[:, None] != det_classes[None, :]] = 0
+
+        matches = []
+        for flat_index in np.argsort(-ious, axis=None):
+            row, col = divmod(int(flat_index), len(det_indices))
+            if np.isnan(ious[row, col]):
+                # Track ou detecção já associados
+                continue
+            if ious[row, col] < self.match_thresh:
+                break
+            matches.append((track_ids[row], det_indices[col]))
+            ious[row, :] = np.nan
+            ious[:, col] = np.nan
+
+        matched_tracks = {track_id for track_id, _ in matches}
+        matched_dets = {index for _, index in matches}
+        return (matches,
+                [track_id for track_id in track_ids if track_id not in matched_tracks],
+                [index for index in det_indices if index not in matched_dets])
+
+    def update(self, detections, now=None):
+        """
+        Atualiza os tracks com as detecções de um frame e adiciona 'track_id' a cada detecção
+        Args:
+            detections: Lista de detecções (dicts com bbox, confidence e class_name)
+            now: Instante do frame (time.monotonic)
+        Returns:
+            (detecções que iniciaram novos tracks, tracks que saíram de cena)
+        """
+        now = time.monotonic() if now is None else now
+
+        high = [index for index, detection in enumerate(detections) if detection['confidence'] >= self.high_thresh]
+        low = [index for index, detection in enumerate(detections) if detection['confidence'] < self.high_thresh]
+
+        # Etapa 1: detecções confiáveis; etapa 2: as demais mantêm os tracks que sobraram
+        matches, remaining_tracks, unmatched_high = self._associate(list(self.tracks), detections, high)
+        low_matches, remaining_tracks, unmatched_low = self._associate(remaining_tracks, detections, low)
+
+        for track_id, index in matches + low_matches:
+            track = self.tracks[track_id]
+            track['bbox'] = bbox_xyxy(detections[index]['bbox'])
+            track['last_seen'] = now
+            detections[index]['track_id'] = track_id
+
+        appeared = []
+        for index in unmatched_high:
+            track_id = next(self._ids)
+            self.tracks[track_id] = {
+                'track_id': track_id,
+                'class_name': detections[index]['class_name'],
+                'bbox': bbox_xyxy(detections[index]['bbox']),
+                'last_seen': now
+            }
+            detections[index]['track_id'] = track_id
+            appeared.append(detections[index])
+
+        for index in unmatched_low:
+            detections[index]['track_id'] = None
+
+        departed = []
+        for track_id in remaining_tracks:
+            track = self.tracks[track_id]
+            if now - track['last_seen'] > self.max_lost_seconds:
+                departed.append({'track_id': track_id, 'class_name': track['class_name']})
+                del self.tracks[track_id]
+
+        return appeared, departed
+
+
+class TrackerRegistry:
+    def __init__(self, high_thresh=0.5, match_thresh=0.3, max_lost_seconds=2.0, session_ttl=300, max_sessions=1024):
+        """
+        Mantém um ObjectTracker por sessão de cliente
+        Args:
+            high_thresh, match_thresh, max_lost_seconds: Parâmetros de ObjectTracker
+            session_ttl: Sessões sem frames por esse tempo (segundos) são descartadas
+            max_sessions: Número máximo de sessões acompanhadas (LRU)
+        """
+        self.tracker_kwargs = {
+            'high_thresh': high_thresh,
+            'match_thresh': match_thresh,
+            'max_lost_seconds': max_lost_seconds
+        }
+        self.session_ttl = float(session_ttl)
+        self.max_sessions = max(1, int(max_sessions))
+
+        self._sessions = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.frames = 0
+        self.unchanged_frames = 0
+        self.appeared = 0
+        self.departed = 0
+
+    def update(self, session_id, detections):
+        """
+        Atualiza o rastreamento da sessão com as detecções de um frame
+        Returns:
+            (detecções de objetos novos, tracks que saíram de cena)
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                entry = {'tracker': ObjectTracker(id_counter=self._ids, **self.tracker_kwargs)}
+            entry['last_seen'] = now
+            self._sessions[session_id] = entry
+
+            # Descartar sessões expiradas e as menos recentes acima do limite
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest['last_seen'] <= self.session_ttl and len(self._sessions) <= self.max_sessions:
+                    break
+                del self._sessions[oldest_id]
+
+            appeared, departed = entry['tracker'].update(detections, now)
+
+            self.frames += 1
+            self.unchanged_frames += not appeared and not departed
+            self.appeared += len(appeared)
+            self.departed += len(departed)
+
+        return appeared, departed
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'active_tracks': sum(len(entry['tracker'].tracks) for entry in self._sessions.values()),
+                'frames': self.frames,
+                # Frames sem objetos novos nem saídas: nenhum texto nem áudio gerado
+                'unchanged_frames': self.unchanged_frames,
+                'appeared': self.appeared,
+                'departed': self.departed
+            }
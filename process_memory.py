@@ -0,0 +1,39 @@
+import os
+
+
+def available_cpus():
+    """Núcleos de CPU que o processo atual pode usar (respeita a afinidade/cgroup de CPU, no Linux)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_memory_stats():
+    """
+    Retorna a memória do processo atual separando páginas privadas (únicas deste
+    processo) de páginas compartilhadas (ex.: pesos herdados do master do gunicorn)
+    Returns:
+        dict com pid e valores em MB (lidos de /proc/self/smaps_rollup, no Linux)
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return {'pid': os.getpid(), 'available': False}
+
+    def to_mb(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+
+    return {
+        'pid': os.getpid(),
+        'available': True,
+        'rss_mb': to_mb('Rss'),
+        # PSS divide as páginas compartilhadas entre os processos que as usam
+        'pss_mb': to_mb('Pss'),
+        'private_mb': to_mb('Private_Clean', 'Private_Dirty'),
+        'shared_mb': to_mb('Shared_Clean', 'Shared_Dirty')
+    }
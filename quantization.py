@@ -0,0 +1,123 @@
+import os
+import hashlib
+from pathlib import Path
+import numpy as np
+import cv2
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp'}
+
+
+def list_images(folder):
+    """Lista as imagens de uma pasta em ordem estável"""
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+
+
+def letterbox(image, imgsz):
+    """
+    Redimensiona mantendo a proporção e completa com cinza, como o pré-processamento do YOLO
+    Args:
+        image: numpy.ndarray (BGR)
+        imgsz: Lado do quadrado de saída
+    Returns:
+        numpy.ndarray imgsz x imgsz x 3 (BGR)
+    """
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - new_height) // 2
+    left = (imgsz - new_width) // 2
+    canvas[top:top + new_height, left:left + new_width] = resized
+    return canvas
+
+
+def _calibration_digest(image_paths):
+    """Hash curto do conjunto de calibração (nome e conteúdo de cada arquivo, na ordem da lista)"""
+    digest = hashlib.sha256()
+    for path in image_paths:
+        digest.update(f"{os.path.basename(path)}\0".encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _make_calibration_reader(image_paths, input_name, imgsz):
+    """Cria o leitor de calibração do ONNX Runtime a partir de uma lista de imagens"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class ImageFolderCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(path)
+                if image is None:
+                    continue
+                # BGR HWC uint8 -> RGB CHW float32 [0, 1], lote de 1
+                tensor = letterbox(image, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+                tensor = np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+                return {input_name: tensor}
+            return None
+
+    return ImageFolderCalibrationReader()
+
+
+def quantize_onnx_model(fp32_path, calibration_dir, imgsz=640, max_images=200):
+    """
+    Gera (ou reaproveita do cache) um modelo ONNX INT8 por quantização estática pós-treino
+    Args:
+        fp32_path: Modelo ONNX FP32 exportado pelo ultralytics
+        calibration_dir: Pasta local com imagens representativas
+        imgsz: Tamanho de entrada do modelo
+        max_images: Número máximo de imagens de calibração
+    Returns:
+        Caminho do modelo INT8 (ao lado do FP32 no cache de exportação)
+    """
+    image_paths = list_images(calibration_dir)[:max_images]
+    if not image_paths:
+        raise ValueError(f"Nenhuma imagem de calibração em {calibration_dir}")
+
+    target = os.path.join(
+        os.path.dirname(fp32_path),
+        f"{Path(fp32_path).stem}_int8_{_calibration_digest(image_paths)}.onnx"
+    )
+    if os.path.exists(target):
+        return target
+
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+    input_name = onnxruntime.InferenceSession(
+        fp32_path, providers=['CPUExecutionProvider']
+    ).get_inputs()[0].name
+
+    print(f"🧮 Quantizando {fp32_path} para INT8 com {len(image_paths)} imagens de calibração...")
+    temp_target = target + '.tmp'
+    quantize_static(
+        fp32_path,
+        temp_target,
+        _make_calibration_reader(image_paths, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+    # Copiar os metadados do ultralytics (classes, stride, imgsz) para o modelo quantizado
+    fp32_model = onnx.load(fp32_path)
+    int8_model = onnx.load(temp_target)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, temp_target)
+
+    os.replace(temp_target, target)
+    print(f"✅ Modelo INT8 salvo em cache: {target}")
+    return target
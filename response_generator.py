@@ -1,5 +1,6 @@
 import random
 from collections import defaultdict
+from string import Formatter
 
 class ResponseGenerator:
     def __init__(self):
@@ -108,6 +109,12 @@ class ResponseGenerator:
             "Há {count} {object_type} na foto!"
         ]
         
+        # Mensagens para objetos que saíram de cena (rastreamento por sessão)
+        self.departure_messages = [
+            "Não vejo mais {count} {object_type}.",
+            "Deixei de ver {count} {object_type}."
+        ]
+        
         # Mensagens de resumo
         self.summary_messages = [
             "Resumindo, encontrei {total_objects} objetos na imagem!",
@@ -124,15 +131,60 @@ class ResponseGenerator:
         Returns:
             String com resposta personalizada
         """
+        return " ".join(self.generate_response_segments(detections))
+    
+    def generate_response_segments(self, detections):
+        """
+        Gera a resposta personalizada dividida em fragmentos de frase
+        Args:
+            detections: Lista de detecções do YOLO
+        Returns:
+            Lista de fragmentos; " ".join(fragmentos) é o texto da resposta
+        """
         if not detections:
-            return "Nenhum objeto foi detectado nesta imagem."
+            return ["Nenhum objeto foi detectado nesta imagem."]
+        
+        segments = self._describe_objects(detections)
+        
+        # Adicionar resumo final
+        total_objects = len(detections)
+        summary_msg = random.choice(self.summary_messages)
+        segments.extend(self._split_template(summary_msg, total_objects=total_objects))
         
+        return segments
+    
+    def generate_tracking_segments(self, appeared, departed):
+        """
+        Gera fragmentos apenas para as mudanças na cena de uma sessão rastreada
+        Args:
+            appeared: Detecções que iniciaram novos tracks
+            departed: Tracks que saíram de cena (dicts com class_name)
+        Returns:
+            Lista de fragmentos (vazia se nada mudou)
+        """
+        segments = self._describe_objects(appeared) if appeared else []
+        
+        departed_counts = defaultdict(int)
+        for track in departed:
+            departed_counts[track['class_name']] += 1
+        
+        for object_type, count in departed_counts.items():
+            segments.extend(self._split_template(
+                random.choice(self.departure_messages),
+                count=count,
+                object_type=self._pluralize(object_type, count)
+            ))
+        
+        return segments
+    
+    def _describe_objects(self, detections):
+        """Gera os fragmentos que descrevem cada tipo de objeto detectado"""
         # Agrupar detecções por classe
         grouped_detections = defaultdict(list)
         for detection in detections:
             grouped_detections[detection['class_name']].append(detection)
         
-        response_parts = []
+        segments = []
         
         # Processar cada tipo de objeto
         for object_type, objects in grouped_detections.items():
@@ -140,50 +192,120 @@ class ResponseGenerator:
             
             # Verificar se há mensagens personalizadas para este objeto
             if object_type in self.personalized_messages:
-                response_parts.append(self._generate_personalized_response(object_type, objects))
+                segments.extend(self._generate_personalized_segments(object_type, objects))
             else:
                 # Usar mensagem genérica
                 generic_msg = random.choice(self.generic_messages)
-                response_parts.append(generic_msg.format(
+                segments.extend(self._split_template(
+                    generic_msg,
                     count=count,
                     object_type=self._pluralize(object_type, count)
                 ))
         
-        # Adicionar resumo final
-        total_objects = len(detections)
-        summary_msg = random.choice(self.summary_messages)
-        response_parts.append(summary_msg.format(total_objects=total_objects))
-        
-        # Juntar todas as partes
-        full_response = " ".join(response_parts)
-        
-        return full_response
+        return segments
     
     def _generate_personalized_response(self, object_type, objects):
         """Gera resposta personalizada para um tipo específico de objeto"""
+        return " ".join(self._generate_personalized_segments(object_type, objects))
+    
+    def _generate_personalized_segments(self, object_type, objects):
+        """Gera os fragmentos da resposta personalizada para um tipo específico de objeto"""
         messages = self.personalized_messages[object_type]
         
         # Escolher saudação aleatória
         greeting = random.choice(messages['greetings'])
         
-        # Gerar descrições para cada objeto
-        descriptions = []
-        for obj in objects:
-            desc_template = random.choice(messages['descriptions'])
-            description = desc_template.format(
-                position=obj['position'],
-                size=obj['size']
-            )
-            descriptions.append(description)
+        # Escolher um template de descrição para cada objeto
+        desc_templates = [random.choice(messages['descriptions']) for _ in objects]
         
-        # Juntar tudo
-        if len(descriptions) == 1:
-            return f"{greeting} {descriptions[0]}."
+        if len(objects) == 1:
+            segments = [greeting]
         else:
             # Múltiplos objetos do mesmo tipo
             count = len(objects)
             count_text = self._pluralize(object_type, count)
-            return f"{greeting} Encontrei {count} {count_text}: {', '.join(descriptions)}."
+            segments = [greeting] + self._split_template(
+                "Encontrei {count} {count_text}:", count=count, count_text=count_text
+            )
+        
+        # Descrições separadas por vírgula, terminando com ponto
+        for index, (desc_template, obj) in enumerate(zip(desc_templates, objects)):
+            suffix = "." if index == len(objects) - 1 else ","
+            segments.extend(self._split_template(
+                desc_template + suffix,
+                position=obj['position'],
+                size=obj['size']
+            ))
+        
+        return segments
+    
+    @staticmethod
+    def _split_template(template, **values):
+        """
+        Formata um template separando trechos fixos e valores variáveis em fragmentos
+        Ex.: "Vejo {count} {object_type} aqui!" -> ["Vejo", "2", "carros", "aqui!"]
+        Pontuação colada a um valor (ex.: "{object_type}!") fica no mesmo fragmento.
+        """
+        segments = []
+        attach = False
+        
+        for literal, field_name, _, _ in Formatter().parse(template):
+            if literal:
+                text = literal
+                if attach and segments and not text[0].isspace():
+                    # Trecho colado ao valor anterior (ex.: pontuação)
+                    head, _, text = text.partition(" ")
+                    segments[-1] += head
+                if text.strip():
+                    segments.append(text.strip())
+                attach = not literal[-1].isspace()
+            
+            if field_name is not None:
+                value = str(values[field_name])
+                if attach and segments:
+                    segments[-1] += value
+                else:
+                    segments.append(value)
+                attach = True
+        
+        return segments
+    
+    def iter_static_fragments(self, positions=(), sizes=()):
+        """
+        Enumera os fragmentos fixos que as respostas podem conter, para pré-síntese do TTS
+        Args:
+            positions: Descrições de posição possíveis (grade 3x3 do detector)
+            sizes: Descrições de tamanho possíveis
+        Yields:
+            Fragmentos de texto (sem repetição)
+        """
+        positions = list(positions) or [""]
+        sizes = list(sizes) or [""]
+        seen = set()
+        
+        def emit(segments):
+            for segment in segments:
+                if segment not in seen:
+                    seen.add(segment)
+                    yield segment
+        
+        yield from emit(["Nenhum objeto foi detectado nesta imagem.", "Encontrei"])
+        
+        for messages in self.personalized_messages.values():
+            yield from emit(messages['greetings'])
+            for desc_template in messages['descriptions']:
+                for suffix in (".", ","):
+                    for position in positions:
+                        for size in sizes:
+                            yield from emit(self._split_template(
+                                desc_template + suffix, position=position, size=size
+                            ))
+        
+        # Trechos fixos dos templates genéricos e de resumo (os valores variam por requisição)
+        marker = "\x00"
+        for template in self.generic_messages + self.summary_messages + self.departure_messages:
+            segments = self._split_template(template, count=marker, object_type=marker, total_objects=marker)
+            yield from emit([segment for segment in segments if marker not in segment])
     
     def _pluralize(self, word, count):
         """Pluraliza palavras em português de forma simples"""
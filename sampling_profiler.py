@@ -0,0 +1,124 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# Funções (arquivo, nome) em que uma thread está apenas esperando (filtradas com idle=False)
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto'),
+    ('connection.py', '_recv'),
+    ('connection.py', 'accept'),
+}
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, idle=False):
+        """
+        Profiler por amostragem das pilhas de todas as threads do processo
+        Args:
+            interval: Intervalo entre amostras (segundos)
+            idle: Se False, descarta amostras de threads paradas em esperas (locks, filas, sockets)
+        """
+        self.interval = max(0.001, float(interval))
+        self.idle = idle
+        self.samples = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+
+    @staticmethod
+    def _thread_label(name):
+        """Agrupa threads do mesmo pool (ex.: 'decode_3' e 'decode_7' -> 'decode')"""
+        return re.sub(r'[-_]\d+', '', name)
+
+    @staticmethod
+    def _frame_label(frame):
+        """'função (pacote/arquivo.py:linha)': o diretório distingue, por exemplo, app.py do flask/app.py"""
+        code = frame.f_code
+        directory, file_name = os.path.split(code.co_filename)
+        return f"{code.co_name} ({os.path.basename(directory)}/{file_name}:{code.co_firstlineno})"
+
+    def _is_idle(self, frame):
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def run(self, duration):
+        """
+        Amostra as pilhas de todas as threads (exceto a atual) durante duration segundos
+        Returns:
+            self
+        """
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or (not self.idle and self._is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                stack.append(self._thread_label(names.get(ident, f'thread-{ident}')))
+                self.samples[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.interval, remaining))
+
+        self.duration = time.perf_counter() - start
+        return self
+
+    def collapsed(self):
+        """Pilhas no formato collapsed (flamegraph.pl, speedscope, inferno): 'a;b;c contagem'"""
+        lines = [f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}"
+                 for stack, count in self.samples.most_common()]
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name='yolo-api'):
+        """Perfil no formato JSON do speedscope (um perfil por thread)"""
+        frames = []
+        frame_index = {}
+        profiles = {}
+
+        for stack, count in self.samples.most_common():
+            thread, frame_labels = stack[0], stack[1:]
+            indexes = []
+            for label in frame_labels:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    function, _, location = label.rpartition(' (')
+                    file_name, _, line = location.rstrip(')').rpartition(':')
+                    frames.append({'name': function, 'file': file_name, 'line': int(line)})
+                indexes.append(frame_index[label])
+
+            profile = profiles.setdefault(thread, {
+                'type': 'sampled',
+                'name': thread,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': round(self.duration, 6),
+                'samples': [],
+                'weights': []
+            })
+            profile['samples'].append(indexes)
+            profile['weights'].append(round(count * self.interval, 6))
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'yolo-api sampling_profiler',
+            'shared': {'frames': frames},
+            'profiles': sorted(profiles.values(), key=lambda profile: -sum(profile['weights']))
+        }
@@ -0,0 +1,85 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupState:
+    def __init__(self, started_at=None):
+        """
+        Acompanha as etapas de inicialização da API e se ela já pode receber tráfego
+        Args:
+            started_at: Instante inicial (time.perf_counter) usado no tempo total;
+                None usa o momento da criação
+        """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.stages = {}
+        self.current_stage = None
+        self.error = None
+        self.total_seconds = None
+
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def record(self, name, seconds):
+        """Registra a duração de uma etapa medida externamente (ex.: imports)"""
+        with self._lock:
+            self.stages[name] = round(seconds, 3)
+
+    @contextmanager
+    def stage(self, name):
+        """Mede a duração de uma etapa da inicialização"""
+        with self._lock:
+            self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self):
+        """Marca a API como pronta e registra o resumo dos tempos de inicialização"""
+        with self._lock:
+            self.current_stage = None
+            self.total_seconds = round(time.perf_counter() - self.started_at, 3)
+            breakdown = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items())
+        self._ready.set()
+        print(f"⏱️ Inicialização concluída em {self.total_seconds:.2f}s ({breakdown})")
+
+    def mark_failed(self, error):
+        """Registra uma falha na inicialização (a API nunca fica pronta)"""
+        with self._lock:
+            self.error = str(error)
+        print(f"❌ Falha na inicialização durante '{self.current_stage}': {error}")
+
+    def mark_unavailable(self, error):
+        """Tira a API de serviço depois de pronta (ex.: todos os processos de inferência encerrados)"""
+        with self._lock:
+            self.error = str(error)
+        self._ready.clear()
+        print(f"❌ API indisponível: {error}")
+
+    def wait(self, timeout=None):
+        """Aguarda a API ficar pronta; retorna True se ficou pronta dentro do timeout"""
+        return self._ready.wait(timeout)
+
+    def get_status(self):
+        """Retorna o estado da inicialização"""
+        with self._lock:
+            if self.ready:
+                status = 'ready'
+            elif self.error is not None:
+                status = 'failed'
+            else:
+                status = 'starting'
+            return {
+                'status': status,
+                'stage': self.current_stage,
+                'stages': dict(self.stages),
+                'elapsed_seconds': round(time.perf_counter() - self.started_at, 3),
+                'total_seconds': self.total_seconds,
+                'error': self.error
+            }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Script de teste para o endpoint /detect-batch
+Envia várias imagens em uma requisição e lê os resultados NDJSON
+"""
+
+import requests
+import json
+import time
+import io
+import zipfile
+from PIL import Image
+
+API_URL = "http://127.0.0.1:5000/detect-batch"
+
+def create_test_images(count=10):
+    """Cria uma lista de imagens JPEG de teste com cores diferentes"""
+    images = []
+    for i in range(count):
+        img = Image.new('RGB', (320, 240), color=(i * 25 % 256, 100, 200))
+        img_byte_arr = io.BytesIO()
+        img.save(img_byte_arr, format='JPEG', quality=85)
+        images.append((f"imagem_{i}.jpg", img_byte_arr.getvalue()))
+    return images
+
+def read_ndjson(response):
+    """Lê as linhas NDJSON à medida que chegam"""
+    for line in response.iter_lines():
+        if line:
+            yield json.loads(line)
+
+def test_batch_multipart():
+    """Testa o /detect-batch com partes multipart"""
+    print("🧪 Testando /detect-batch (multipart)")
+
+    images = create_test_images()
+    files = [('images', (name, data, 'image/jpeg')) for name, data in images]
+
+    try:
+        start_time = time.time()
+        # TTS apenas para a primeira imagem
+        response = requests.post(API_URL, files=files, data={'tts': images[0][0]}, stream=True)
+
+        print(f"📥 Status: {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ Erro! Resposta: {response.text}")
+            return
+
+        for result in read_ndjson(response):
+            if result.get('done'):
+                print(f"✅ Lote concluído: {result['total_images']} imagens, {result['errors']} erros")
+            elif 'error' in result:
+                print(f"   ❌ {result['filename']}: {result['error']}")
+            else:
+                print(f"   🎯 {result['filename']}: {result['total_objects']} objetos "
+                      f"(áudio: {result['audio_generated']})")
+
+        print(f"⏱️  Tempo total: {(time.time() - start_time) * 1000:.2f}ms")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ Erro de conexão: API não está rodando ou não acessível")
+    except Exception as e:
+        print(f"❌ Erro inesperado: {e}")
+
+def test_batch_zip():
+    """Testa o /detect-batch com um arquivo zip no corpo"""
+    print("\n🧪 Testando /detect-batch (zip)")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in create_test_images(5):
+            archive.writestr(name, data)
+
+    try:
+        response = requests.post(API_URL, data=buffer.getvalue(),
+                                 headers={'Content-Type': 'application/zip'}, stream=True)
+
+        print(f"📥 Status: {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ Erro! Resposta: {response.text}")
+            return
+
+        results = list(read_ndjson(response))
+        print(f"✅ {len(results) - 1} resultados recebidos")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ Erro de conexão: API não está rodando ou não acessível")
+    except Exception as e:
+        print(f"❌ Erro inesperado: {e}")
+
+if __name__ == "__main__":
+    print("🚀 Iniciando testes do endpoint /detect-batch")
+    print("=" * 50)
+
+    test_batch_multipart()
+    test_batch_zip()
+
+    print("\n" + "=" * 50)
+    print("🏁 Testes concluídos!")
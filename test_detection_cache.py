@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de detecções (detection_cache.py), sem servidor nem modelo
+"""
+
+import threading
+import time
+import numpy as np
+from admission import AdmissionController
+from batch_scheduler import DeadlineExceededError
+from detection_cache import DetectionCache
+
+def test_coalesced_waiter_respects_deadline():
+    """Requisição que aguarda a inferência de outra desiste no próprio prazo"""
+    cache = DetectionCache(mode='exact')
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    started = threading.Event()
+    results = []
+
+    def slow_compute(_):
+        started.set()
+        time.sleep(0.5)
+        return [{'class_name': 'person'}]
+
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute(image, slow_compute)))
+    owner.start()
+    started.wait(1)
+
+    controller = AdmissionController(timeout=0.05)
+    begin = time.monotonic()
+    with controller.admit():
+        try:
+            cache.get_or_compute(image, slow_compute)
+            raise AssertionError("requisição atendida depois do prazo")
+        except DeadlineExceededError:
+            pass
+    assert time.monotonic() - begin < 0.3
+
+    # A inferência em andamento não é cancelada pela requisição que desistiu
+    owner.join()
+    assert results == [[{'class_name': 'person'}]]
+    assert cache.get_or_compute(image, slow_compute) == [{'class_name': 'person'}]
+    assert cache.get_stats()['coalesced'] == 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Testes da fila justa de inferência (fair_scheduler.py), sem servidor nem modelo
+"""
+
+import threading
+import time
+from batch_scheduler import DeadlineExceededError
+from fair_scheduler import FairScheduler
+
+def hold_slot(scheduler, identity):
+    """Ocupa uma vaga em outra thread (no mesmo contexto, vagas aninhadas não passam pela fila)"""
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot(identity):
+            release.wait(1)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while scheduler.get_stats()['running'] == 0:
+        time.sleep(0.01)
+    return release, holder
+
+def test_abandon_then_evict():
+    """Cliente não cadastrado que desiste da fila pode ser esquecido sem travar a fila justa"""
+    scheduler = FairScheduler(slots=1, max_clients=1)
+    release, holder = hold_slot(scheduler, scheduler.identify(client_id='ocupa'))
+
+    try:
+        with scheduler.slot(scheduler.identify(client_id='desiste'), deadline=time.monotonic() + 0.05):
+            raise AssertionError("vaga concedida com a única vaga ocupada")
+    except DeadlineExceededError:
+        pass
+    assert 'id:desiste' not in scheduler._rings['bulk']
+
+    # Novos clientes não cadastrados acima de max_clients esquecem o cliente que desistiu
+    for index in range(3):
+        try:
+            with scheduler.slot(scheduler.identify(client_id=f'outro-{index}'), deadline=time.monotonic()):
+                pass
+        except DeadlineExceededError:
+            pass
+    assert 'id:desiste' not in scheduler._states
+
+    # A fila continua funcionando depois do esquecimento
+    release.set()
+    holder.join()
+    with scheduler.slot(scheduler.identify(client_id='depois'), deadline=time.monotonic() + 1):
+        pass
+    assert scheduler.get_stats()['running'] == 0
+
+def test_batch_waits_for_free_slots():
+    """Lote só entra quando há vagas livres para todas as suas imagens"""
+    scheduler = FairScheduler(slots=4)
+    single = scheduler.identify(client_id='unitario')
+    bulk = scheduler.identify(client_id='lote')
+    running = []
+    release, holder = hold_slot(scheduler, single)
+
+    def batch():
+        with scheduler.slot(bulk, cost=4):
+            running.append(scheduler.get_stats()['running'])
+
+    worker = threading.Thread(target=batch)
+    worker.start()
+    time.sleep(0.1)
+    assert running == [], "lote de 4 imagens concedido com apenas 3 vagas livres"
+    assert scheduler.get_stats()['running'] == 1
+
+    release.set()
+    holder.join()
+    worker.join(1)
+    assert running == [4]
+
+def test_oversized_batch_runs_alone():
+    """Lote maior que o total de vagas ainda roda quando nada está em execução"""
+    scheduler = FairScheduler(slots=2)
+    with scheduler.slot(scheduler.identify(client_id='lote'), deadline=time.monotonic() + 1, cost=8):
+        assert scheduler.get_stats()['running'] == 8
+    assert scheduler.get_stats()['running'] == 0
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Testes do rastreamento de objetos por sessão (object_tracker.py), sem servidor nem modelo
+"""
+
+from object_tracker import ObjectTracker
+
+def detection(confidence, x1=100, class_name='person'):
+    """Detecção no formato da API"""
+    return {'class_name': class_name, 'confidence': confidence,
+            'bbox': {'x1': x1, 'y1': 100, 'x2': x1 + 100, 'y2': 300}}
+
+def test_low_confidence_keeps_existing_track():
+    """Detecção de baixa confiança mantém o objeto rastreado, sem anunciá-lo de novo"""
+    tracker = ObjectTracker(high_thresh=0.5, max_lost_seconds=0.5)
+    appeared, _ = tracker.update([detection(0.8)], now=0.0)
+    track_id = appeared[0]['track_id']
+
+    # Frames ruins: a mesma pessoa com confiança baixa por mais tempo que max_lost_seconds
+    for now in (0.4, 0.8, 1.2):
+        frame = [detection(0.2, x1=105)]
+        appeared, departed = tracker.update(frame, now=now)
+        assert appeared == [] and departed == []
+        assert frame[0]['track_id'] == track_id
+
+def test_low_confidence_never_starts_track():
+    """Detecção de baixa confiança sem objeto correspondente não inicia um track"""
+    tracker = ObjectTracker(high_thresh=0.5)
+    frame = [detection(0.2)]
+    appeared, departed = tracker.update(frame, now=0.0)
+    assert appeared == [] and departed == []
+    assert frame[0]['track_id'] is None
+    assert tracker.tracks == {}
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Script de teste para o endpoint de streaming /stream (WebSocket)
+Envia frames mais rápido do que o modelo processa e mostra os frames descartados
+"""
+
+import json
+import time
+import io
+from PIL import Image
+
+STREAM_URL = "ws://127.0.0.1:5000/stream?tts_mode=none"
+
+def create_test_frame(index):
+    """Cria um frame JPEG de teste"""
+    img = Image.new('RGB', (320, 240), color=(index * 8 % 256, 100, 200))
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=85)
+    return img_byte_arr.getvalue()
+
+def test_stream(frame_count=30, interval=0.02):
+    """Envia frames por uma única conexão e lê as mensagens de detecção"""
+    print("🧪 Testando /stream (WebSocket)")
+
+    try:
+        import simple_websocket
+    except ImportError:
+        print("❌ Instale o cliente: pip install simple-websocket")
+        return
+
+    try:
+        ws = simple_websocket.Client.connect(STREAM_URL)
+    except Exception as e:
+        print(f"❌ Erro de conexão: {e}")
+        return
+
+    try:
+        start_time = time.time()
+        for index in range(frame_count):
+            ws.send(create_test_frame(index))
+            time.sleep(interval)
+
+        last = None
+        while True:
+            message = ws.receive(timeout=2)
+            if message is None:
+                break
+            last = json.loads(message)
+            if last['type'] == 'error':
+                print(f"   ❌ Frame {last.get('frame_id')}: {last['error']}")
+            else:
+                print(f"   🎯 Frame {last['frame_id']}: {last['total_objects']} objetos "
+                      f"({last['latency_ms']}ms, {last['dropped_frames']} descartados)")
+
+        if last is not None:
+            print(f"✅ Último frame processado: {last['frame_id']} de {frame_count}")
+        print(f"⏱️  Tempo total: {(time.time() - start_time) * 1000:.2f}ms")
+
+    finally:
+        ws.close()
+
+if __name__ == "__main__":
+    print("🚀 Iniciando testes do endpoint /stream")
+    print("=" * 50)
+
+    test_stream()
+
+    print("\n" + "=" * 50)
+    print("🏁 Testes concluídos!")
@@ -1,29 +1,66 @@
-from gtts import gTTS
 import io
-import tempfile
-import os
-import pygame
-import threading
 import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import AudioCache
+from audio_player import AudioPlayer
+from metrics import stage
+
+def gtts_synthesize(text, language='pt', slow=False):
+    """
+    Sintetiza o texto em MP3 com o Google Text-to-Speech (requer rede)
+    Returns:
+        bytes do MP3
+    """
+    # Importado sob demanda: a inicialização da API não paga pelo gTTS se o áudio nunca for usado
+    from gtts import gTTS
+    tts = gTTS(text=text, lang=language, slow=slow)
+    buffer = io.BytesIO()
+    tts.write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+class StubSynthesizer:
+    """
+    Sintetizador local no lugar do gTTS, para benchmarks e testes de carga sem rede
+    Gera, de forma determinística, um MP3 de silêncio com duração proporcional ao texto
+    """
+    # Frame MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono, sem dados de áudio (~26 ms de silêncio)
+    FRAME = b'\xff\xfb\x90\xc4' + bytes(413)
+    FRAME_SECONDS = 1152 / 44100
+
+    def __init__(self, latency=0.0, seconds_per_word=0.5):
+        """
+        Args:
+            latency: Tempo simulado de cada chamada (segundos), como a ida e volta ao gTTS
+            seconds_per_word: Duração do áudio gerado por palavra
+        """
+        self.latency = float(latency)
+        self.seconds_per_word = float(seconds_per_word)
+
+    def __call__(self, text, language='pt', slow=False):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        seconds = max(1, len(text.split())) * self.seconds_per_word * (1.5 if slow else 1.0)
+        return self.FRAME * max(1, int(seconds / self.FRAME_SECONDS))
+
 
 class TTSGenerator:
-    def __init__(self, language='pt', slow=False):
+    def __init__(self, language='pt', slow=False, cache=None, player=None, synthesizer=None):
         """
         Inicializa o gerador de TTS
         Args:
             language: Idioma para TTS (pt = português)
             slow: Se deve falar mais devagar
+            cache: AudioCache para reaproveitar áudios já sintetizados (None cria um padrão)
+            player: AudioPlayer que reproduz os áudios em segundo plano (None cria um padrão)
+            synthesizer: Função (texto, idioma, slow) -> bytes do MP3 (None usa o gTTS)
         """
         self.language = language
         self.slow = slow
-        
-        # Inicializar pygame para reprodução de áudio
-        try:
-            pygame.mixer.init()
-            print("✅ Sistema de áudio inicializado!")
-        except Exception as e:
-            print(f"⚠️ Aviso: Sistema de áudio não disponível: {e}")
-            print("   A API funcionará, mas sem reprodução de áudio")
+        self.cache = cache if cache is not None else AudioCache()
+        self.player = player if player is not None else AudioPlayer()
+        self.synthesizer = synthesizer if synthesizer is not None else gtts_synthesize
     
     def generate_and_play(self, text, play_audio=True):
         """
@@ -35,62 +72,136 @@ class TTSGenerator:
             dict: Informações sobre o áudio gerado
         """
         try:
-            print(f"🔊 Gerando áudio para: '{text[:50]}...'")
-            
-            # Gerar áudio com gTTS
-            tts = gTTS(text=text, lang=self.language, slow=self.slow)
-            
-            # Salvar temporariamente em memória
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                tts.save(temp_file.name)
-                temp_path = temp_file.name
-            
-            # Informações do áudio
-            audio_info = {
-                'text': text,
-                'language': self.language,
-                'file_path': temp_path,
-                'file_size': os.path.getsize(temp_path),
-                'duration_estimate': len(text.split()) * 0.5  # Estimativa: 0.5s por palavra
-            }
-            
-            # Reproduzir áudio se solicitado e disponível
-            if play_audio and pygame.mixer.get_init():
-                self._play_audio(temp_path)
+            audio_data, cached = self.synthesize(text)
+            return self._deliver_audio(text, audio_data, cached, play_audio)
             
+        except Exception as e:
+            print(f"❌ Erro ao gerar áudio: {e}")
+            return None
+    
+    def generate_and_play_segments(self, segments, play_audio=True):
+        """
+        Gera o áudio de uma resposta concatenando o MP3 de cada fragmento
+        Args:
+            segments: Fragmentos de frase (ResponseGenerator.generate_response_segments)
+            play_audio: Se deve reproduzir o áudio
+        Returns:
+            dict: Informações sobre o áudio gerado
+        """
+        try:
+            audio_data, cached = self.synthesize_segments(segments)
+            audio_info = self._deliver_audio(" ".join(segments), audio_data, cached, play_audio)
+            audio_info['fragments'] = len(segments)
             return audio_info
             
         except Exception as e:
             print(f"❌ Erro ao gerar áudio: {e}")
             return None
     
-    def _play_audio(self, audio_path):
+    def _deliver_audio(self, text, audio_data, cached, play_audio):
+        """Monta as informações do áudio e o reproduz ou o mantém em disco"""
+        audio_info = {
+            'text': text,
+            'language': self.language,
+            'file_path': None,
+            'file_size': len(audio_data),
+            'duration_estimate': len(text.split()) * 0.5,  # Estimativa: 0.5s por palavra
+            'cached': cached,
+            'playback': None
+        }
+        
+        if play_audio:
+            # Enfileirar na thread de reprodução e retornar sem esperar o áudio terminar
+            audio_info['playback'] = self.play_audio_data(audio_data)
+        else:
+            # Manter o MP3 em disco para quem pediu apenas a geração
+            with stage('tts_file_write'), tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
+                temp_file.write(audio_data)
+                audio_info['file_path'] = temp_file.name
+        
+        return audio_info
+    
+    def synthesize(self, text):
+        """
+        Sintetiza o texto em MP3, consultando o cache antes do sintetizador (gTTS)
+        Args:
+            text: Texto para converter em áudio
+        Returns:
+            Tupla (bytes do MP3, se veio do cache)
+        """
+        key = self.cache.make_key(text, self.language, self.slow)
+        audio_data = self.cache.get(key)
+        if audio_data is not None:
+            print(f"♻️ Áudio em cache para: '{text[:50]}...'")
+            return audio_data, True
+        
+        print(f"🔊 Gerando áudio para: '{text[:50]}...'")
+        
+        # Gerar áudio direto em memória (gTTS por padrão)
+        with stage('tts_synthesis'):
+            audio_data = self.synthesizer(text, self.language, self.slow)
+        
+        self.cache.put(key, audio_data)
+        return audio_data, False
+    
+    def synthesize_segments(self, segments):
         """
-        Reproduz o áudio usando pygame
+        Sintetiza uma frase fragmento a fragmento, concatenando os frames MP3
+        Cada fragmento passa pelo cache, então fragmentos fixos dos templates
+        só chegam ao gTTS uma vez.
         Args:
-            audio_path: Caminho para o arquivo de áudio
+            segments: Lista de fragmentos de texto
+        Returns:
+            Tupla (bytes do MP3, se todos os fragmentos vieram do cache)
         """
+        parts = []
+        all_cached = True
+        
+        for index, segment in enumerate(segments):
+            audio_data, cached = self.synthesize(segment)
+            all_cached = all_cached and cached
+            # Cabeçalhos ID3 só são válidos no início do arquivo
+            parts.append(audio_data if index == 0 else _strip_id3(audio_data))
+        
+        return b"".join(parts), all_cached
+    
+    def presynthesize(self, fragments, max_workers=4):
+        """
+        Sintetiza antecipadamente os fragmentos que ainda não estão em cache
+        Args:
+            fragments: Iterável de fragmentos (ResponseGenerator.iter_static_fragments)
+            max_workers: Número de sínteses simultâneas
+        Returns:
+            Número de fragmentos sintetizados
+        """
+        pending = [fragment for fragment in fragments
+                   if self.cache.make_key(fragment, self.language, self.slow) not in self.cache]
+        
+        print(f"🧩 Pré-sintetizando {len(pending)} fragmentos de TTS...")
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts-presynth') as executor:
+            synthesized = sum(1 for result in executor.map(self._try_synthesize, pending) if result is not None)
+        
+        print(f"✅ {synthesized}/{len(pending)} fragmentos pré-sintetizados")
+        return synthesized
+    
+    def _try_synthesize(self, text):
+        """Sintetiza sem propagar erros (usado na pré-síntese)"""
         try:
-            print("🎵 Reproduzindo áudio...")
-            
-            # Carregar e reproduzir áudio
-            pygame.mixer.music.load(audio_path)
-            pygame.mixer.music.play()
-            
-            # Aguardar a reprodução terminar
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
-            
-            print("✅ Áudio reproduzido com sucesso!")
-            
+            return self.synthesize(text)
         except Exception as e:
-            print(f"❌ Erro ao reproduzir áudio: {e}")
-        finally:
-            # Limpar arquivo temporário
-            try:
-                os.unlink(audio_path)
-            except:
-                pass
+            print(f"⚠️ Aviso: falha ao pré-sintetizar '{text[:30]}': {e}")
+            return None
+    
+    def play_audio_data(self, audio_data):
+        """
+        Enfileira um MP3 já sintetizado para reprodução em segundo plano
+        Args:
+            audio_data: Bytes do MP3
+        Returns:
+            Estado da reprodução ('queued', 'dropped' ou 'unavailable')
+        """
+        return self.player.enqueue(audio_data)
     
     def play_text(self, text):
         """
@@ -110,10 +221,17 @@ class TTSGenerator:
     
     def cleanup(self):
         """Limpa recursos de áudio"""
-        try:
-            pygame.mixer.quit()
-        except:
-            pass
-
+        self.player.close()
 
 
+def _strip_id3(audio_data):
+    """Remove um cabeçalho ID3v2 do início do MP3, se houver"""
+    if len(audio_data) < 10 or audio_data[:3] != b"ID3":
+        return audio_data
+    
+    # Tamanho em inteiro "syncsafe" (7 bits por byte), sem contar os 10 bytes do cabeçalho
+    size = 0
+    for byte in audio_data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if audio_data[5] & 0x10 else 0
+    return audio_data[10 + size + footer:]
@@ -1,160 +1,350 @@
-from ultralytics import YOLO
 import os
+import time
+from itertools import product
+import numpy as np
+from PIL import Image
+from inference_backends import BACKENDS, resolve_model_path
+from metrics import observe_model_speed
 
 class YOLODetector:
-    def __init__(self, model_path='yolov8n.pt'):
+    # Tamanho de referência usado nas descrições (imagem padrão 640x640 do YOLO)
+    REFERENCE_SIZE = 640
+    
+    # Confiança mínima padrão das detecções
+    CONF_THRESHOLD = 0.5
+    
+    # Limites da grade 3x3 de posições (coordenadas normalizadas)
+    GRID_THRESHOLDS = np.array([0.33, 0.66])
+    HORIZONTAL_LABELS = ["à esquerda", "no centro", "à direita"]
+    VERTICAL_LABELS = ["na parte superior", "no meio", "na parte inferior"]
+    
+    # Limites das faixas de tamanho (área normalizada)
+    SIZE_THRESHOLDS = np.array([0.01, 0.05, 0.15, 0.3])
+    SIZE_LABELS = ["muito pequeno", "pequeno", "médio", "grande", "muito grande"]
+    
+    # Tabela [vertical, horizontal] -> descrição da posição
+    POSITION_LABELS = np.array(
+        [f"{h_pos} e {v_pos}" for v_pos, h_pos in product(VERTICAL_LABELS, HORIZONTAL_LABELS)],
+        dtype=object
+    ).reshape(len(VERTICAL_LABELS), len(HORIZONTAL_LABELS))
+    
+    def __init__(self, model_path='yolov8n.pt', backend='pytorch', imgsz=640, cache_dir='model_cache',
+                 calibration_dir=None, low_conf_threshold=None):
         """
         Inicializa o detector YOLO
         Args:
             model_path: Caminho para o modelo YOLO (usa yolov8n.pt por padrão)
+            backend: Engine de inferência: 'pytorch', 'onnx' (ONNX Runtime),
+                'openvino' (OpenVINO IR), 'torchscript' ou 'onnx-int8' (quantizado)
+            imgsz: Tamanho de entrada do modelo
+            cache_dir: Pasta onde os modelos exportados ficam em cache
+            calibration_dir: Pasta de imagens de calibração (backend 'onnx-int8')
+            low_conf_threshold: Se informado, o modelo também retorna detecções a partir dessa
+                confiança (abaixo de conf_threshold), para a segunda etapa do rastreamento;
+                quem não rastreia filtra por conf_threshold
+        Raises:
+            RuntimeError: backend diferente de 'pytorch' não pôde ser carregado (exportação
+                falhou, runtime não instalado ou onnx-int8 sem calibração)
         """
-        print(f"🔄 Carregando modelo YOLO: {model_path}")
+        print(f"🔄 Carregando modelo YOLO: {model_path} (backend: {backend})")
+        
+        # Configurar confiança mínima
+        self.conf_threshold = self.CONF_THRESHOLD
+        self.low_conf_threshold = low_conf_threshold
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        
+        # Importado aqui para que o módulo possa ser importado sem pagar pelo torch
+        from ultralytics import YOLO
         
         try:
-            # Carregar modelo YOLO
-            self.model = YOLO(model_path)
+            # Carregar modelo YOLO (exportando para o backend escolhido na primeira vez)
+            self.model_file = resolve_model_path(model_path, backend, imgsz, cache_dir, calibration_dir=calibration_dir)
+            self.model = YOLO(self.model_file, task='detect')
             print("✅ Modelo YOLO carregado com sucesso!")
             
-            # Configurar confiança mínima
-            self.conf_threshold = 0.5
-            
         except Exception as e:
             print(f"❌ Erro ao carregar modelo YOLO: {e}")
+            if backend != 'pytorch':
+                # Sem fallback silencioso: métricas e benchmarks reportariam um backend que não está rodando
+                raise RuntimeError(f"Backend {backend} indisponível para {model_path}: {e}") from e
             print("📥 Baixando modelo padrão...")
             
             try:
                 # Tentar baixar modelo padrão
                 self.model = YOLO('yolov8n.pt')
+                self.model_path = 'yolov8n.pt'
+                self.model_file = 'yolov8n.pt'
                 print("✅ Modelo padrão baixado e carregado!")
             except Exception as e2:
                 print(f"❌ Erro fatal ao carregar modelo: {e2}")
                 raise e2
     
-    def detect(self, image_path):
+    @property
+    def model_conf(self):
+        """Confiança mínima passada ao modelo (a menor entre conf_threshold e low_conf_threshold)"""
+        if self.low_conf_threshold is None:
+            return self.conf_threshold
+        return min(self.conf_threshold, self.low_conf_threshold)
+    
+    def prepare_for_fork(self):
+        """
+        Prepara o modelo para ser compartilhado (copy-on-write) com processos filhos
+        Funde Conv+BN antes do fork; caso contrário o ultralytics faz a fusão na primeira
+        inferência de cada worker, criando uma cópia privada dos pesos em cada um
+        """
+        if self.backend != 'pytorch':
+            # Backends exportados criam a sessão do runtime na primeira inferência de cada worker
+            return
+        try:
+            self.model.fuse()
+            print("🔗 Modelo preparado para compartilhamento entre workers")
+        except Exception as e:
+            print(f"⚠️ Aviso: não foi possível fundir o modelo antes do fork: {e}")
+    
+    def warmup(self, runs=1, batch_sizes=(1,)):
+        """
+        Executa inferências em imagens vazias para inicializar kernels e alocações do runtime
+        antes da primeira requisição real
+        Args:
+            runs: Número de passadas para cada tamanho de lote
+            batch_sizes: Tamanhos de lote aquecidos (ex.: 1 e o lote máximo do micro-batching)
+        Returns:
+            Tempo total do aquecimento em segundos
+        """
+        start = time.perf_counter()
+        image = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        
+        for batch_size in batch_sizes:
+            # Backends sem suporte a lote processam uma imagem por vez de qualquer forma
+            if batch_size > 1 and not BACKENDS[self.backend]['supports_batch']:
+                continue
+            for _ in range(runs):
+                self.detect_batch([image] * batch_size, columnar=True)
+        
+        elapsed = time.perf_counter() - start
+        print(f"🔥 Modelo aquecido em {elapsed:.2f}s")
+        return elapsed
+    
+    def detect(self, image, columnar=False):
         """
         Detecta objetos em uma imagem
         Args:
-            image_path: Caminho para a imagem
+            image: Caminho para a imagem, numpy.ndarray (BGR) ou PIL.Image
+            columnar: Se True, retorna um dict de arrays NumPy (uma coluna por campo)
+                em vez de uma lista de dicts por detecção
+        Returns:
+            Lista de detecções com informações dos objetos (ou colunas, se columnar=True)
+        """
+        return self.detect_batch([image], columnar=columnar)[0]
+    
+    def detect_batch(self, images, columnar=False):
+        """
+        Detecta objetos em várias imagens com uma única passada do modelo
+        Args:
+            images: Lista de caminhos, numpy.ndarray (BGR) ou PIL.Image
+            columnar: Se True, retorna colunas NumPy em vez de listas de dicts
         Returns:
-            Lista de detecções com informações dos objetos
+            Lista com o resultado de cada imagem, na mesma ordem da entrada
         """
         try:
-            # Verificar se a imagem existe
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Imagem não encontrada: {image_path}")
-            
-            print(f"🔍 Processando imagem: {image_path}")
+            for image in images:
+                if isinstance(image, (str, os.PathLike)):
+                    # Verificar se a imagem existe
+                    if not os.path.exists(image):
+                        raise FileNotFoundError(f"Imagem não encontrada: {image}")
+                elif not isinstance(image, (np.ndarray, Image.Image)):
+                    raise TypeError(f"Tipo de imagem não suportado: {type(image).__name__}")
             
-            # Executar detecção
-            results = self.model(image_path, conf=self.conf_threshold)
-            
-            detections = []
+            # Executar detecção (um único forward para todo o lote, se o backend permitir)
+            if BACKENDS[self.backend]['supports_batch']:
+                results = self.model(list(images), conf=self.model_conf, imgsz=self.imgsz, verbose=False)
+            else:
+                results = [result for image in images
+                           for result in self.model(image, conf=self.model_conf, imgsz=self.imgsz, verbose=False)]
             
+            outputs = []
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Obter coordenadas e confiança
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = float(box.conf[0].cpu().numpy())
-                        class_id = int(box.cls[0].cpu().numpy())
-                        
-                        # Obter nome da classe
-                        class_name = result.names[class_id]
-                        
-                        # Calcular centro do objeto
-                        center_x = int((x1 + x2) / 2)
-                        center_y = int((y1 + y2) / 2)
-                        
-                        # Calcular tamanho relativo
-                        width = x2 - x1
-                        height = y2 - y1
-                        area = width * height
-                        
-                        # Determinar posição relativa
-                        position = self._get_position_description(center_x, center_y)
-                        
-                        # Determinar tamanho relativo
-                        size_description = self._get_size_description(area)
-                        
-                        detection = {
-                            'class_name': class_name,
-                            'confidence': round(confidence, 3),
-                            'bbox': {
-                                'x1': int(x1),
-                                'y1': int(y1),
-                                'x2': int(x2),
-                                'y2': int(y2),
-                                'center_x': center_x,
-                                'center_y': center_y
-                            },
-                            'position': position,
-                            'size': size_description,
-                            'area': int(area)
-                        }
-                        
-                        detections.append(detection)
-            
-            # Ordenar detecções por confiança (mais alta primeiro)
-            detections.sort(key=lambda x: x['confidence'], reverse=True)
+                columns = self._results_to_columns([result])
+                # Tempos por imagem reportados pelo ultralytics (ms)
+                columns['speed'] = dict(getattr(result, 'speed', None) or {})
+                observe_model_speed(columns['speed'], self.backend)
+                outputs.append(columns)
             
-            print(f"🎯 {len(detections)} objetos detectados")
-            for det in detections:
-                print(f"   - {det['class_name']} ({det['confidence']:.2f}) - {det['position']}")
+            total = sum(len(columns['confidence']) for columns in outputs)
+            print(f"🎯 {total} objetos detectados em {len(outputs)} imagem(ns)")
             
-            return detections
+            if columnar:
+                return outputs
+            return [self.columns_to_detections(columns) for columns in outputs]
             
         except Exception as e:
             print(f"❌ Erro na detecção: {e}")
             raise e
     
-    def _get_position_description(self, center_x, center_y):
-        """Determina descrição da posição do objeto na imagem"""
-        # Assumindo imagem padrão 640x640 do YOLO
-        img_width, img_height = 640, 640
-        
-        # Normalizar coordenadas
-        norm_x = center_x / img_width
-        norm_y = center_y / img_height
-        
-        # Determinar posição horizontal
-        if norm_x < 0.33:
-            h_pos = "à esquerda"
-        elif norm_x < 0.66:
-            h_pos = "no centro"
-        else:
-            h_pos = "à direita"
+    @classmethod
+    def _results_to_columns(cls, results):
+        """
+        Converte os resultados do YOLO em colunas NumPy, processando todas as caixas de uma vez
+        Args:
+            results: Lista de ultralytics Results
+        Returns:
+            dict de arrays, já ordenados por confiança (mais alta primeiro)
+        """
+        boxes_data = []
+        class_names = []
+        
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                continue
+            
+            # Uma única transferência para a CPU por resultado: [x1, y1, x2, y2, (id), conf, cls]
+            data = boxes.data.cpu().numpy()
+            boxes_data.append(data[:, [0, 1, 2, 3, -2, -1]])
+            class_names.extend(result.names[class_id] for class_id in data[:, -1].astype(np.int64).tolist())
         
-        # Determinar posição vertical
-        if norm_y < 0.33:
-            v_pos = "na parte superior"
-        elif norm_y < 0.66:
-            v_pos = "no meio"
+        if boxes_data:
+            data = np.concatenate(boxes_data).astype(np.float64)
         else:
-            v_pos = "na parte inferior"
+            data = np.empty((0, 6), dtype=np.float64)
         
-        return f"{h_pos} e {v_pos}"
+        xyxy = data[:, :4]
+        confidence = np.round(data[:, 4], 3)
+        class_id = data[:, 5].astype(np.int64)
+        class_name = np.array(class_names, dtype=object)
+        
+        # Ordenar detecções por confiança (mais alta primeiro), mantendo a ordem original nos empates
+        order = np.argsort(-confidence, kind='stable')
+        xyxy = xyxy[order]
+        confidence = confidence[order]
+        class_id = class_id[order]
+        class_name = class_name[order]
+        
+        return {
+            'class_id': class_id,
+            'class_name': class_name,
+            'confidence': confidence,
+            **cls._describe_boxes(xyxy)
+        }
     
-    def _get_size_description(self, area):
-        """Determina descrição do tamanho do objeto"""
-        # Área normalizada (assumindo imagem 640x640)
-        norm_area = area / (640 * 640)
-        
-        if norm_area < 0.01:
-            return "muito pequeno"
-        elif norm_area < 0.05:
-            return "pequeno"
-        elif norm_area < 0.15:
-            return "médio"
-        elif norm_area < 0.3:
-            return "grande"
-        else:
-            return "muito grande"
+    @classmethod
+    def _describe_boxes(cls, xyxy):
+        """
+        Calcula caixa, centro, área, posição e tamanho relativos de um array de caixas xyxy
+        Args:
+            xyxy: numpy.ndarray (N x 4) em pixels
+        Returns:
+            dict de arrays (colunas bbox, center, position, size e area)
+        """
+        # Calcular centro e área dos objetos
+        center = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(np.int64)
+        width_height = xyxy[:, 2:] - xyxy[:, :2]
+        area = width_height[:, 0] * width_height[:, 1]
+        
+        # Determinar posição relativa na grade 3x3
+        reference = cls.REFERENCE_SIZE
+        h_index = np.searchsorted(cls.GRID_THRESHOLDS, center[:, 0] / reference, side='right')
+        v_index = np.searchsorted(cls.GRID_THRESHOLDS, center[:, 1] / reference, side='right')
+        position = cls.POSITION_LABELS[v_index, h_index]
+        
+        # Determinar tamanho relativo
+        size_index = np.searchsorted(cls.SIZE_THRESHOLDS, area / (reference * reference), side='right')
+        size = np.array(cls.SIZE_LABELS, dtype=object)[size_index]
+        
+        return {
+            'bbox': xyxy.astype(np.int64),
+            'center': center,
+            'position': position,
+            'size': size,
+            'area': area.astype(np.int64)
+        }
+    
+    @classmethod
+    def rescale_detections(cls, detections, scale):
+        """
+        Converte detecções de uma imagem decodificada em resolução reduzida para os pixels
+        da imagem original (posição e tamanho relativos são recalculados)
+        Args:
+            detections: Lista de detecções no formato da API (alteradas no lugar)
+            scale: (fator x, fator y) retornado pela decodificação
+        Returns:
+            A mesma lista de detecções
+        """
+        if not detections or tuple(scale) == (1.0, 1.0):
+            return detections
+        
+        xyxy = np.array(
+            [[detection['bbox'][key] for key in ('x1', 'y1', 'x2', 'y2')] for detection in detections],
+            dtype=np.float64
+        ) * np.tile(np.asarray(scale, dtype=np.float64), 2)
+        columns = cls._describe_boxes(xyxy)
+        
+        rows = zip(
+            columns['bbox'].tolist(),
+            columns['center'].tolist(),
+            columns['position'].tolist(),
+            columns['size'].tolist(),
+            columns['area'].tolist()
+        )
+        for detection, ((x1, y1, x2, y2), (center_x, center_y), position, size, area) in zip(detections, rows):
+            detection['bbox'] = {
+                'x1': x1,
+                'y1': y1,
+                'x2': x2,
+                'y2': y2,
+                'center_x': center_x,
+                'center_y': center_y
+            }
+            detection.update(position=position, size=size, area=area)
+        return detections
+    
+    @staticmethod
+    def columns_to_detections(columns):
+        """
+        Monta a lista de dicts por detecção a partir da saída colunar
+        Args:
+            columns: dict de arrays retornado por detect(..., columnar=True)
+        Returns:
+            Lista de detecções no formato da API
+        """
+        rows = zip(
+            columns['class_name'].tolist(),
+            columns['confidence'].tolist(),
+            columns['bbox'].tolist(),
+            columns['center'].tolist(),
+            columns['position'].tolist(),
+            columns['size'].tolist(),
+            columns['area'].tolist()
+        )
+        
+        return [
+            {
+                'class_name': class_name,
+                'confidence': confidence,
+                'bbox': {
+                    'x1': x1,
+                    'y1': y1,
+                    'x2': x2,
+                    'y2': y2,
+                    'center_x': center_x,
+                    'center_y': center_y
+                },
+                'position': position,
+                'size': size,
+                'area': area
+            }
+            for class_name, confidence, (x1, y1, x2, y2), (center_x, center_y), position, size, area in rows
+        ]
     
     def get_model_info(self):
         """Retorna informações sobre o modelo carregado"""
         return {
             'model_name': self.model.ckpt_path if hasattr(self.model, 'ckpt_path') else 'yolov8n.pt',
+            'backend': self.backend,
+            'imgsz': self.imgsz,
             'confidence_threshold': self.conf_threshold,
+            'low_confidence_threshold': self.low_conf_threshold,
             'classes': list(self.model.names.values()) if hasattr(self.model, 'names') else []
         }